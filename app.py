@@ -1,4 +1,4 @@
-from flask import Flask, render_template, request, redirect, url_for, flash
+from flask import Flask, render_template, request, redirect, url_for, flash, jsonify, Response, stream_with_context
 from dotenv import load_dotenv
 import os
 
@@ -8,20 +8,37 @@ from werkzeug.security import generate_password_hash, check_password_hash
 from werkzeug.utils import secure_filename
 from config import Config
 from utils.db import db
-from utils.models import User, ScanResult
-from utils.ai_engine import analyze_image, analyze_audio, analyze_video
+from utils.models import User, ScanResult, ScanJob
+from utils.jobs import job_queue
+from utils.media_cache import media_cache
+from utils.ingest import IngestRequest, ingest_upload, ingest_batch
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from utils.warmup import warm_up
+from utils.scans import HISTORY_PAGE_SIZE, scan_history, ensure_history_index
+from utils.scan_stats import STATS_DAYS, scan_stats
 import os
+import json
+import time
 from datetime import datetime
 
 app = Flask(__name__)
 app.config.from_object(Config)
+# Uploads stream straight into content-addressed spool files (utils/ingest.py)
+app.request_class = IngestRequest
 
 # Initialize Extensions
 db.init_app(app)
+job_queue.init_app(app)
+media_cache.init_app(app)
 login_manager = LoginManager()
 login_manager.init_app(app)
 login_manager.login_view = 'login'
 
+# Heavy ML/media libraries load on first use; WARM_UP=1 loads them at boot
+# (not when a worker process re-imports this file as its __main__)
+if app.config['WARM_UP'] and __name__ != '__mp_main__':
+    print(f"Warm-up: {warm_up(app.config['WARM_UP_TARGETS'])}")
+
 @login_manager.user_loader
 def load_user(user_id):
     return User.query.get(int(user_id))
@@ -66,7 +83,9 @@ def register():
 @app.route('/dashboard')
 @login_required
 def dashboard():
-    return render_template('dashboard.html', name=current_user.username)
+    scans, next_cursor = scan_history(current_user.id, limit=10)
+    return render_template('dashboard.html', name=current_user.username, stats=scan_stats(current_user.id, days=14),
+                           scans=[scan.to_dict() for scan in scans], next_cursor=next_cursor)
 
 @app.route('/academy')
 @login_required
@@ -92,59 +111,146 @@ def logout():
     return redirect(url_for('index'))
 
 # Detection Routes
-def handle_upload(scan_type, analyze_func):
+def wants_json():
+    return request.accept_mimetypes.best == 'application/json' or request.headers.get('X-Requested-With') == 'XMLHttpRequest'
+
+def job_links(job):
+    return dict(job.to_dict(),
+                status_url=url_for('job_status', job_id=job.id),
+                stream_url=url_for('job_stream', job_id=job.id))
+
+def handle_upload(scan_type, template):
+    """
+    Stores an uploaded file and queues its analysis. The body is parsed
+    straight into a spool file that is hashed, sniffed and size-checked on
+    the way (utils/ingest.py); content that isn't a scan_type file is
+    rejected. JSON clients get the job id back right away (202); the HTML
+    pages render the pending job and follow its event stream.
+    """
     result = None
+    job = None
     if request.method == 'POST':
-        if 'file' not in request.files:
-            flash('No file part', 'error')
+        if 'file' not in request.files or request.files['file'].filename == '':
+            message = 'No file part' if 'file' not in request.files else 'No selected file'
+            if wants_json():
+                return jsonify({'error': message}), 400
+            flash(message, 'error')
             return redirect(request.url)
         file = request.files['file']
-        if file.filename == '':
-            flash('No selected file', 'error')
+        filename = secure_filename(file.filename)
+        try:
+            filepath, digest, _ = ingest_upload(file, expected_type=scan_type)
+        except UnsupportedMediaType as e:
+            if wants_json():
+                return jsonify({'error': e.description}), 415
+            flash(e.description, 'error')
             return redirect(request.url)
-        if file:
-            filename = secure_filename(file.filename)
-            filepath = os.path.join(app.config['UPLOAD_FOLDER'], filename)
-            file.save(filepath)
-            
-            # Analyze
-            analysis = analyze_func(filepath)
-            
-            # Save Result
-            scan = ScanResult(
-                filename=filename,
-                scan_type=scan_type,
-                result=analysis['result'],
-                confidence=analysis['confidence'],
-                user_id=current_user.id
-            )
-            db.session.add(scan)
-            db.session.commit()
-            
-            result = analysis
-            
-            # Cleanup (optional, keep for demo)
-            # os.remove(filepath)
-            
-    return result
+
+        # Analyze (ScanResult is saved when the job finishes; repeat uploads
+        # of the same file reuse the cached analysis)
+        job = job_queue.submit(current_user.id, filename, filepath, scan_type, digest=digest)
+        if wants_json():
+            return jsonify(job_links(job)), 202
+
+        if job.finished:
+            result = job.to_dict()['result']
+            job = None
+
+    return render_template(template, result=result, job=job)
 
 @app.route('/detect/image', methods=['GET', 'POST'])
 @login_required
 def detect_image():
-    result = handle_upload('image', analyze_image)
-    return render_template('detect_image.html', result=result)
+    return handle_upload('image', 'detect_image.html')
 
 @app.route('/detect/audio', methods=['GET', 'POST'])
 @login_required
 def detect_audio():
-    result = handle_upload('audio', analyze_audio)
-    return render_template('detect_audio.html', result=result)
+    return handle_upload('audio', 'detect_audio.html')
 
 @app.route('/detect/video', methods=['GET', 'POST'])
 @login_required
 def detect_video():
-    result = handle_upload('video', analyze_video)
-    return render_template('detect_video.html', result=result)
+    return handle_upload('video', 'detect_video.html')
+
+@app.route('/detect/batch', methods=['POST'])
+@login_required
+def detect_batch():
+    """
+    Scans many files in one request: any mix of images, audio and video as
+    repeated 'files' parts, zip archives of them, or both. Results stream
+    back as NDJSON, one line per file as it finishes, then a summary line;
+    the ScanResult rows are written together at the end.
+    """
+    files = request.files.getlist('files') + request.files.getlist('file')
+    if not files:
+        return jsonify({'error': 'No files provided'}), 400
+    try:
+        entries = ingest_batch(files, app.config['BATCH_MAX_FILES'], app.config['MAX_CONTENT_LENGTH'],
+                               app.config['BATCH_MAX_CONTENT_LENGTH'])
+    except RequestEntityTooLarge as e:
+        return jsonify({'error': e.description}), 413
+    if not entries:
+        return jsonify({'error': 'No files found in the upload'}), 400
+
+    user_id = current_user.id
+
+    def lines():
+        for item in job_queue.scan_batch(user_id, entries):
+            yield json.dumps(item) + '\n'
+
+    return Response(stream_with_context(lines()), mimetype='application/x-ndjson',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@app.route('/detect/cache-stats')
+@login_required
+def media_cache_stats():
+    return jsonify(media_cache.stats())
+
+@app.route('/jobs/<job_id>')
+@login_required
+def job_status(job_id):
+    job = ScanJob.query.filter_by(id=job_id, user_id=current_user.id).first_or_404()
+    job_queue.expire_stale(job)
+    return jsonify(job_links(job))
+
+@app.route('/jobs/<job_id>/stream')
+@login_required
+def job_stream(job_id):
+    """
+    Server-Sent Events: a 'status' event now, then 'done' (with the job,
+    including its result) when it finishes, or 'timeout'. A job left queued
+    by a dead process finishes as an error once it is stale.
+    """
+    job = ScanJob.query.filter_by(id=job_id, user_id=current_user.id).first_or_404()
+
+    def sse(event, payload):
+        return f"event: {event}\ndata: {json.dumps(payload)}\n\n"
+
+    def events():
+        deadline = time.monotonic() + app.config['SCAN_JOB_STREAM_TIMEOUT']
+        yield sse('status', job.to_dict())
+        last_ping = time.monotonic()
+        while True:
+            # End the read transaction so the worker's commit is visible
+            db.session.rollback()
+            current = db.session.get(ScanJob, job_id)
+            job_queue.expire_stale(current)
+            if current.finished:
+                yield sse('done', current.to_dict())
+                return
+            if time.monotonic() > deadline:
+                yield sse('timeout', current.to_dict())
+                return
+            if time.monotonic() - last_ping > 15:
+                yield ": keep-alive\n\n"
+                last_ping = time.monotonic()
+            # Woken early by jobs finishing in this process; the timeout also
+            # catches jobs finished by other server processes
+            job_queue.wait(1.0)
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
 
 @app.route('/tools')
 @login_required
@@ -188,8 +294,10 @@ def password_generator():
         
     return render_template('tools/password_generator.html')
 
-from utils.phishing import check_url
-from flask import jsonify
+from utils.phishing import check_url, check_urls, cache_stats, enable_micro_batching, url_error
+
+if app.config['PHISHING_MICROBATCH']:
+    enable_micro_batching(app.config['PHISHING_MICROBATCH_MAX'], app.config['PHISHING_MICROBATCH_WINDOW_MS'])
 
 @app.route('/tools/phishing-checker', methods=['GET', 'POST'])
 @login_required
@@ -205,6 +313,35 @@ def phishing_checker():
         
     return render_template('tools/phishing_checker.html')
 
+@app.route('/tools/phishing-checker/batch', methods=['POST'])
+@login_required
+def phishing_checker_batch():
+    data = request.get_json(silent=True) or {}
+    urls = data.get('urls')
+    if not isinstance(urls, list) or not urls:
+        return jsonify({'error': 'No URLs provided'}), 400
+    if not all(isinstance(u, str) and u for u in urls):
+        return jsonify({'error': 'Every URL must be a non-empty string'}), 400
+    if len(urls) > app.config['PHISHING_BATCH_MAX_URLS']:
+        return jsonify({'error': f"Too many URLs (max {app.config['PHISHING_BATCH_MAX_URLS']})"}), 413
+    # Malformed URLs would fail the whole batch; report all of them up front
+    invalid = []
+    for index, url in enumerate(urls):
+        error = url_error(url)
+        if error:
+            invalid.append({'index': index, 'url': url, 'error': error})
+    if invalid:
+        return jsonify({'error': 'Malformed URLs', 'invalid': invalid}), 400
+
+    # One model call for the whole batch; results come back in input order
+    results = check_urls(urls)
+    return jsonify({'results': results})
+
+@app.route('/tools/phishing-checker/cache-stats')
+@login_required
+def phishing_cache_stats():
+    return jsonify(cache_stats())
+
 from utils.password_strength import check_password_strength
 
 @app.route('/tools/password-strength', methods=['GET', 'POST'])
@@ -225,6 +362,30 @@ def phishing_simulation():
 
 from utils.phishing_simulation_data import get_random_scenarios
 
+@app.route('/api/scans')
+@login_required
+def scan_history_page():
+    """
+    The user's scans, newest first, a page at a time: pass the returned
+    next_cursor back as ?cursor= for the following page.
+    """
+    limit = request.args.get('limit', default=HISTORY_PAGE_SIZE, type=int)
+    try:
+        scans, next_cursor = scan_history(current_user.id, limit=limit, cursor=request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'scans': [scan.to_dict() for scan in scans], 'next_cursor': next_cursor})
+
+@app.route('/api/scans/stats')
+@login_required
+def scan_statistics():
+    """
+    Real/fake counts and average confidence per scan type plus a daily
+    trend (?days=, default 30), read from the ScanStats rollup.
+    """
+    days = request.args.get('days', default=STATS_DAYS, type=int)
+    return jsonify(scan_stats(current_user.id, days=days))
+
 @app.route('/api/simulation/scenarios')
 @login_required
 def get_simulation_scenarios():
@@ -280,5 +441,7 @@ if __name__ == '__main__':
     
     with app.app_context():
         db.create_all()
+        ensure_history_index()
+        job_queue.expire_stale()
     
     app.run(debug=True)
@@ -7,4 +7,24 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     UPLOAD_FOLDER = os.path.join(os.getcwd(), 'static', 'uploads')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB max upload size
+    # /detect/batch: whole request (multipart set or zip) and total bytes after
+    # unzipping, and files per batch; each file is still held to MAX_CONTENT_LENGTH
+    BATCH_MAX_CONTENT_LENGTH = int(os.environ.get('BATCH_MAX_CONTENT_LENGTH', 512 * 1024 * 1024))
+    BATCH_MAX_FILES = int(os.environ.get('BATCH_MAX_FILES', 1000))
     GEMINI_API_KEY = os.environ.get('GEMINI_API_KEY')
+    PHISHING_BATCH_MAX_URLS = int(os.environ.get('PHISHING_BATCH_MAX_URLS', 10000))
+    # Coalesce concurrent phishing-checker model calls (useful with threaded workers)
+    PHISHING_MICROBATCH = os.environ.get('PHISHING_MICROBATCH', '0') == '1'
+    PHISHING_MICROBATCH_WINDOW_MS = float(os.environ.get('PHISHING_MICROBATCH_WINDOW_MS', 2.0))
+    PHISHING_MICROBATCH_MAX = int(os.environ.get('PHISHING_MICROBATCH_MAX', 256))
+    # Media scans run in a background process pool (0 = run inline in the request)
+    SCAN_JOB_WORKERS = int(os.environ.get('SCAN_JOB_WORKERS', 2))
+    SCAN_JOB_STREAM_TIMEOUT = int(os.environ.get('SCAN_JOB_STREAM_TIMEOUT', 600))  # seconds
+    # Jobs still queued this long after creation were lost with their process
+    # and are marked as errors (0 = never)
+    SCAN_JOB_STALE_AFTER = int(os.environ.get('SCAN_JOB_STALE_AFTER', 3600))  # seconds
+    # Entries kept in the shared media result cache (least recently used evicted)
+    MEDIA_CACHE_MAX_ENTRIES = int(os.environ.get('MEDIA_CACHE_MAX_ENTRIES', 100000))
+    # Load the phishing model and media analyzers at boot instead of on first use
+    WARM_UP = os.environ.get('WARM_UP', '0') == '1'
+    WARM_UP_TARGETS = [t for t in os.environ.get('WARM_UP_TARGETS', 'phishing,media,chatbot').split(',') if t]
@@ -0,0 +1,33 @@
+import gc
+import multiprocessing
+import os
+
+# gunicorn -c gunicorn.conf.py app:app
+bind = os.environ.get('GUNICORN_BIND', '0.0.0.0:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 1))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 120))
+
+# Import the app once in the master: the phishing model, trusted-domain index
+# and rule tables are built there and shared copy-on-write by every worker
+# instead of each worker loading its own copy
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+GC_FREEZE = os.environ.get('GUNICORN_GC_FREEZE', '1') == '1'
+
+if preload_app and GC_FREEZE:
+    # No collections while the app loads, so freed objects don't leave holes
+    # in the pages the workers are about to share (re-enabled once frozen)
+    gc.disable()
+
+def when_ready(server):
+    if preload_app:
+        from utils.warmup import preload_for_fork, warm_up
+        timings = preload_for_fork() if GC_FREEZE else warm_up(('phishing',))
+        gc.enable()  # the frozen objects are skipped from now on
+        server.log.info("Preloaded for workers: %s", timings)
+
+def post_fork(server, worker):
+    if preload_app:
+        from app import app
+        from utils.warmup import after_fork
+        after_fork(app)
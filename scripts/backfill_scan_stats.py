@@ -0,0 +1,31 @@
+import os
+import sys
+import time
+import argparse
+
+# Add parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from app import app
+from utils.db import db
+from utils.scan_stats import rebuild_scan_stats
+
+def main():
+    """
+    Builds the ScanStats rollup from existing ScanResult rows (creating the
+    table first if needed). Re-running it recomputes the counters, so it
+    also repairs them if they ever drift.
+    """
+    parser = argparse.ArgumentParser(description="Backfills the per-user, per-day scan statistics rollup.")
+    parser.add_argument('--user-id', type=int, help="Only rebuild this user's counters.")
+    args = parser.parse_args()
+
+    with app.app_context():
+        db.create_all()
+        start = time.time()
+        counters = rebuild_scan_stats(args.user_id)
+    scope = f"user {args.user_id}" if args.user_id is not None else "all users"
+    print(f"Rebuilt {counters} scan statistics counters for {scope} in {time.time() - start:.2f}s")
+
+if __name__ == "__main__":
+    main()
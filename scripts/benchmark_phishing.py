@@ -0,0 +1,277 @@
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import resource
+import subprocess
+import tempfile
+import numpy as np
+
+# Add parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+CORPUS_FILE = os.path.join(os.path.dirname(__file__), 'benchmark_urls.txt')
+SYNTHETIC_URLS = 5000
+BATCH_REPEAT = 5
+REGRESSION_THRESHOLD = 0.15  # --compare flags metrics more than 15% worse
+
+# Vocabulary for the synthetic corpus
+_HOSTS = ['google.com', 'paypal.com', 'amazon.com', 'github.com', 'bank-secure.info', 'bit.ly',
+          'account-update.xyz', 'microsoft.com', 'login-verify.top', 'example.org']
+_WORDS = ['login', 'verify', 'account', 'secure', 'update', 'docs', 'search', 'news', 'item',
+          'signin', 'banking', 'confirm', 'wiki', 'watch', 'profile', 'cart']
+
+def load_corpus(path=CORPUS_FILE):
+    """
+    Reads a recorded URL corpus: one URL per line, '#' comments and blank lines skipped.
+    """
+    with open(path, encoding='utf-8') as f:
+        return [line.strip() for line in f if line.strip() and not line.startswith('#')]
+
+def synthetic_corpus(count=SYNTHETIC_URLS, seed=1337):
+    """
+    Deterministic mix of legitimate-looking and phishing-looking URLs
+    (subdomain tricks, IP hosts, '@', long query strings, non-ASCII paths).
+    """
+    rng = random.Random(seed)
+    urls = []
+    for i in range(count):
+        scheme = rng.choice(['https://', 'https://', 'http://'])
+        if rng.random() < 0.05:
+            host = '.'.join(str(rng.randint(1, 254)) for _ in range(4))
+        else:
+            host = rng.choice(_HOSTS)
+            for _ in range(rng.randint(0, 3)):
+                host = rng.choice(_WORDS) + ('-' if rng.random() < 0.3 else '.') + host
+        path = '/'.join(rng.choice(_WORDS) for _ in range(rng.randint(0, 5)))
+        url = f"{scheme}{host}/{path}"
+        if rng.random() < 0.4:
+            url += '?' + '&'.join(f"{rng.choice(_WORDS)}={rng.randint(0, 10 ** 6)}" for _ in range(rng.randint(1, 4)))
+        if rng.random() < 0.03:
+            url = url.replace('://', '://user@', 1)
+        if rng.random() < 0.02:
+            url += '/ünïcödé'
+        urls.append(url + f"#{i}" if rng.random() < 0.1 else url)
+    return urls
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process so far, in MiB.
+    """
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024, 1)
+
+def summarize(samples_ns, total_s, url_count):
+    """
+    Latency percentiles (ms, per call) and throughput for one benchmark.
+    """
+    samples_ms = np.asarray(samples_ns, dtype=np.float64) / 1e6
+    return {
+        'calls': len(samples_ms),
+        'urls': url_count,
+        'p50_ms': round(float(np.percentile(samples_ms, 50)), 4),
+        'p95_ms': round(float(np.percentile(samples_ms, 95)), 4),
+        'p99_ms': round(float(np.percentile(samples_ms, 99)), 4),
+        'urls_per_sec': round(url_count / total_s, 1) if total_s > 0 else None,
+        'peak_rss_mb': peak_rss_mb()
+    }
+
+def time_each(fn, urls):
+    """
+    Calls fn(url) once per URL, timing every call.
+    """
+    samples = []
+    start = time.perf_counter()
+    for url in urls:
+        t0 = time.perf_counter_ns()
+        fn(url)
+        samples.append(time.perf_counter_ns() - t0)
+    return summarize(samples, time.perf_counter() - start, len(urls))
+
+def time_batch(fn, urls, repeat=BATCH_REPEAT):
+    """
+    Calls fn(urls) `repeat` times; latency is per batch call.
+    """
+    samples = []
+    start = time.perf_counter()
+    for _ in range(repeat):
+        t0 = time.perf_counter_ns()
+        fn(urls)
+        samples.append(time.perf_counter_ns() - t0)
+    return summarize(samples, time.perf_counter() - start, len(urls) * repeat)
+
+def build_stand_in_model(path, rounds=20):
+    """
+    Trains a small booster on the synthetic corpus (labelled by a simple
+    keyword/IP rule) so the benchmark runs offline without a trained model.
+    """
+    import xgboost as xgb
+    from utils.phishing_model import PhishingClassifier
+    from utils.phishing_training import XGB_PARAMS
+
+    urls = synthetic_corpus(4000, seed=7)
+    labels = np.array([1 if any(w in u for w in ('login', 'verify', 'secure', '@')) or u.split('/')[2][:1].isdigit() else 0
+                       for u in urls], dtype=np.float32)
+    X = PhishingClassifier().extract_features_batch(urls)
+    booster = xgb.train(XGB_PARAMS, xgb.DMatrix(X, label=labels), num_boost_round=rounds)
+    booster.save_model(path)
+    return path
+
+def time_model_load(source, repeat=5):
+    """
+    Median wall time (ms) of a cold PhishingClassifier.load_model() using the
+    same model files as `source`.
+    """
+    from utils.phishing_model import PhishingClassifier
+
+    samples = []
+    for _ in range(repeat):
+        classifier = PhishingClassifier()
+        classifier.native_model_path = source.native_model_path
+        classifier.model_path = source.model_path
+        t0 = time.perf_counter()
+        classifier.load_model()
+        samples.append(time.perf_counter() - t0)
+    return round(float(np.median(samples)) * 1000, 3)
+
+def git_commit():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(__file__),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    """
+    Runs every benchmark and returns the results dict.
+    """
+    t0 = time.perf_counter()
+    import utils.phishing as phishing
+    import_seconds = time.perf_counter() - t0
+
+    classifier = phishing.classifier
+    model_source = 'utils'
+    stand_in_dir = None
+    if args.stand_in or not phishing.ensure_model():
+        stand_in_dir = tempfile.TemporaryDirectory()
+        print("No trained model found (or --stand-in given); building a stand-in model...")
+        classifier.native_model_path = build_stand_in_model(os.path.join(stand_in_dir.name, 'stand_in.ubj'))
+        classifier.booster = None
+        phishing.model_loaded = classifier.load_model()
+        model_source = 'stand-in'
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'cpu_count': os.cpu_count(),
+        'model': model_source,
+        'import_utils_phishing_ms': round(import_seconds * 1000, 3),
+        'model_load_ms': time_model_load(classifier) if phishing.model_loaded else None,
+        'corpora': {}
+    }
+
+    corpora = {'synthetic': synthetic_corpus(args.synthetic)}
+    if os.path.exists(args.corpus):
+        corpora['recorded'] = load_corpus(args.corpus)
+    else:
+        print(f"Recorded corpus {args.corpus} not found; skipping it.")
+
+    for name, urls in corpora.items():
+        print(f"Benchmarking {name} corpus ({len(urls)} URLs)...")
+        # Warm up imports, regex caches and the booster outside the timed runs
+        classifier.predict_batch(urls[:64])
+        phishing.clear_caches()
+
+        benchmarks = {}
+        benchmarks['extract_features'] = time_each(classifier.extract_features, urls)
+        benchmarks['predict'] = time_each(classifier.predict, urls)
+        phishing.clear_caches()
+        benchmarks['check_url'] = time_each(phishing.check_url, urls)
+        benchmarks['check_url_cached'] = time_each(phishing.check_url, urls)
+        benchmarks['extract_features_batch'] = time_batch(classifier.extract_features_batch, urls, args.repeat)
+        benchmarks['predict_batch'] = time_batch(classifier.predict_batch, urls, args.repeat)
+
+        def check_urls_cold(batch):
+            phishing.clear_caches()
+            return phishing.check_urls(batch)
+        benchmarks['check_urls'] = time_batch(check_urls_cold, urls, args.repeat)
+        results['corpora'][name] = benchmarks
+
+    results['peak_rss_mb'] = peak_rss_mb()
+    if stand_in_dir is not None:
+        stand_in_dir.cleanup()
+    return results
+
+def print_results(results):
+    print(f"\nCommit {results['commit']} | model: {results['model']} | "
+          f"model load: {results['model_load_ms']} ms | import utils.phishing: {results['import_utils_phishing_ms']} ms")
+    header = f"{'benchmark':<32}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'URLs/s':>12}{'RSS MiB':>10}"
+    for name, benchmarks in results['corpora'].items():
+        print(f"\n[{name}]")
+        print(header)
+        for bench, stats in benchmarks.items():
+            print(f"{bench:<32}{stats['p50_ms']:>10}{stats['p95_ms']:>10}{stats['p99_ms']:>10}"
+                  f"{stats['urls_per_sec']:>12}{stats['peak_rss_mb']:>10}")
+    print(f"\nPeak RSS: {results['peak_rss_mb']} MiB")
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """
+    Prints per-benchmark ratios against a previous results file and returns
+    the list of regressions (p50 or throughput more than `threshold` worse).
+    """
+    regressions = []
+    print(f"\nComparison with commit {baseline.get('commit')} (ratio = new / old):")
+    for name, benchmarks in results['corpora'].items():
+        old_benchmarks = baseline.get('corpora', {}).get(name, {})
+        for bench, stats in benchmarks.items():
+            old = old_benchmarks.get(bench)
+            if not old:
+                continue
+            p50 = stats['p50_ms'] / old['p50_ms'] if old['p50_ms'] else float('nan')
+            p99 = stats['p99_ms'] / old['p99_ms'] if old['p99_ms'] else float('nan')
+            rate = stats['urls_per_sec'] / old['urls_per_sec'] if old['urls_per_sec'] else float('nan')
+            flag = ''
+            if p50 > 1 + threshold or rate < 1 - threshold:
+                flag = '  <-- regression'
+                regressions.append(f"{name}/{bench}")
+            print(f"  {name}/{bench:<30} p50 x{p50:.2f}  p99 x{p99:.2f}  URLs/s x{rate:.2f}{flag}")
+    for key in ('model_load_ms', 'peak_rss_mb'):
+        if results.get(key) and baseline.get(key):
+            print(f"  {key:<37} x{results[key] / baseline[key]:.2f}")
+    return regressions
+
+def main():
+    parser = argparse.ArgumentParser(description="Latency/throughput benchmark for the phishing checker.")
+    parser.add_argument('--corpus', default=CORPUS_FILE, help="Recorded URL corpus (one URL per line).")
+    parser.add_argument('--synthetic', type=int, default=SYNTHETIC_URLS, help="Size of the synthetic corpus.")
+    parser.add_argument('--repeat', type=int, default=BATCH_REPEAT, help="Repetitions of each batch benchmark.")
+    parser.add_argument('--stand-in', action='store_true', help="Use a freshly trained stand-in model.")
+    parser.add_argument('--output', help="Write results as JSON to this file.")
+    parser.add_argument('--compare', help="Previous JSON results to compare against.")
+    parser.add_argument('--threshold', type=float, default=REGRESSION_THRESHOLD,
+                        help="Relative slowdown reported as a regression by --compare.")
+    args = parser.parse_args()
+
+    results = run(args)
+    print_results(results)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.threshold)
+        if regressions:
+            print(f"\n{len(regressions)} benchmark(s) regressed by more than {args.threshold:.0%}.")
+            sys.exit(1)
+
+if __name__ == "__main__":
+    main()
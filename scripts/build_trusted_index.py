@@ -0,0 +1,30 @@
+import os
+import sys
+import time
+
+# Add parent directory to sys.path
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from utils.domain_index import DomainIndex
+
+def main():
+    """
+    Compiles a large allowlist (one domain per line, or a Tranco 'rank,domain' CSV)
+    into a .npy index of sorted domain names. Point TRUSTED_DOMAINS_FILE at the output so each
+    worker memory-maps it instead of re-parsing the list at startup.
+    """
+    if len(sys.argv) != 3:
+        print("Usage: python scripts/build_trusted_index.py <allowlist.txt|top-1m.csv> <output.npy>")
+        sys.exit(1)
+
+    source, output = sys.argv[1], sys.argv[2]
+    start = time.time()
+    index = DomainIndex.load(source)
+    index.save(output)
+
+    print(f"Indexed {len(index)} domains from {source} in {time.time() - start:.2f}s -> {output}")
+    if index.rejected:
+        print(f"Skipped {len(index.rejected)} public-suffix entries (e.g. {', '.join(index.rejected[:5])}).")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,159 @@
+import os
+import sys
+import json
+import time
+import signal
+import argparse
+import tempfile
+import subprocess
+import requests
+
+# Add parent directory to sys.path
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.append(ROOT)
+
+# Environment per mode (see gunicorn.conf.py). per-worker reproduces the old
+# behaviour: every worker imports the app and loads its own model.
+MODES = {
+    'per-worker': {'GUNICORN_PRELOAD': '0', 'WARM_UP': '1', 'WARM_UP_TARGETS': 'phishing'},
+    'preload': {'GUNICORN_PRELOAD': '1', 'GUNICORN_GC_FREEZE': '0', 'WARM_UP': '0'},
+    'preload+freeze': {'GUNICORN_PRELOAD': '1', 'GUNICORN_GC_FREEZE': '1', 'WARM_UP': '0'}
+}
+MEMORY_FIELDS = ('Rss', 'Pss', 'Private_Clean', 'Private_Dirty')
+
+def memory_mb(pid):
+    """
+    Rss, Pss and USS (private pages) of a process in MiB, from smaps_rollup.
+    Pss splits shared pages between the processes sharing them, so summing it
+    over master and workers gives the real footprint.
+    """
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            key, _, rest = line.partition(':')
+            if key in MEMORY_FIELDS:
+                values[key] = int(rest.split()[0]) / 1024
+    return {
+        'rss': round(values['Rss'], 1),
+        'pss': round(values['Pss'], 1),
+        'uss': round(values['Private_Clean'] + values['Private_Dirty'], 1)
+    }
+
+def children(pid):
+    found = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f'/proc/{entry}/stat') as f:
+                # Fields after the parenthesised command name: state, ppid, ...
+                ppid = int(f.read().rsplit(')', 1)[1].split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        if ppid == pid:
+            found.append(int(entry))
+    return sorted(found)
+
+def has_mapping(pid, name):
+    try:
+        with open(f'/proc/{pid}/maps') as f:
+            return name in f.read()
+    except OSError:
+        return False
+
+def wait_until(condition, timeout, message):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if condition():
+            return
+        time.sleep(0.2)
+    raise RuntimeError(message)
+
+def exercise(base_url, request_count):
+    """
+    Registers a user and sends phishing-checker batches with fresh URLs, so
+    every worker that answers runs the model and allocates (and collects).
+    """
+    session = requests.Session()
+    session.post(f'{base_url}/register', data={'username': 'rss', 'email': 'rss@example.com', 'password': 'pw'})
+    for i in range(request_count):
+        urls = [f"http://login-verify{i}-{j}.example{j % 7}.top/account?id={i * 100 + j}" for j in range(50)]
+        response = requests.post(f'{base_url}/tools/phishing-checker/batch', json={'urls': urls},
+                                 cookies=session.cookies, timeout=60)
+        response.raise_for_status()
+
+def measure(mode, args, db_path):
+    env = dict(os.environ, **MODES[mode])
+    env.update({
+        'GUNICORN_BIND': f'127.0.0.1:{args.port}',
+        'GUNICORN_WORKERS': str(args.workers),
+        'DATABASE_URL': f'sqlite:///{db_path}',
+        'SCAN_JOB_WORKERS': '0'
+    })
+    master = subprocess.Popen(['gunicorn', '-c', 'gunicorn.conf.py', 'app:app'], cwd=ROOT, env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_until(lambda: len(children(master.pid)) == args.workers, 120, f"{mode}: workers did not start")
+        workers = children(master.pid)
+        # Per-worker mode loads the model after the fork; wait for every worker
+        wait_until(lambda: all(has_mapping(pid, 'libxgboost') for pid in workers), 120,
+                   f"{mode}: workers did not load the model")
+        wait_until(lambda: requests.get(f'http://127.0.0.1:{args.port}/login', timeout=5).ok, 60,
+                   f"{mode}: server not answering")
+        time.sleep(args.settle)
+
+        result = {'mode': mode, 'master': memory_mb(master.pid), 'idle': [memory_mb(pid) for pid in workers]}
+        exercise(f'http://127.0.0.1:{args.port}', args.requests)
+        time.sleep(args.settle)
+        result['loaded'] = [memory_mb(pid) for pid in workers]
+        return result
+    finally:
+        master.send_signal(signal.SIGTERM)
+        master.wait(timeout=60)
+
+def summarize(result):
+    summary = {'mode': result['mode'], 'master_rss': result['master']['rss']}
+    for phase in ('idle', 'loaded'):
+        samples = result[phase]
+        for key in ('rss', 'pss', 'uss'):
+            summary[f'{phase}_{key}'] = round(sum(s[key] for s in samples) / len(samples), 1)
+        summary[f'{phase}_total_pss'] = round(result['master']['pss'] + sum(s['pss'] for s in samples), 1)
+    return summary
+
+def print_summary(summaries, workers):
+    print(f"\nMemory per gunicorn worker ({workers} workers), MiB; total = master + all workers (PSS)")
+    header = f"{'mode':<16}{'RSS':>8}{'PSS':>8}{'USS':>8}{'total':>9}  |{'RSS':>8}{'PSS':>8}{'USS':>8}{'total':>9}"
+    print(f"{'':<16}{'idle':^33}  |{'after requests':^33}")
+    print(header)
+    for s in summaries:
+        print(f"{s['mode']:<16}{s['idle_rss']:>8}{s['idle_pss']:>8}{s['idle_uss']:>8}{s['idle_total_pss']:>9}  |"
+              f"{s['loaded_rss']:>8}{s['loaded_pss']:>8}{s['loaded_uss']:>8}{s['loaded_total_pss']:>9}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Measures RSS/PSS per gunicorn worker with and without a preloaded, gc-frozen master (Linux).")
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--requests', type=int, default=100, help="Phishing-checker batches sent before the second sample.")
+    parser.add_argument('--settle', type=float, default=1.0, help="Seconds to wait before sampling.")
+    parser.add_argument('--modes', default=','.join(MODES), help="Comma-separated subset of: " + ', '.join(MODES))
+    parser.add_argument('--output', help="Write raw samples and summaries as JSON to this file.")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        db_path = os.path.join(tmp, 'rss.db')
+        subprocess.run([sys.executable, '-c', 'from app import app, db\nwith app.app_context(): db.create_all()'],
+                       cwd=ROOT, env=dict(os.environ, DATABASE_URL=f'sqlite:///{db_path}'), check=True)
+        for mode in args.modes.split(','):
+            print(f"Measuring {mode}...")
+            results.append(measure(mode, args, db_path))
+
+    summaries = [summarize(r) for r in results]
+    print_summary(summaries, args.workers)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({'results': results, 'summaries': summaries}, f, indent=2)
+        print(f"Results saved to {args.output}")
+
+if __name__ == "__main__":
+    main()
@@ -4,11 +4,30 @@ import pandas as pd
 import io
 import numpy as np
 import sys
+import argparse
+import codecs
+import hashlib
 
 # Add parent directory to sys.path
 sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
 
-from utils.phishing_model import PhishingClassifier
+from utils.phishing_model import NUM_FEATURES, PhishingClassifier
+from utils.phishing_training import FeatureCache, file_digest
+
+HF_DATASET_URL = "https://huggingface.co/datasets/ealvaradob/phishing-dataset/resolve/main/phishing_dataset.csv"
+HF_SOURCE = 'hf:ealvaradob/phishing-dataset'
+DATASET_DIR = os.path.join(os.path.dirname(__file__), '..', 'datasets')
+
+def parse_hf_csv(text):
+    """
+    Parses the HF CSV into standard 'url'/'label' columns.
+    """
+    df = pd.read_csv(io.StringIO(text))
+    
+    # Standardize columns: 'url', 'label'
+    # HF Status: 'phishing' or 'legitimate'
+    df['label'] = df['status'].apply(lambda x: 1 if x == 'phishing' else 0)
+    return df[['url', 'label']]
 
 def fetch_hf_dataset():
     """
@@ -16,16 +35,10 @@ def fetch_hf_dataset():
     This dataset has 'url' and 'status' columns (phishing/legitimate).
     """
     print("Fetching HuggingFace dataset (ealvaradob/phishing-dataset)...")
-    url = "https://huggingface.co/datasets/ealvaradob/phishing-dataset/resolve/main/phishing_dataset.csv"
     try:
-        response = requests.get(url)
+        response = requests.get(HF_DATASET_URL)
         response.raise_for_status()
-        df = pd.read_csv(io.StringIO(response.text))
-        
-        # Standardize columns: 'url', 'label'
-        # HF Status: 'phishing' or 'legitimate'
-        df['label'] = df['status'].apply(lambda x: 1 if x == 'phishing' else 0)
-        df = df[['url', 'label']]
+        df = parse_hf_csv(response.text)
         
         print(f"HF Dataset loaded: {len(df)} rows.")
         return df
@@ -33,12 +46,153 @@ def fetch_hf_dataset():
         print(f"Error fetching HF dataset: {e}")
         return pd.DataFrame()
 
+def fetch_hf_dataset_cached(cache):
+    """
+    Cached variant of fetch_hf_dataset: sends the stored ETag as If-None-Match,
+    and on 304 (or identical content) reuses the cached features.
+    Returns (df, features) or None.
+    """
+    print("Fetching HuggingFace dataset (ealvaradob/phishing-dataset)...")
+    meta = cache.meta(HF_SOURCE) or {}
+    headers = {'If-None-Match': meta['etag']} if meta.get('etag') else {}
+    try:
+        response = requests.get(HF_DATASET_URL, headers=headers, timeout=120)
+        if response.status_code == 304:
+            cached = cache.lookup(HF_SOURCE, meta.get('content_hash'))
+            if cached is not None:
+                print(f"HF Dataset not modified: {len(cached[0])} rows from feature cache.")
+                return cached
+            # Cache file went missing; download unconditionally
+            response = requests.get(HF_DATASET_URL, timeout=120)
+        response.raise_for_status()
+
+        content_hash = hashlib.blake2b(response.content, digest_size=16).hexdigest()
+        etag = response.headers.get('ETag')
+        cached = cache.lookup(HF_SOURCE, content_hash)
+        if cached is not None:
+            cache.set_meta(HF_SOURCE, etag=etag)
+            print(f"HF Dataset unchanged: {len(cached[0])} rows from feature cache.")
+            return cached
+
+        cached = cache.update(HF_SOURCE, content_hash, parse_hf_csv(response.text), etag=etag)
+        print(f"HF Dataset loaded: {len(cached[0])} rows.")
+        return cached
+    except Exception as e:
+        print(f"Error fetching HF dataset: {e}")
+        # Offline: train on the last downloaded copy if there is one
+        cached = cache.lookup(HF_SOURCE, meta.get('content_hash'))
+        if cached is not None:
+            print(f"Using last cached HF Dataset: {len(cached[0])} rows.")
+        return cached
+
+def normalize_local_frame(df, filename, verbose=True):
+    """
+    Maps a local dataset frame (or a chunk of one) to standard 'url' and 'label'
+    columns (1=phishing, 0=legit), applying each dataset's label convention.
+    Returns None if the url/label columns can't be identified.
+    """
+    # Normalize column names to lower case for easier matching
+    df.columns = [c.strip() for c in df.columns]
+    
+    # Identify URL column
+    url_col = next((c for c in df.columns if 'url' in c.lower()), None)
+    
+    # Identify Label column
+    # Common names: label, type, class, status, ClassLabel
+    label_col = next((c for c in df.columns if any(x in c.lower() for x in ['label', 'type', 'class', 'status'])), None)
+    
+    if not (url_col and label_col):
+        if verbose:
+            print(f"  -> Skipped {filename}: Could not identify 'url' and 'label' columns. Found: {list(df.columns)}")
+        return None
+
+    df = df.rename(columns={url_col: 'url'})
+    
+    # --- Specific Dataset Handling ---
+    
+    # 1. PhiUSIIL & url_features_extracted1.csv & MyDataSET.xlsx
+    # Findings: 
+    # - PhiUSIIL: 1=Legit (StackOverflow), 0=Phishing (Suspicious Google Docs).
+    # - Features: Same.
+    # - MyDataSET: 1=Legit (Wikipedia), 0=Phishing.
+    # We want: 1=Phishing, 0=Legit.
+    # So we must INVERT: 1 -> 0, 0 -> 1.
+    if 'phiusiil' in filename.lower() or 'features' in filename.lower() or 'mydataset' in filename.lower():
+        if verbose:
+            print(f"  -> Processing {filename} (INVERTING: 1=Legit->0, 0=Phish->1)...")
+        # Ensure numeric
+        df['label'] = pd.to_numeric(df[label_col], errors='coerce').fillna(0).astype(int)
+        # Invert
+        df['label'] = df['label'].apply(lambda x: 0 if x == 1 else 1)
+
+    # 2. Phishing URLs.csv
+    # Analysis: "Phishing" -> 1, "Legitimate" -> 0. (Correct as is)
+    elif 'phishing urls.csv' in filename.lower():
+        if verbose:
+            print(f"  -> Processing {filename} (Phishing=1, Legitimate=0)...")
+        df['label'] = df[label_col].apply(lambda x: 1 if str(x).strip().lower() == 'phishing' else 0)
+
+    # 3. URL dataset.csv
+    # Analysis: "phishing" -> 1, "legitimate" -> 0. (Correct as is)
+    elif 'url dataset.csv' in filename.lower():
+        if verbose:
+            print(f"  -> Processing {filename} (legitimate=0, phishing=1)...")
+        df['label'] = df[label_col].apply(lambda x: 1 if str(x).strip().lower() == 'phishing' else 0)
+
+    # 4. Default Heuristic
+    else:
+        if verbose:
+            print(f"  -> Processing {filename} with generic heuristic...")
+        def normalize_label(val):
+            s = str(val).lower().strip()
+            if s in ['1', 'phishing', 'bad', 'malicious', 'unsafe']:
+                return 1
+            if s in ['0', 'legitimate', 'safe', 'good', 'benign']:
+                return 0
+             # Some datasets use -1 for phishing or legit.
+            if s == '-1': 
+                return 1 # Assumption
+            return 0 
+            
+        df['label'] = df[label_col].apply(normalize_label)
+    
+    return df[['url', 'label']]
+
+def read_local_file(filepath, filename):
+    """
+    Reads and normalizes one local CSV/Excel dataset.
+    Returns a 'url'/'label' DataFrame, or None if the file can't be used.
+    """
+    df = None
+    if filename.endswith('.csv'):
+        # Handle potential parsing errors
+        try:
+            df = pd.read_csv(filepath)
+        except:
+            try:
+                 df = pd.read_csv(filepath, encoding='latin1')
+            except:
+                print(f"  -> Could not read {filename} with utf-8 or latin1. Skipping.")
+                return None
+
+    elif filename.endswith('.xlsx') or filename.endswith('.xls'):
+        try:
+            df = pd.read_excel(filepath)
+        except Exception as e:
+            print(f"  -> Skipping Excel file {filename}: {e}")
+            return None
+    
+    if df is not None:
+        print(f"Loading {filename}...")
+        df = normalize_local_frame(df, filename)
+    return df
+
 def load_local_datasets():
     """
     Loads any CSV files found in 'datasets/' folder.
     Expects columns like 'url' and 'type'/'label'.
     """
-    dataset_dir = os.path.join(os.path.dirname(__file__), '..', 'datasets')
+    dataset_dir = DATASET_DIR
     if not os.path.exists(dataset_dir):
         os.makedirs(dataset_dir)
         print(f"Created '{dataset_dir}' folder. Drop your CSVs here (LegitPhish, PhiUSIIL, etc.)!")
@@ -50,90 +204,10 @@ def load_local_datasets():
     for filename in os.listdir(dataset_dir):
         filepath = os.path.join(dataset_dir, filename)
         try:
-            df = None
-            if filename.endswith('.csv'):
-                # Handle potential parsing errors
-                try:
-                    df = pd.read_csv(filepath)
-                except:
-                    try:
-                         df = pd.read_csv(filepath, encoding='latin1')
-                    except:
-                        print(f"  -> Could not read {filename} with utf-8 or latin1. Skipping.")
-                        continue
-
-            elif filename.endswith('.xlsx') or filename.endswith('.xls'):
-                try:
-                    df = pd.read_excel(filepath)
-                except Exception as e:
-                    print(f"  -> Skipping Excel file {filename}: {e}")
-                    continue
-            
+            df = read_local_file(filepath, filename)
             if df is not None:
-                print(f"Loading {filename}...")
-                
-                # Normalize column names to lower case for easier matching
-                df.columns = [c.strip() for c in df.columns]
-                
-                # Identify URL column
-                url_col = next((c for c in df.columns if 'url' in c.lower()), None)
-                
-                # Identify Label column
-                # Common names: label, type, class, status, ClassLabel
-                label_col = next((c for c in df.columns if any(x in c.lower() for x in ['label', 'type', 'class', 'status'])), None)
-                
-                if url_col and label_col:
-                    df = df.rename(columns={url_col: 'url'})
-                    
-                    # --- Specific Dataset Handling ---
-                    
-                    # 1. PhiUSIIL & url_features_extracted1.csv & MyDataSET.xlsx
-                    # Findings: 
-                    # - PhiUSIIL: 1=Legit (StackOverflow), 0=Phishing (Suspicious Google Docs).
-                    # - Features: Same.
-                    # - MyDataSET: 1=Legit (Wikipedia), 0=Phishing.
-                    # We want: 1=Phishing, 0=Legit.
-                    # So we must INVERT: 1 -> 0, 0 -> 1.
-                    if 'phiusiil' in filename.lower() or 'features' in filename.lower() or 'mydataset' in filename.lower():
-                        print(f"  -> Processing {filename} (INVERTING: 1=Legit->0, 0=Phish->1)...")
-                        # Ensure numeric
-                        df['label'] = pd.to_numeric(df[label_col], errors='coerce').fillna(0).astype(int)
-                        # Invert
-                        df['label'] = df['label'].apply(lambda x: 0 if x == 1 else 1)
-
-                    # 2. Phishing URLs.csv
-                    # Analysis: "Phishing" -> 1, "Legitimate" -> 0. (Correct as is)
-                    elif 'phishing urls.csv' in filename.lower():
-                         print(f"  -> Processing {filename} (Phishing=1, Legitimate=0)...")
-                         df['label'] = df[label_col].apply(lambda x: 1 if str(x).strip().lower() == 'phishing' else 0)
-
-                    # 3. URL dataset.csv
-                    # Analysis: "phishing" -> 1, "legitimate" -> 0. (Correct as is)
-                    elif 'url dataset.csv' in filename.lower():
-                        print(f"  -> Processing {filename} (legitimate=0, phishing=1)...")
-                        df['label'] = df[label_col].apply(lambda x: 1 if str(x).strip().lower() == 'phishing' else 0)
-
-                    # 4. Default Heuristic
-                    else:
-                        print(f"  -> Processing {filename} with generic heuristic...")
-                        def normalize_label(val):
-                            s = str(val).lower().strip()
-                            if s in ['1', 'phishing', 'bad', 'malicious', 'unsafe']:
-                                return 1
-                            if s in ['0', 'legitimate', 'safe', 'good', 'benign']:
-                                return 0
-                             # Some datasets use -1 for phishing or legit.
-                            if s == '-1': 
-                                return 1 # Assumption
-                            return 0 
-                            
-                        df['label'] = df[label_col].apply(normalize_label)
-                    
-                    df = df[['url', 'label']]
-                    all_dfs.append(df)
-                    print(f"  -> Added {len(df)} rows from {filename}")
-                else:
-                    print(f"  -> Skipped {filename}: Could not identify 'url' and 'label' columns. Found: {list(df.columns)}")
+                all_dfs.append(df)
+                print(f"  -> Added {len(df)} rows from {filename}")
         except Exception as e:
             print(f"Error reading {filename}: {e}")
                 
@@ -141,12 +215,247 @@ def load_local_datasets():
         return pd.concat(all_dfs, ignore_index=True)
     return pd.DataFrame()
 
+def load_local_datasets_cached(cache):
+    """
+    Cached variant of load_local_datasets: files whose content hash matches the
+    feature cache are not parsed at all; changed files are parsed and only
+    their new URLs go through feature extraction.
+    Returns a list of (df, features) pairs.
+    """
+    if not os.path.exists(DATASET_DIR):
+        os.makedirs(DATASET_DIR)
+        print(f"Created '{DATASET_DIR}' folder. Drop your CSVs here (LegitPhish, PhiUSIIL, etc.)!")
+        return []
+
+    sources = []
+    print(f"Checking '{DATASET_DIR}' for local datasets...")
+    for filename in sorted(os.listdir(DATASET_DIR)):
+        filepath = os.path.join(DATASET_DIR, filename)
+        if not os.path.isfile(filepath) or not filename.endswith(('.csv', '.xlsx', '.xls')):
+            continue
+        try:
+            source = 'file:' + filename
+            content_hash = file_digest(filepath)
+            cached = cache.lookup(source, content_hash)
+            if cached is not None:
+                print(f"  -> {filename} unchanged: {len(cached[0])} rows from feature cache")
+            else:
+                df = read_local_file(filepath, filename)
+                if df is None:
+                    continue
+                reused = cache.reused_rows
+                cached = cache.update(source, content_hash, df)
+                print(f"  -> Added {len(cached[0])} rows from {filename} ({cache.reused_rows - reused} reused from cache)")
+            sources.append((source, cached))
+        except Exception as e:
+            print(f"Error reading {filename}: {e}")
+    return sources
+
+# --- Streaming (out-of-core) mode ---
+
+def stream_hf_dataset(chunksize):
+    """
+    Yields 'url'/'label' chunks of the HuggingFace dataset straight from the
+    HTTP response, without holding the whole CSV in memory.
+    """
+    print("Streaming HuggingFace dataset (ealvaradob/phishing-dataset)...")
+    try:
+        with requests.get(HF_DATASET_URL, stream=True, timeout=60) as response:
+            response.raise_for_status()
+            response.raw.decode_content = True
+            rows = 0
+            for chunk in pd.read_csv(response.raw, chunksize=chunksize):
+                chunk['label'] = (chunk['status'] == 'phishing').astype(int)
+                rows += len(chunk)
+                yield chunk[['url', 'label']]
+            print(f"HF Dataset streamed: {rows} rows.")
+    except Exception as e:
+        print(f"Error streaming HF dataset: {e}")
+
+def iter_excel_chunks(filepath, chunksize):
+    """
+    Yields DataFrame chunks of an Excel sheet. .xlsx files are read row by row
+    with openpyxl's read-only mode; other formats are loaded whole.
+    """
+    try:
+        from openpyxl import load_workbook
+    except ImportError:
+        load_workbook = None
+
+    if load_workbook is None or not filepath.endswith('.xlsx'):
+        df = pd.read_excel(filepath)
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+        return
+
+    workbook = load_workbook(filepath, read_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(c) for c in next(rows)]
+        buffer = []
+        for row in rows:
+            buffer.append(row)
+            if len(buffer) == chunksize:
+                yield pd.DataFrame(buffer, columns=header)
+                buffer = []
+        if buffer:
+            yield pd.DataFrame(buffer, columns=header)
+    finally:
+        workbook.close()
+
+def detect_csv_encoding(filepath, block_size=1 << 20):
+    """
+    'utf-8' if the whole file decodes as UTF-8, else 'latin1' (which decodes
+    anything). Checked in blocks before any row is yielded, so a file isn't
+    half-read in one encoding and then re-read in the other: rows re-read as
+    latin1 are different strings and would get past the duplicate filter.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    try:
+        with open(filepath, 'rb') as f:
+            for block in iter(lambda: f.read(block_size), b''):
+                decoder.decode(block)
+        decoder.decode(b'', final=True)
+    except UnicodeDecodeError:
+        return 'latin1'
+    return 'utf-8'
+
+def stream_local_file(filepath, filename, chunksize):
+    """
+    Yields normalized 'url'/'label' chunks of one local CSV/Excel file.
+    """
+    if filename.endswith('.csv'):
+        encoding = detect_csv_encoding(filepath)
+        if encoding != 'utf-8':
+            print(f"  -> {filename} is not valid utf-8, reading it as {encoding}.")
+        first = True
+        for chunk in pd.read_csv(filepath, chunksize=chunksize, encoding=encoding):
+            chunk = normalize_local_frame(chunk, filename, verbose=first)
+            if chunk is None:
+                return
+            first = False
+            yield chunk
+
+    elif filename.endswith('.xlsx') or filename.endswith('.xls'):
+        first = True
+        for chunk in iter_excel_chunks(filepath, chunksize):
+            chunk = normalize_local_frame(chunk, filename, verbose=first)
+            if chunk is None:
+                return
+            first = False
+            yield chunk
+
+def stream_local_datasets(chunksize):
+    """
+    Yields normalized chunks from every CSV/Excel file in 'datasets/'.
+    """
+    if not os.path.exists(DATASET_DIR):
+        return
+    print(f"Checking '{DATASET_DIR}' for local datasets...")
+    for filename in sorted(os.listdir(DATASET_DIR)):
+        filepath = os.path.join(DATASET_DIR, filename)
+        if not os.path.isfile(filepath):
+            continue
+        print(f"Streaming {filename}...")
+        try:
+            yield from stream_local_file(filepath, filename, chunksize)
+        except Exception as e:
+            print(f"Error reading {filename}: {e}")
+
+def main_stream(args):
+    """
+    Out-of-core training: sources are read in chunks, URLs deduplicated with a
+    Bloom filter, features written to .npy shards, and XGBoost trained from
+    an external-memory DMatrix.
+    """
+    from utils.phishing_training import StreamingDatasetBuilder, train_from_shards
+
+    builder = StreamingDatasetBuilder(args.work_dir, expected_urls=args.expected_urls, feature_workers=args.workers)
+    for source in (stream_hf_dataset(args.chunk_size), stream_local_datasets(args.chunk_size)):
+        for chunk in source:
+            builder.add_chunk(chunk)
+    builder.close()
+
+    unique = builder.train.rows + builder.test.rows
+    print(f"Streamed {builder.total_rows} rows: {unique} unique URLs (removed {builder.duplicates} duplicates).")
+    if builder.train.rows == 0:
+        print("No training data found! Please add datasets to 'datasets/' folder or check internet connection.")
+        return
+
+    positives = builder.train.positives + builder.test.positives
+    print(f"Phishing samples: {positives}")
+    print(f"Legit samples: {unique - positives}")
+
+    print("Training XGBoost model from external memory...")
+    booster, accuracy = train_from_shards(args.work_dir)
+    print(f"Model trained. Accuracy: {accuracy:.4f}")
+
+    classifier = PhishingClassifier()
+    classifier.booster = booster
+    classifier.save_native()
+    # Only the native file is written here; a pickle left from an earlier
+    # in-memory run would hold the previous model (load_model falls back to it)
+    if os.path.exists(classifier.model_path):
+        os.remove(classifier.model_path)
+        print(f"Removed stale {classifier.model_path}")
+    print("Training Complete!")
+
 def main():
+    parser = argparse.ArgumentParser(description="Train the DeepShield phishing URL model.")
+    parser.add_argument('--stream', action='store_true',
+                        help="Out-of-core mode for datasets that don't fit in RAM.")
+    parser.add_argument('--work-dir', default=os.path.join(DATASET_DIR, '.stream_work'),
+                        help="Where streaming mode keeps feature shards and the dedup filter.")
+    parser.add_argument('--chunk-size', type=int, default=200000,
+                        help="Rows read per chunk in streaming mode.")
+    parser.add_argument('--expected-urls', type=int, default=50_000_000,
+                        help="Bloom filter capacity for URL deduplication in streaming mode.")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Feature extraction processes (default: PHISHING_FEATURE_WORKERS or all cores).")
+    parser.add_argument('--cache-dir', default=os.path.join(DATASET_DIR, '.feature_cache'),
+                        help="Per-source feature cache used by in-memory mode.")
+    parser.add_argument('--no-cache', action='store_true',
+                        help="Re-read and re-extract every source instead of using the feature cache.")
+    args = parser.parse_args()
+
+    if args.stream:
+        main_stream(args)
+    else:
+        main_in_memory(args)
+
+def gather_cached_training_data(args):
+    """
+    Loads every source through the feature cache and concatenates them.
+    Returns (df, features).
+    """
+    cache = FeatureCache(args.cache_dir, feature_workers=args.workers)
+    sources = []
+    hf = fetch_hf_dataset_cached(cache)
+    if hf is not None:
+        sources.append((HF_SOURCE, hf))
+    sources.extend(load_local_datasets_cached(cache))
+
+    # Forget deleted files, but keep the HF copy for offline runs
+    cache.prune({source for source, _ in sources} | {HF_SOURCE})
+    print(f"Feature cache: {cache.hits} sources unchanged, {cache.misses} rebuilt, "
+          f"{cache.extracted_rows} rows extracted, {cache.reused_rows} reused.")
+
+    if not sources:
+        return pd.DataFrame(columns=['url', 'label']), np.empty((0, NUM_FEATURES), dtype=np.float32)
+    frames = [df for _, (df, _) in sources]
+    features = [X for _, (_, X) in sources]
+    return pd.concat(frames, ignore_index=True), np.concatenate(features)
+
+def main_in_memory(args):
     # 1. Gather Data
-    hf_data = fetch_hf_dataset()
-    local_data = load_local_datasets()
-    
-    final_df = pd.concat([hf_data, local_data], ignore_index=True)
+    features = None
+    if args.no_cache:
+        hf_data = fetch_hf_dataset()
+        local_data = load_local_datasets()
+        
+        final_df = pd.concat([hf_data, local_data], ignore_index=True)
+    else:
+        final_df, features = gather_cached_training_data(args)
     
     if final_df.empty:
         print("No training data found! Please add datasets to 'datasets/' folder or check internet connection.")
@@ -154,6 +463,8 @@ def main():
 
     # Remove duplicates
     original_len = len(final_df)
+    if features is not None:
+        features = features[~final_df.duplicated(subset=['url']).to_numpy()]
     final_df.drop_duplicates(subset=['url'], inplace=True)
     print(f"Training on {len(final_df)} unique URLs (removed {original_len - len(final_df)} duplicates).")
     
@@ -179,7 +490,8 @@ def main():
     # But user asked to train on provided datasets, so we use all.
 
     classifier = PhishingClassifier()
-    classifier.train(final_df)
+    classifier.feature_workers = args.workers
+    classifier.train(final_df, features=features)
     
     print("Training Complete!")
 
@@ -0,0 +1,89 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import shutil
+import tempfile
+import unittest
+import warnings
+import numpy as np
+import soundfile as sf
+import librosa
+from utils.ai_engine import analyze_audio, audio_features
+
+def reference_features(path, duration=30):
+    # The original full-load computation in analyze_audio
+    y, sr = librosa.load(path, duration=duration)
+    rmse = librosa.feature.rms(y=y)
+    spec_cent = librosa.feature.spectral_centroid(y=y, sr=sr)
+    zcr = librosa.feature.zero_crossing_rate(y)
+    return {
+        'frames': rmse.shape[1],
+        'rmse_mean': float(np.mean(rmse)),
+        'silence_ratio': float(np.sum(rmse < 0.005) / len(rmse[0])),
+        'zcr_std': float(np.std(zcr)),
+        'cent_std': float(np.std(spec_cent))
+    }
+
+def speech_like(sr, seconds, channels=1, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(sr * seconds)) / sr
+    envelope = (np.sin(2 * np.pi * 0.7 * t) > -0.3).astype(np.float32)
+    y = (0.3 * np.sin(2 * np.pi * (180 + 40 * np.sin(2 * np.pi * 3 * t)) * t) + 0.05 * rng.standard_normal(len(t))) * envelope
+    return np.stack([y, 0.8 * y], axis=1) if channels == 2 else y
+
+class TestStreamingAudioFeatures(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        cls.files = {}
+        for name, sr, seconds, channels in [('stereo44k.wav', 44100, 8, 2), ('mono16k.flac', 16000, 40, 1),
+                                            ('native22k.wav', 22050, 3, 1), ('tiny.wav', 8000, 0.05, 1)]:
+            path = os.path.join(cls.tmp, name)
+            sf.write(path, speech_like(sr, seconds, channels), sr)
+            cls.files[name] = path
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def assert_close(self, actual, expected, name):
+        self.assertEqual(actual['frames'], expected['frames'], name)
+        self.assertEqual(actual['silence_ratio'], expected['silence_ratio'], name)
+        for key in ('rmse_mean', 'zcr_std', 'cent_std'):
+            self.assertAlmostEqual(actual[key], expected[key], delta=1e-5 * max(1.0, abs(expected[key])), msg=f"{name} {key}")
+
+    def test_matches_librosa_full_load(self):
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')  # librosa warns on the tiny file's short STFT
+            for name, path in self.files.items():
+                self.assert_close(audio_features(path), reference_features(path), name)
+
+    def test_block_boundaries_do_not_matter(self):
+        path = self.files['stereo44k.wav']
+        whole = audio_features(path, block_seconds=60)
+        for block_seconds in (0.013, 0.37, 1.0):
+            self.assert_close(audio_features(path, block_seconds=block_seconds), whole, str(block_seconds))
+
+    def test_whole_file_mode(self):
+        path = self.files['mono16k.flac']
+        self.assertAlmostEqual(audio_features(path)['seconds'], 30.0, places=2)
+        full = audio_features(path, max_seconds=0)
+        self.assertAlmostEqual(full['seconds'], 40.0, places=2)
+        self.assert_close(full, reference_features(path, duration=None), 'whole file')
+
+    def test_analyze_audio_uses_streaming_features(self):
+        result = analyze_audio(self.files['stereo44k.wav'])
+        self.assertEqual(result['result'], 'Real')
+
+    def test_unreadable_file_is_an_error_result(self):
+        path = os.path.join(self.tmp, 'not_audio.wav')
+        with open(path, 'wb') as f:
+            f.write(b'definitely not audio')
+        with warnings.catch_warnings():
+            warnings.simplefilter('ignore')
+            self.assertEqual(analyze_audio(path)['result'], 'Error')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,195 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import io
+import json
+import wave
+import shutil
+import zipfile
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image
+from sqlalchemy import event
+
+def png_bytes(seed, size=48):
+    rng = np.random.default_rng(seed)
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 255, (size, size, 3), dtype=np.uint8)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+def wav_bytes(seconds=1.0, rate=16000):
+    t = np.arange(int(seconds * rate)) / rate
+    samples = (np.sin(2 * np.pi * 440 * t) * 12000).astype(np.int16)
+    buffer = io.BytesIO()
+    with wave.open(buffer, 'wb') as w:
+        w.setnchannels(1)
+        w.setsampwidth(2)
+        w.setframerate(rate)
+        w.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+def zip_bytes(members):
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_DEFLATED) as archive:
+        for name, data in members.items():
+            archive.writestr(name, data)
+    return buffer.getvalue()
+
+class TestBatchScan(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(cls.tmp, 'batch.db')
+        from werkzeug.security import generate_password_hash
+        from app import app, db
+        from utils.jobs import job_queue
+        from utils.models import User, ScanResult
+        cls.app, cls.db, cls.job_queue, cls.ScanResult = app, db, job_queue, ScanResult
+
+        app.config['TESTING'] = True
+        app.config['UPLOAD_FOLDER'] = cls.tmp
+        with app.app_context():
+            db.create_all()
+            db.session.add(User(username='batch', email='batch@example.com', password_hash=generate_password_hash('pw')))
+            db.session.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.job_queue.shutdown()
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def setUp(self):
+        self.job_queue.workers = 0
+        self.client = self.app.test_client()
+        self.client.post('/login', data={'username': 'batch', 'password': 'pw'})
+        with self.app.app_context():
+            self.ScanResult.query.delete()
+            self.db.session.commit()
+
+    def post(self, files):
+        response = self.client.post('/detect/batch', data={'files': [(io.BytesIO(data), name) for name, data in files]},
+                                    content_type='multipart/form-data')
+        if response.mimetype != 'application/x-ndjson':
+            return response, None
+        return response, [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+
+    def scan_rows(self):
+        with self.app.app_context():
+            return self.ScanResult.query.count()
+
+    def test_mixed_multipart(self):
+        response, lines = self.post([('a.png', png_bytes(1)), ('tone.wav', wav_bytes()), ('notes.txt', b'hello world')])
+        self.assertEqual(response.status_code, 200)
+        summary = lines[-1]['summary']
+        by_name = {line['filename']: line for line in lines[:-1]}
+        self.assertEqual(by_name['notes.txt']['status'], 'rejected')
+        self.assertEqual(by_name['a.png']['scan_type'], 'image')
+        self.assertEqual(by_name['tone.wav']['scan_type'], 'audio')
+        self.assertEqual(by_name['a.png']['status'], 'done')
+        self.assertEqual(sorted(line['index'] for line in lines[:-1]), [0, 1, 2])
+        self.assertEqual(summary['rejected'], 1)
+        self.assertEqual(summary['saved'], 2)
+        self.assertEqual(self.scan_rows(), 2)
+
+    def test_zip_archive_and_cache(self):
+        archive = zip_bytes({
+            'folder/one.png': png_bytes(2),
+            'folder/two.png': png_bytes(3),
+            'folder/copy-of-one.png': png_bytes(2),
+            'folder/.DS_Store': b'junk',
+            '__MACOSX/folder/._one.png': b'junk'
+        })
+        _, lines = self.post([('photos.zip', archive)])
+        summary = lines[-1]['summary']
+        self.assertEqual(summary['files'], 3)
+        self.assertEqual(summary['done'], 3)
+        self.assertEqual(summary['saved'], 3)
+        results = {line['filename']: line['result'] for line in lines[:-1]}
+        self.assertEqual(results['folder_one.png'], results['folder_copy-of-one.png'])
+
+        # Same content again: everything comes from the media cache
+        _, lines = self.post([('photos.zip', archive)])
+        self.assertEqual(lines[-1]['summary']['cached'], 3)
+        self.assertTrue(all(line['cached'] for line in lines[:-1]))
+        self.assertEqual(self.scan_rows(), 6)
+
+    def test_single_bulk_insert(self):
+        inserts = []
+
+        def count(conn, cursor, statement, parameters, context, executemany):
+            if statement.lstrip().upper().startswith('INSERT INTO SCAN_RESULT'):
+                inserts.append(executemany)
+
+        with self.app.app_context():
+            engine = self.db.engine
+        event.listen(engine, 'before_cursor_execute', count)
+        try:
+            _, lines = self.post([(f'{i}.png', png_bytes(100 + i)) for i in range(6)])
+        finally:
+            event.remove(engine, 'before_cursor_execute', count)
+        self.assertEqual(lines[-1]['summary']['saved'], 6)
+        self.assertEqual(len(inserts), 1)
+
+    def test_process_pool(self):
+        self.job_queue.workers = 2
+        _, lines = self.post([(f'{i}.png', png_bytes(200 + i)) for i in range(4)])
+        self.assertEqual(lines[-1]['summary']['done'], 4)
+        self.assertEqual(self.scan_rows(), 4)
+
+    def test_limits(self):
+        response, _ = self.post([])
+        self.assertEqual(response.status_code, 400)
+
+        limit = self.app.config['BATCH_MAX_FILES']
+        self.app.config['BATCH_MAX_FILES'] = 2
+        try:
+            response, _ = self.post([(f'{i}.png', png_bytes(300 + i)) for i in range(3)])
+        finally:
+            self.app.config['BATCH_MAX_FILES'] = limit
+        self.assertEqual(response.status_code, 413)
+
+        # A batch may exceed MAX_CONTENT_LENGTH as a whole, but no single file may
+        limit = self.app.config['MAX_CONTENT_LENGTH']
+        self.app.config['MAX_CONTENT_LENGTH'] = 20000
+        try:
+            _, lines = self.post([('big.png', png_bytes(400, size=128)), ('small.png', png_bytes(401)),
+                                  ('small2.png', png_bytes(402)), ('small3.png', png_bytes(403))])
+        finally:
+            self.app.config['MAX_CONTENT_LENGTH'] = limit
+        status = {line['filename']: line['status'] for line in lines[:-1]}
+        self.assertEqual(status, {'big.png': 'rejected', 'small.png': 'done', 'small2.png': 'done', 'small3.png': 'done'})
+        self.assertEqual(os.listdir(os.path.join(self.tmp, '.spool')), [])
+
+    def test_zip_bomb(self):
+        # 20 MB of zeros deflates to ~20 KB: a 1000:1 ratio
+        bomb = zip_bytes({'one.png': png_bytes(500), 'zeros.png': b'\0' * (20 * 1024 * 1024)})
+        self.assertLess(len(bomb), 100 * 1024)
+        _, lines = self.post([('bomb.zip', bomb)])
+        status = {line['filename']: line['status'] for line in lines[:-1]}
+        self.assertEqual(status, {'one.png': 'done', 'zeros.png': 'rejected'})
+        self.assertIn('zip bomb', next(line['error'] for line in lines if line.get('filename') == 'zeros.png'))
+        self.assertEqual(os.listdir(os.path.join(self.tmp, '.spool')), [])
+
+        # Expanded size counts against the batch limit, checked before extracting
+        limit = self.app.config['BATCH_MAX_CONTENT_LENGTH']
+        self.app.config['BATCH_MAX_CONTENT_LENGTH'] = 20000
+        try:
+            images = []
+            for i in range(4):  # flat BMPs: a small archive that inflates past the limit
+                buffer = io.BytesIO()
+                Image.new('RGB', (64, 64), (i * 60, 0, 0)).save(buffer, format='BMP')
+                images.append(buffer.getvalue())
+            archive = zip_bytes({f'{i}.png': data for i, data in enumerate(images)})
+            self.assertLess(len(archive), 20000)
+            self.assertGreater(sum(len(data) for data in images), 20000)
+            _, lines = self.post([('photos.zip', archive)])
+        finally:
+            self.app.config['BATCH_MAX_CONTENT_LENGTH'] = limit
+        self.assertEqual([(line['filename'], line['status']) for line in lines[:-1]], [('photos.zip', 'rejected')])
+        self.assertEqual(self.scan_rows(), 1)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,50 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import time
+import unittest
+from utils.cache import TTLCache
+
+class TestTTLCache(unittest.TestCase):
+
+    def test_hit_and_miss(self):
+        cache = TTLCache(maxsize=10, ttl=60)
+        self.assertIsNone(cache.get('a'))
+        cache.set('a', 1)
+        self.assertEqual(cache.get('a'), 1)
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_lru_eviction(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')          # 'b' is now least recently used
+        cache.set('c', 3)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('a'), 1)
+        self.assertEqual(cache.stats()['evictions'], 1)
+
+    def test_ttl_expiry(self):
+        cache = TTLCache(maxsize=10, ttl=0.05)
+        cache.set('a', 1)
+        time.sleep(0.1)
+        self.assertIsNone(cache.get('a'))
+        self.assertEqual(cache.stats()['expirations'], 1)
+        self.assertEqual(len(cache), 0)
+
+class TestPhishingVerdictCache(unittest.TestCase):
+
+    def test_repeat_lookup_hits_cache(self):
+        from utils.phishing import check_url, cache_stats, clear_caches
+        clear_caches()
+        first = check_url("https://paypa1.com/login")
+        first['details'].append("mutated by caller")
+        before = cache_stats()['verdicts']['hits']
+        second = check_url("https://paypa1.com/login")
+        self.assertEqual(cache_stats()['verdicts']['hits'], before + 1)
+        self.assertNotIn("mutated by caller", second['details'])
+
+if __name__ == '__main__':
+    unittest.main()
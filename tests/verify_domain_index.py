@@ -0,0 +1,69 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import unittest
+import numpy as np
+from utils.domain_index import DomainIndex, PublicSuffixList
+
+class TestPublicSuffixList(unittest.TestCase):
+
+    def setUp(self):
+        self.psl = PublicSuffixList(['co.uk', 'github.io', '*.ck', '!www.ck'])
+
+    def test_rules(self):
+        self.assertEqual(self.psl.public_suffix('shop.example.co.uk'), 'co.uk')
+        self.assertEqual(self.psl.public_suffix('example.com'), 'com')
+        self.assertEqual(self.psl.public_suffix('a.b.ck'), 'b.ck')
+        self.assertEqual(self.psl.public_suffix('www.ck'), 'ck')
+        self.assertTrue(self.psl.is_public_suffix('github.io'))
+        self.assertFalse(self.psl.is_public_suffix('user.github.io'))
+
+class TestDomainIndex(unittest.TestCase):
+
+    def setUp(self):
+        psl = PublicSuffixList(['co.uk', 'github.io'])
+        self.index = DomainIndex.from_domains(['google.com', 'www.bbc.co.uk', 'co.uk', 'github.io', 'com'], psl)
+
+    def test_matches_same_as_endswith_scan(self):
+        trusted = ['google.com', 'bbc.co.uk']
+        for domain in ['google.com', 'mail.google.com', 'evilgoogle.com', 'google.com.evil.io',
+                       'news.bbc.co.uk', 'other.co.uk', 'google.com:443', '']:
+            expected = any(domain == d or domain.endswith('.' + d) for d in trusted)
+            self.assertEqual(domain in self.index, expected, domain)
+
+    def test_public_suffix_entries_rejected(self):
+        self.assertEqual(sorted(self.index.rejected), ['co.uk', 'com', 'github.io'])
+        self.assertNotIn('attacker.github.io', self.index)
+
+    def test_tranco_csv_and_npy_roundtrip(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            csv_path = os.path.join(tmp, 'top.csv')
+            with open(csv_path, 'w') as f:
+                f.write("1,google.com\n2,facebook.com\n")
+            index = DomainIndex.load(csv_path)
+            npy_path = os.path.join(tmp, 'top.npy')
+            index.save(npy_path)
+            mapped = DomainIndex.load(npy_path)
+            self.assertEqual(len(mapped), 2)
+            self.assertEqual(mapped.match('m.facebook.com'), 'facebook.com')
+            self.assertIsNone(mapped.match('facebook.com.evil.net'))
+
+    def test_entries_compared_as_names(self):
+        index = DomainIndex.from_domains(['ab.com', 'b\u00fccher.de'], PublicSuffixList([]))
+        self.assertEqual(index.match('shop.ab.com'), 'ab.com')
+        self.assertEqual(index.match('www.b\u00fccher.de'), 'b\u00fccher.de')
+        # Longer than the stored names: must not be truncated into a match
+        self.assertIsNone(index.match('ab.comx.net'))
+        self.assertIsNone(index.match('ab.co'))
+
+    def test_hash_only_npy_rejected(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, 'old.npy')
+            np.save(path, np.array([1, 2, 3], dtype=np.uint64))
+            with self.assertRaises(ValueError):
+                DomainIndex.load(path, PublicSuffixList([]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,235 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import shutil
+import tempfile
+import unittest
+import cv2
+import numpy as np
+from PIL import Image, ImageChops, ImageEnhance
+import utils.ai_engine as ai_engine
+from utils.ai_engine import (ELAWorkspace, _brightness_lut, analyze_image, analyze_images, compute_ela, convert_to_ela_image,
+                              ela_mean_error, ela_report, ela_tiled_report)
+from utils.ingest import map_file
+
+def reference_ela(path, quality):
+    # The original temp-file implementation, kept to check bit-exactness
+    resaved_filename = path.rsplit('.', 1)[0] + '.resaved.jpg'
+    im = Image.open(path).convert('RGB')
+    im.save(resaved_filename, 'JPEG', quality=quality)
+    resaved_im = Image.open(resaved_filename)
+    ela_im = ImageChops.difference(im, resaved_im)
+    max_diff = max([ex[1] for ex in ela_im.getextrema()])
+    if max_diff == 0:
+        max_diff = 1
+    ela_im = ImageEnhance.Brightness(ela_im).enhance(255.0 / max_diff)
+    os.remove(resaved_filename)
+    return ela_im
+
+def reference_mean_error(path, quality):
+    ela_cv = cv2.cvtColor(np.array(reference_ela(path, quality)), cv2.COLOR_RGB2BGR)
+    return np.mean(cv2.cvtColor(ela_cv, cv2.COLOR_BGR2GRAY))
+
+class TestInMemoryELA(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        rng = np.random.default_rng(3)
+        y, x = np.mgrid[0:251, 0:333]
+        gradient = np.stack([x % 256, y % 256, (x + y) % 256], axis=-1).astype(np.uint8)
+        noise = rng.integers(0, 255, (120, 160, 3), dtype=np.uint8)
+        cls.images = {}
+
+        def add(name, image, fmt, **kwargs):
+            path = os.path.join(cls.tmp, name)
+            image.save(path, fmt, **kwargs)
+            cls.images[name] = path
+
+        add('noise.png', Image.fromarray(noise), 'PNG')
+        add('gradient.jpg', Image.fromarray(gradient), 'JPEG', quality=75)
+        add('gradient_q95.jpg', Image.fromarray(gradient), 'JPEG', quality=95)
+        add('rgba.png', Image.fromarray(np.dstack([noise, noise[..., 0]])), 'PNG')
+        add('gray.png', Image.fromarray(gradient[..., 0]), 'PNG')
+        add('palette.png', Image.fromarray(gradient).convert('P'), 'PNG')
+        add('solid.png', Image.new('RGB', (64, 64), (128, 128, 128)), 'PNG')
+        add('pixel.png', Image.new('RGB', (1, 1), (10, 200, 30)), 'PNG')
+        add('dotted.name.v2.png', Image.fromarray(noise[:40, :50]), 'PNG')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def test_ela_matches_reference(self):
+        for name, path in self.images.items():
+            for quality in (90, 70):
+                expected = np.asarray(reference_ela(path, quality))
+                np.testing.assert_array_equal(np.asarray(convert_to_ela_image(path, quality)), expected, err_msg=name)
+
+    def test_mean_error_matches_reference(self):
+        for name, path in self.images.items():
+            self.assertEqual(ela_mean_error(path, 90), reference_mean_error(path, 90), name)
+
+    def test_brightness_lut_matches_enhance_for_every_scale(self):
+        ramp = Image.frombytes('RGB', (256, 1), bytes(v for v in range(256) for _ in range(3)))
+        values = np.asarray(ramp)
+        for max_diff in range(1, 256):
+            scale = 255.0 / max_diff
+            expected = np.asarray(ImageEnhance.Brightness(ramp).enhance(scale))
+            np.testing.assert_array_equal(_brightness_lut(scale)[values], expected, err_msg=str(max_diff))
+
+    def test_no_temp_files_left(self):
+        before = set(os.listdir(self.tmp))
+        compute_ela(Image.open(self.images['noise.png']), 90)
+        analyze_image(self.images['gradient.jpg'])
+        self.assertEqual(set(os.listdir(self.tmp)), before)
+
+    def test_analyze_image_result(self):
+        result = analyze_image(self.images['noise.png'])
+        mean_error = reference_mean_error(self.images['noise.png'], 90)
+        self.assertIn(f"ELA Mean Error: {mean_error:.2f}", result['details'])
+
+def reference_report(path, quality, tile_size):
+    # The per-tile loop ela_report used before the workspace
+    with Image.open(path) as im:
+        gray = cv2.cvtColor(compute_ela(im, quality), cv2.COLOR_RGB2GRAY)
+    heatmap = np.array([[gray[y:y + tile_size, x:x + tile_size].mean() for x in range(0, gray.shape[1], tile_size)]
+                        for y in range(0, gray.shape[0], tile_size)])
+    return np.mean(gray), heatmap
+
+class TestELAWorkspace(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        rng = np.random.default_rng(7)
+        y, x = np.mgrid[0:300, 0:410]
+        smooth = np.stack([x % 256, (y * 2) % 256, (x * y) % 256], axis=-1).astype(np.uint8)
+        noise = rng.integers(0, 255, (300, 410, 3), dtype=np.uint8)
+        cls.paths = []
+
+        def add(name, image, fmt, **kwargs):
+            path = os.path.join(cls.tmp, name)
+            image.save(path, fmt, **kwargs)
+            cls.paths.append(path)
+
+        add('smooth.jpg', Image.fromarray(smooth), 'JPEG', quality=80)
+        add('noise.png', Image.fromarray(noise), 'PNG')
+        add('small.png', Image.fromarray(noise[:37, :53]), 'PNG')
+        add('gray.jpg', Image.fromarray(smooth[..., 1]), 'JPEG', quality=70)
+        add('rgba.webp', Image.fromarray(np.dstack([smooth, noise[..., 0]])), 'WEBP', lossless=True)
+        add('palette.bmp', Image.fromarray(smooth).convert('P'), 'BMP')
+        add('cmyk.jpg', Image.fromarray(smooth).convert('CMYK'), 'JPEG', quality=90)  # PIL fallback
+        add('palette.gif', Image.fromarray(noise).convert('P'), 'GIF')  # PIL fallback
+        exif = Image.Exif()
+        exif[0x0112] = 6  # rotate 90 on display; ELA must ignore it like PIL does
+        add('rotated.jpg', Image.fromarray(smooth), 'JPEG', quality=85, exif=exif)
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def test_matches_reference(self):
+        workspace = ELAWorkspace()
+        for path in self.paths:
+            for tile_size in (64, 512):
+                mean_error, heatmap = reference_report(path, 90, tile_size)
+                report = workspace.report(path, 90, tile_size)
+                self.assertEqual(report['mean_error'], mean_error, path)
+                np.testing.assert_array_equal(report['heatmap'], heatmap, err_msg=path)
+
+    def test_buffers_are_reused(self):
+        workspace = ELAWorkspace()
+        workspace.report(self.paths[0], 90)
+        buffers = {name: id(flat) for name, flat in workspace._buffers.items()}
+        for path in self.paths[1:]:
+            workspace.report(path, 90)
+        # Nothing larger than the first (full-size) image: same allocations
+        self.assertEqual({name: id(workspace._buffers[name]) for name in buffers}, buffers)
+
+    def test_analyze_images(self):
+        batch = analyze_images(self.paths + [os.path.join(self.tmp, 'missing.png')])
+        self.assertEqual(batch[:-1], [analyze_image(path) for path in self.paths])
+        self.assertEqual(batch[-1]['result'], 'Error')
+
+    def test_mapped_source(self):
+        with open(self.paths[0], 'rb') as f:
+            contents = f.read()
+        with map_file(self.paths[0]) as data:
+            view = ai_engine._read_bytes(data)
+            self.assertFalse(view.flags.owndata)  # the mapped pages, not a copy
+            self.assertEqual(view.tobytes(), contents)
+            del view  # closing the map fails while a view is exported
+            mapped = ELAWorkspace().report(data, 90)
+        self.assertEqual(mapped['mean_error'], ela_report(self.paths[0], 90)['mean_error'])
+
+class TestTiledELA(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        y, x = np.mgrid[0:480, 0:640]
+        base = np.stack([(x // 3) % 256, (y // 2) % 256, ((x + y) // 4) % 256], axis=-1).astype(np.uint8)
+        cls.clean = os.path.join(cls.tmp, 'clean.jpg')
+        Image.fromarray(base).save(cls.clean, 'JPEG', quality=90)
+
+        # Paste a never-compressed noise patch into one 128px tile of the JPEG
+        spliced = np.asarray(Image.open(cls.clean)).copy()
+        spliced[256:384, 384:512] = np.random.default_rng(5).integers(0, 255, (128, 128, 3), dtype=np.uint8)
+        cls.spliced = os.path.join(cls.tmp, 'spliced.png')
+        Image.fromarray(spliced).save(cls.spliced, 'PNG')
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def test_tiled_mean_close_to_full(self):
+        for path in (self.clean, self.spliced):
+            full = ela_report(path, 90, tile_size=128)
+            tiled = ela_tiled_report(path, 90, tile_size=128)
+            self.assertEqual(tiled['heatmap'].shape, (4, 5))
+            self.assertEqual(full['heatmap'].shape, (4, 5))
+            self.assertLess(abs(tiled['mean_error'] - full['mean_error']), 1.0)
+
+    def test_heatmap_localizes_splice(self):
+        for report in (ela_report(self.spliced, 90, tile_size=128), ela_tiled_report(self.spliced, 90, tile_size=128)):
+            heatmap = report['heatmap']
+            self.assertEqual(np.unravel_index(np.argmax(heatmap), heatmap.shape), (2, 3))
+            self.assertGreater(heatmap[2, 3], 3 * np.median(heatmap))
+
+    def test_tile_size_snaps_to_jpeg_grid(self):
+        self.assertEqual(ela_tiled_report(self.clean, 90, tile_size=100)['tile_size'], 96)
+
+    def test_pre_resize_policy(self):
+        report = ela_tiled_report(self.clean, 90, tile_size=64, max_pixels=40000)
+        self.assertTrue(report['tiled'])
+        self.assertGreaterEqual(report['downscale'], 4.0)  # JPEG draft scales by 1/2, 1/4 or 1/8
+        self.assertLessEqual(report['heatmap'].size, 16)
+        png = ela_tiled_report(self.spliced, 90, tile_size=64, max_pixels=40000)
+        self.assertGreater(png['downscale'], 1.0)
+
+    def test_pixel_cap_bounds_the_decode(self):
+        self.assertEqual(ai_engine.ELA_MAX_PIXELS, 64_000_000)  # on by default
+        large = os.path.join(self.tmp, 'large.jpg')
+        Image.new('RGB', (4000, 3000), (90, 120, 150)).save(large, 'JPEG', quality=90)
+        for max_pixels in (1_000_000, 2_000_000, 3_500_000):
+            with Image.open(large) as opened:
+                im, downscale = ai_engine.downscale_for_ela(opened, max_pixels)
+                self.assertLess(opened.width * opened.height, 4 * max_pixels)  # size the decoder works at
+                self.assertLessEqual(im.width * im.height, max_pixels)
+                self.assertGreater(downscale, 1.0)
+
+    def test_analyze_image_switches_to_tiled(self):
+        old = ai_engine.ELA_TILED_MIN_PIXELS
+        ai_engine.ELA_TILED_MIN_PIXELS = 100000
+        try:
+            result = analyze_image(self.spliced)
+        finally:
+            ai_engine.ELA_TILED_MIN_PIXELS = old
+        self.assertIn('Tiled analysis', result['details'])
+        self.assertEqual(result['heatmap']['tile_size'], ai_engine.ELA_TILE_SIZE)
+        self.assertNotIn('Tiled analysis', analyze_image(self.spliced)['details'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,94 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+import utils.phishing_training as phishing_training
+from utils.phishing_model import PhishingClassifier
+from utils.phishing_training import FeatureCache, file_digest
+
+def make_frame(start, stop):
+    return pd.DataFrame({
+        'url': [f"http://site{i}.example.com/login?id={i}" for i in range(start, stop)],
+        'label': [i % 2 for i in range(start, stop)]
+    })
+
+class TestFeatureCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.tmp.name, 'cache')
+        self.extracted = []
+        self._real_extract = phishing_training.extract_features_parallel
+
+        def counting_extract(urls, workers=None):
+            self.extracted.append(len(urls))
+            return self._real_extract(urls, workers=workers)
+        phishing_training.extract_features_parallel = counting_extract
+
+    def tearDown(self):
+        phishing_training.extract_features_parallel = self._real_extract
+        self.tmp.cleanup()
+
+    def test_unchanged_source_is_served_from_cache(self):
+        df = make_frame(0, 50)
+        FeatureCache(self.cache_dir).update('file:a.csv', 'hash1', df)
+
+        cache = FeatureCache(self.cache_dir)
+        cached_df, X = cache.lookup('file:a.csv', 'hash1')
+        self.assertEqual(self.extracted, [50])
+        self.assertEqual(cached_df['url'].tolist(), df['url'].tolist())
+        self.assertEqual(cached_df['label'].tolist(), df['label'].tolist())
+        np.testing.assert_array_equal(X, PhishingClassifier().extract_features_batch(df['url']))
+        self.assertIsNone(cache.lookup('file:a.csv', 'hash2'))
+
+    def test_changed_source_only_extracts_new_rows(self):
+        FeatureCache(self.cache_dir).update('file:a.csv', 'hash1', make_frame(0, 50))
+
+        grown = pd.concat([make_frame(0, 50), make_frame(50, 60)], ignore_index=True)
+        cache = FeatureCache(self.cache_dir)
+        _, X = cache.update('file:a.csv', 'hash2', grown)
+        self.assertEqual(self.extracted, [50, 10])
+        self.assertEqual(cache.reused_rows, 50)
+        np.testing.assert_array_equal(X, PhishingClassifier().extract_features_batch(grown['url']))
+
+    def test_feature_version_bump_invalidates(self):
+        FeatureCache(self.cache_dir).update('file:a.csv', 'hash1', make_frame(0, 5))
+        manifest_path = os.path.join(self.cache_dir, FeatureCache.MANIFEST)
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+        manifest['file:a.csv']['feature_version'] = -1
+        with open(manifest_path, 'w') as f:
+            json.dump(manifest, f)
+        self.assertIsNone(FeatureCache(self.cache_dir).lookup('file:a.csv', 'hash1'))
+
+    def test_non_ascii_urls_round_trip(self):
+        df = pd.DataFrame({'url': ["https://xn--80ak6aa92e.com/ünïcödé", "http://a.com/\udcff"], 'label': [1, 0]})
+        FeatureCache(self.cache_dir).update('file:u.csv', 'h', df)
+        cached_df, _ = FeatureCache(self.cache_dir).lookup('file:u.csv', 'h')
+        self.assertEqual(cached_df['url'].tolist(), df['url'].tolist())
+
+    def test_prune_and_meta(self):
+        cache = FeatureCache(self.cache_dir)
+        cache.update('file:a.csv', 'h', make_frame(0, 3), etag='"v1"')
+        cache.update('file:b.csv', 'h', make_frame(3, 6))
+        self.assertEqual(cache.meta('file:a.csv')['etag'], '"v1"')
+        cache.prune({'file:b.csv'})
+        cache = FeatureCache(self.cache_dir)
+        self.assertIsNone(cache.meta('file:a.csv'))
+        self.assertIsNotNone(cache.lookup('file:b.csv', 'h'))
+
+    def test_file_digest_tracks_content(self):
+        path = os.path.join(self.tmp.name, 'data.csv')
+        make_frame(0, 10).to_csv(path, index=False)
+        first = file_digest(path)
+        self.assertEqual(first, file_digest(path))
+        make_frame(0, 11).to_csv(path, index=False)
+        self.assertNotEqual(first, file_digest(path))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import subprocess
+import tempfile
+import unittest
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+# Libraries that must only load on first use (or through utils.warmup)
+HEAVY_MODULES = ['xgboost', 'sklearn', 'pandas', 'scipy', 'cv2', 'librosa', 'numba', 'moviepy', 'google.generativeai']
+
+def importtime(code, env=None):
+    """
+    Runs `code` under python -X importtime in a fresh interpreter and returns
+    {module: cumulative microseconds} for everything it imported.
+    """
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=ROOT, env=env,
+                            capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = line[len('import time:'):].split('|')
+        modules[name.strip()] = int(cumulative)
+    return modules
+
+def report(title, modules, top=10):
+    top_level = {name: us for name, us in modules.items() if '.' not in name}
+    print(f"\n{title}: {len(modules)} modules")
+    for name, us in sorted(top_level.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {us / 1000:8.1f} ms  {name}")
+
+class TestImportTime(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.TemporaryDirectory()
+        cls.env = dict(os.environ, DATABASE_URL='sqlite:///' + os.path.join(cls.tmp.name, 'importtime.db'), WARM_UP='0')
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.tmp.cleanup()
+
+    def assert_not_imported(self, modules):
+        loaded = [name for name in HEAVY_MODULES if name in modules]
+        self.assertEqual(loaded, [], f"heavy modules imported at startup: {loaded}")
+
+    def test_app_startup(self):
+        modules = importtime('import app', self.env)
+        report('import app', modules)
+        print(f"  total: {modules['app'] / 1000:.1f} ms")
+        self.assert_not_imported(modules)
+
+    def test_utils_modules(self):
+        for module in ('utils.phishing', 'utils.phishing_model', 'utils.chatbot', 'utils.jobs', 'utils.media_probe'):
+            modules = importtime(f'import {module}', self.env)
+            print(f"\nimport {module}: {modules[module] / 1000:.1f} ms")
+            self.assert_not_imported(modules)
+
+    def test_warm_up_loads_everything(self):
+        code = ("import sys, app; from utils.warmup import warm_up; from utils import phishing\n"
+                "app.job_queue.workers = 0\n"
+                "print(warm_up(), phishing.model_loaded is not None, *[m in sys.modules for m in ('xgboost', 'cv2', 'librosa.filters', 'google.generativeai')])")
+        result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=self.env, capture_output=True, text=True, check=True)
+        print(f"\nwarm_up: {result.stdout.strip()}")
+        self.assertTrue(result.stdout.strip().endswith('True True True True True'))
+
+    def test_warm_up_preloads_scan_workers(self):
+        code = ("from app import job_queue\n"
+                "if __name__ == '__main__':\n"
+                "    pids = job_queue.warm_up()\n"
+                "    print(len(pids), job_queue.workers)\n"
+                "    job_queue.shutdown()\n")
+        env = dict(self.env, SCAN_JOB_WORKERS='2')
+        result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+        workers, configured = result.stdout.split()
+        self.assertGreaterEqual(int(workers), 1)
+        self.assertEqual(configured, '2')
+
+    def test_preload_for_fork(self):
+        # Same sequence gunicorn.conf.py runs: disable gc, import the app,
+        # preload + freeze in the "master", then fork a "worker"
+        code = ("import gc, os, sys\n"
+                "gc.disable()\n"
+                "import app\n"
+                "from utils import phishing\n"
+                "from utils.warmup import preload_for_fork, after_fork\n"
+                "timings = preload_for_fork()\n"
+                "assert timings['frozen_objects'] > 0 and phishing.model_loaded is not None\n"
+                "pid = os.fork()\n"
+                "if pid == 0:\n"
+                "    after_fork(app.app)\n"
+                "    ok = gc.isenabled() and phishing.check_url('http://paypal.com.secure-login.xyz/verify')['result'] != ''\n"
+                "    os._exit(0 if ok else 1)\n"
+                "_, status = os.waitpid(pid, 0)\n"
+                "print(timings['frozen_objects'], os.waitstatus_to_exitcode(status))\n")
+        result = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=self.env, capture_output=True, text=True, check=True)
+        frozen, exit_code = result.stdout.split()
+        print(f"\npreload_for_fork: {frozen} objects frozen")
+        self.assertEqual(exit_code, '0')
+
+if __name__ == '__main__':
+    unittest.main()
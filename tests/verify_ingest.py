@@ -0,0 +1,165 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import io
+import hashlib
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image
+from werkzeug.exceptions import RequestEntityTooLarge
+
+from utils.ingest import SPOOL_DIR, SpoolFile, sniff_media_type, spool_stream, map_file
+
+def png_bytes(seed=0, size=64):
+    rng = np.random.default_rng(seed)
+    buffer = io.BytesIO()
+    Image.fromarray(rng.integers(0, 255, (size, size, 3), dtype=np.uint8)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+class TestSniff(unittest.TestCase):
+
+    def test_magic_numbers(self):
+        cases = {
+            b'\xff\xd8\xff\xe0\x00\x10JFIF': ('image', '.jpg'),
+            b'\x89PNG\r\n\x1a\n\x00\x00': ('image', '.png'),
+            b'RIFF\x00\x00\x00\x00WAVEfmt ': ('audio', '.wav'),
+            b'RIFF\x00\x00\x00\x00AVI LIST': ('video', '.avi'),
+            b'ID3\x04\x00': ('audio', '.mp3'),
+            b'\x00\x00\x00\x20ftypisom': ('video', '.mp4'),
+            b'\x00\x00\x00\x20ftypM4A ': ('audio', '.m4a'),
+            b'\x1a\x45\xdf\xa3\x9f\x42\x82\x84webm': ('video', '.webm'),
+            b'%PDF-1.7': (None, None),
+            b'': (None, None)
+        }
+        for head, expected in cases.items():
+            self.assertEqual(sniff_media_type(head), expected, head)
+
+class TestSpoolFile(unittest.TestCase):
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root, ignore_errors=True)
+
+    def spooled(self):
+        return os.listdir(os.path.join(self.root, SPOOL_DIR))
+
+    def test_commit_is_content_addressed_and_deduplicated(self):
+        data = png_bytes()
+        digest = hashlib.blake2b(data, digest_size=32).hexdigest()
+        paths = []
+        for _ in range(2):
+            spool = spool_stream(io.BytesIO(data), self.root, chunk_size=100)
+            self.assertEqual(spool.media_type, ('image', '.png'))
+            paths.append(spool.commit())
+            self.assertEqual(spool.digest, digest)
+        self.assertEqual(paths[0], paths[1])
+        self.assertEqual(paths[0], os.path.join(self.root, digest[:2], digest + '.png'))
+        with open(paths[0], 'rb') as f:
+            self.assertEqual(f.read(), data)
+        self.assertEqual(self.spooled(), [])
+
+    def test_size_limit(self):
+        spool = SpoolFile(self.root, max_size=1000)
+        spool.write(b'x' * 600)
+        with self.assertRaises(RequestEntityTooLarge):
+            spool.write(b'x' * 600)
+        self.assertEqual(self.spooled(), [])
+
+    def test_uncommitted_spool_is_removed(self):
+        spool = spool_stream(io.BytesIO(b'not media'), self.root)
+        self.assertEqual(len(self.spooled()), 1)
+        spool.close()
+        self.assertEqual(self.spooled(), [])
+
+    def test_map_file(self):
+        path = os.path.join(self.root, 'image.png')
+        with open(path, 'wb') as f:
+            f.write(png_bytes())
+        with map_file(path) as data:
+            with Image.open(data) as im:
+                self.assertEqual(im.size, (64, 64))
+        empty = os.path.join(self.root, 'empty')
+        open(empty, 'wb').close()
+        with map_file(empty) as data:
+            self.assertEqual(data.read(), b'')
+
+    def test_analyzer_accepts_mapped_file(self):
+        from utils.ai_engine import analyze_image
+        path = os.path.join(self.root, 'image.png')
+        with open(path, 'wb') as f:
+            f.write(png_bytes())
+        with map_file(path) as data:
+            mapped = analyze_image(data)
+        self.assertEqual(mapped, analyze_image(path))
+
+class TestUploadEndpoint(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(cls.tmp, 'ingest.db')
+        from werkzeug.security import generate_password_hash
+        from app import app, db
+        from utils.jobs import job_queue
+        from utils.models import User
+        cls.app, cls.job_queue = app, job_queue
+
+        app.config['TESTING'] = True
+        app.config['UPLOAD_FOLDER'] = cls.tmp
+        with app.app_context():
+            db.create_all()
+            db.session.add(User(username='ingest', email='ingest@example.com', password_hash=generate_password_hash('pw')))
+            db.session.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.job_queue.shutdown()
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def setUp(self):
+        self.job_queue.workers = 0
+        self.client = self.app.test_client()
+        self.client.post('/login', data={'username': 'ingest', 'password': 'pw'})
+
+    def upload(self, endpoint, data, filename):
+        return self.client.post(endpoint, data={'file': (io.BytesIO(data), filename)},
+                                content_type='multipart/form-data', headers={'Accept': 'application/json'})
+
+    def spooled(self):
+        directory = os.path.join(self.tmp, SPOOL_DIR)
+        return os.listdir(directory) if os.path.isdir(directory) else []
+
+    def test_image_upload(self):
+        data = png_bytes(seed=1)
+        digest = hashlib.blake2b(data, digest_size=32).hexdigest()
+        response = self.upload('/detect/image', data, 'photo.png')
+        self.assertEqual(response.status_code, 202)
+        self.assertTrue(os.path.exists(os.path.join(self.tmp, digest[:2], digest + '.png')))
+        self.assertEqual(self.client.get(response.get_json()['status_url']).get_json()['status'], 'done')
+        self.assertEqual(self.spooled(), [])
+
+    def test_type_mismatch_is_rejected(self):
+        response = self.upload('/detect/audio', png_bytes(seed=2), 'song.wav')
+        self.assertEqual(response.status_code, 415)
+        self.assertIn('image', response.get_json()['error'])
+        response = self.upload('/detect/image', b'%PDF-1.7 not an image', 'photo.png')
+        self.assertEqual(response.status_code, 415)
+        self.assertEqual(self.spooled(), [])
+
+    def test_too_large(self):
+        limit = self.app.config['MAX_CONTENT_LENGTH']
+        self.app.config['MAX_CONTENT_LENGTH'] = 10000
+        try:
+            response = self.upload('/detect/image', png_bytes(seed=3, size=128), 'big.png')
+        finally:
+            self.app.config['MAX_CONTENT_LENGTH'] = limit
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(self.spooled(), [])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,174 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import io
+import shutil
+import tempfile
+import unittest
+import numpy as np
+from PIL import Image
+
+class TestMediaResultCache(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(cls.tmp, 'media_cache.db')
+        from werkzeug.security import generate_password_hash
+        from app import app, db
+        from utils.jobs import job_queue
+        from utils.models import User
+        cls.app, cls.db, cls.job_queue = app, db, job_queue
+
+        app.config['TESTING'] = True
+        app.config['UPLOAD_FOLDER'] = cls.tmp
+        job_queue.workers = 0  # run analyses inline
+        with app.app_context():
+            db.create_all()
+            for name in ('alice', 'bob'):
+                db.session.add(User(username=name, email=f'{name}@example.com', password_hash=generate_password_hash('pw')))
+            db.session.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def setUp(self):
+        from utils.media_cache import media_cache
+        self.cache = media_cache
+        with self.app.app_context():
+            self.cache.clear()
+        self.cache.hits = self.cache.misses = self.cache.evictions = 0
+        self.cache.max_entries = 100000
+        self.cache._unchecked_inserts = 0
+
+    def make_image(self, seed):
+        buffer = io.BytesIO()
+        rng = np.random.default_rng(seed)
+        Image.fromarray(rng.integers(0, 255, (48, 48, 3), dtype=np.uint8)).save(buffer, 'PNG')
+        return buffer.getvalue()
+
+    def upload(self, username, data, name='viral.png'):
+        client = self.app.test_client()
+        client.post('/login', data={'username': username, 'password': 'pw'})
+        response = client.post('/detect/image', data={'file': (io.BytesIO(data), name)},
+                               content_type='multipart/form-data', headers={'Accept': 'application/json'})
+        self.assertEqual(response.status_code, 202)
+        return response.get_json()
+
+    def test_digest_fits_columns(self):
+        from utils.ingest import spool_stream
+        from utils.models import MediaScanCache, ScanJob
+        spool = spool_stream(io.BytesIO(self.make_image(0)), self.tmp)
+        spool.commit()
+        for column in (ScanJob.digest, MediaScanCache.digest):
+            self.assertLessEqual(len(spool.digest), column.type.length)
+
+    def test_repeat_upload_hits_cache_with_own_scan_result(self):
+        data = self.make_image(1)
+        first = self.upload('alice', data)
+        second = self.upload('bob', data, name='forwarded.png')
+        self.assertFalse(first['cached'])
+        self.assertTrue(second['cached'])
+        self.assertEqual(second['status'], 'done')
+        self.assertEqual(second['result'], first['result'])
+        self.assertNotEqual(second['scan_id'], first['scan_id'])
+
+        from utils.models import ScanResult
+        with self.app.app_context():
+            scan = self.db.session.get(ScanResult, second['scan_id'])
+            self.assertEqual(scan.filename, 'forwarded.png')
+            stats = self.cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['size']), (1, 1, 1))
+        self.assertEqual(stats['hit_rate'], 0.5)
+
+    def test_analyzer_version_bump_misses(self):
+        from utils import media_cache as media_cache_module
+        data = self.make_image(2)
+        self.upload('alice', data)
+        old_version = media_cache_module.ANALYZER_VERSIONS['image']
+        media_cache_module.ANALYZER_VERSIONS['image'] = old_version + 1
+        try:
+            self.assertFalse(self.upload('bob', data)['cached'])
+        finally:
+            media_cache_module.ANALYZER_VERSIONS['image'] = old_version
+
+    def test_analyzer_settings_are_part_of_the_key(self):
+        from utils import media_cache as media_cache_module
+        from utils import ai_engine
+        for settings in media_cache_module.ANALYZER_SETTINGS.values():
+            for name in settings:
+                self.assertTrue(hasattr(ai_engine, name), name)
+        with self.app.app_context():
+            self.cache.set('e' * 64, 'audio', {'result': 'Real', 'confidence': 80.0})
+            old = os.environ.get('AUDIO_MAX_SECONDS')
+            os.environ['AUDIO_MAX_SECONDS'] = '5'
+            try:
+                self.assertIsNone(self.cache.get('e' * 64, 'audio'))
+            finally:
+                if old is None:
+                    del os.environ['AUDIO_MAX_SECONDS']
+                else:
+                    os.environ['AUDIO_MAX_SECONDS'] = old
+            self.assertIsNotNone(self.cache.get('e' * 64, 'audio'))
+
+    def test_lru_eviction(self):
+        self.cache.max_entries = 3
+        images = [self.make_image(10 + i) for i in range(4)]
+        for data in images[:3]:
+            self.upload('alice', data)
+        self.assertTrue(self.upload('alice', images[0])['cached'])  # refresh the oldest entry
+        self.upload('alice', images[3])  # overflows: trims to 90% of max (2 entries)
+        with self.app.app_context():
+            self.assertEqual(self.cache.stats()['size'], 2)
+        self.assertEqual(self.cache.evictions, 2)
+        self.assertTrue(self.upload('bob', images[0])['cached'])
+        self.assertFalse(self.upload('bob', images[1])['cached'])
+
+    def test_hit_count_is_incremented_in_sql(self):
+        from sqlalchemy import text
+        from utils.models import MediaScanCache
+        with self.app.app_context():
+            self.cache.set('d' * 64, 'image', {'result': 'Real', 'confidence': 90.0})
+            stale = MediaScanCache.query.first()  # this session's copy still says 0 hits
+            with self.db.engine.begin() as other_worker:
+                other_worker.execute(text('UPDATE media_scan_cache SET hit_count = 10'))
+            self.assertIsNotNone(self.cache.get('d' * 64, 'image'))
+            self.assertEqual(self.cache.get_many([('d' * 64, 'image')]), {('d' * 64, 'image'): {'result': 'Real', 'confidence': 90.0}})
+            self.assertEqual(self.cache.stats()['lifetime_hits'], 12)
+            del stale
+
+    def test_eviction_counts_rarely_and_deletes_by_id(self):
+        from sqlalchemy import event
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(' '.join(statement.split()).upper())
+
+        self.cache.max_entries = 500  # counted every 5 inserts
+        with self.app.app_context():
+            engine = self.db.engine
+            event.listen(engine, 'before_cursor_execute', record)
+            try:
+                for i in range(520):
+                    self.cache.set(f'{i:064x}', 'image', {'result': 'Real', 'confidence': 1.0})
+            finally:
+                event.remove(engine, 'before_cursor_execute', record)
+            counts = [s for s in statements if s.startswith('SELECT COUNT(*)')]
+            deletes = [s for s in statements if s.startswith('DELETE FROM MEDIA_SCAN_CACHE')]
+            self.assertEqual(len(counts), 520 // 5)
+            self.assertTrue(deletes)
+            self.assertFalse([s for s in deletes if 'SELECT' in s])  # no subquery on the same table (MySQL)
+            self.assertEqual(self.cache.stats()['size'], 465)  # 505 at a check, trimmed to 450, then 15 more
+            self.assertEqual(self.cache.evictions, 55)
+
+    def test_stats_endpoint(self):
+        client = self.app.test_client()
+        client.post('/login', data={'username': 'alice', 'password': 'pw'})
+        stats = client.get('/detect/cache-stats').get_json()
+        self.assertIn('hit_rate', stats)
+        self.assertIn('image', stats['analyzer_versions'])
+
+if __name__ == '__main__':
+    unittest.main()
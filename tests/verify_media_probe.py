@@ -0,0 +1,105 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import io
+import shutil
+import subprocess
+import tempfile
+import unittest
+import imageio_ffmpeg
+from moviepy import VideoFileClip
+from utils import media_probe
+from utils.ai_engine import analyze_video
+from utils.media_probe import probe_video
+
+# (file name, ffmpeg output arguments, lavfi video source, add a sine audio track)
+CLIPS = [
+    ('audio.mp4', ['-t', '2', '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-c:a', 'aac'], 'testsrc=size=320x240:rate=25', True),
+    ('ntsc.mp4', ['-t', '1.5', '-c:v', 'libx264', '-pix_fmt', 'yuv420p'], 'testsrc=size=160x120:rate=30000/1001', False),
+    ('faststart.mp4', ['-t', '1', '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-movflags', '+faststart'], 'testsrc=size=176x144:rate=15', False),
+    ('audio.webm', ['-t', '2', '-c:v', 'libvpx', '-c:a', 'libopus'], 'testsrc=size=320x180:rate=30', True),
+    ('odd_rate.mkv', ['-t', '2', '-c:v', 'mpeg4'], 'testsrc=size=256x144:rate=12.5', False),
+    ('audio.avi', ['-t', '1', '-c:v', 'mpeg4', '-c:a', 'pcm_s16le'], 'testsrc=size=200x100:rate=10', True),
+]
+
+class TestMediaProbe(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        ffmpeg = imageio_ffmpeg.get_ffmpeg_exe()
+        cls.clips = {}
+        for name, args, source, with_audio in CLIPS:
+            path = os.path.join(cls.tmp, name)
+            inputs = ['-f', 'lavfi', '-i', source]
+            if with_audio:
+                inputs += ['-f', 'lavfi', '-i', 'sine=frequency=440']
+            subprocess.run([ffmpeg, '-y', '-loglevel', 'error'] + inputs + args + [path], check=True)
+            cls.clips[name] = path
+
+        # Portrait phone video: display matrix rotated by 90 degrees
+        rotated = os.path.join(cls.tmp, 'rotated.mp4')
+        subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-display_rotation', '90', '-i', cls.clips['faststart.mp4'],
+                        '-c', 'copy', rotated], check=True)
+        cls.clips['rotated.mp4'] = rotated
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def test_matches_moviepy(self):
+        for name, path in self.clips.items():
+            meta = probe_video(path)
+            clip = VideoFileClip(path)
+            try:
+                self.assertEqual(meta['size'], list(clip.size), name)
+                self.assertAlmostEqual(meta['fps'], clip.fps, places=6, msg=name)
+                self.assertAlmostEqual(meta['duration'], clip.duration, delta=0.011, msg=name)
+                self.assertEqual(meta['has_audio'], clip.audio is not None, name)
+            finally:
+                clip.close()
+
+    def test_header_parsers_used(self):
+        self.assertEqual(probe_video(self.clips['audio.mp4'])['container'], 'mp4')
+        self.assertEqual(probe_video(self.clips['rotated.mp4'])['size'], [144, 176])
+        self.assertEqual(probe_video(self.clips['audio.webm'])['container'], 'matroska')
+        self.assertEqual(probe_video(self.clips['odd_rate.mkv'])['container'], 'matroska')
+        self.assertEqual(probe_video(self.clips['audio.avi'])['container'], 'ffmpeg')
+
+    def test_mp4_probe_skips_media_data(self):
+        class CountingFile(io.FileIO):
+            bytes_read = 0
+
+            def read(self, size=-1):
+                data = super().read(size)
+                self.bytes_read += len(data)
+                return data
+
+        for name in ('audio.mp4', 'faststart.mp4'):
+            with CountingFile(self.clips[name]) as f:
+                self.assertIsNotNone(media_probe.probe_mp4(f))
+                self.assertLess(f.bytes_read, os.path.getsize(self.clips[name]) // 4, name)
+
+    def test_broken_header_falls_back(self):
+        path = os.path.join(self.tmp, 'truncated.mp4')
+        with open(self.clips['faststart.mp4'], 'rb') as f:
+            data = f.read()
+        with open(path, 'wb') as f:
+            f.write(data[:len(data) // 2])
+        # moov is intact (faststart), so the header probe still answers
+        self.assertEqual(probe_video(path)['size'], [176, 144])
+        with open(path, 'wb') as f:
+            f.write(b'\x00\x00\x00\x18ftypisom' + b'\x00' * 40)
+        self.assertEqual(analyze_video(path)['result'], 'Error')
+
+    def test_analyze_video_details(self):
+        result = analyze_video(self.clips['ntsc.mp4'])
+        self.assertIn('Resolution: 160x120', result['details'])
+        self.assertIn('Duration: 1.50s', result['details'])
+        self.assertIn('No audio track found', result['details'])
+        self.assertIn('FPS: 25.0', analyze_video(self.clips['audio.mp4'])['details'])
+        self.assertIn('Non-standard variable FPS (12.50)', analyze_video(self.clips['odd_rate.mkv'])['details'])
+
+if __name__ == '__main__':
+    unittest.main()
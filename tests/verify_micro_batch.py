@@ -0,0 +1,136 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import threading
+import unittest
+from concurrent.futures import Future, ThreadPoolExecutor
+from utils.micro_batch import _STOP, MicroBatcher
+
+class TestMicroBatcher(unittest.TestCase):
+
+    def test_coalesces_concurrent_requests(self):
+        calls = []
+        def square_all(items):
+            calls.append(len(items))
+            return [i * i for i in items]
+
+        batcher = MicroBatcher(square_all, max_batch=64, max_delay=0.05)
+        barrier = threading.Barrier(32)
+        def worker(i):
+            barrier.wait()
+            return batcher.submit(i).result(timeout=5)
+
+        with ThreadPoolExecutor(max_workers=32) as pool:
+            results = list(pool.map(worker, range(32)))
+        batcher.stop()
+
+        self.assertEqual(results, [i * i for i in range(32)])
+        self.assertEqual(sum(calls), 32)
+        self.assertLess(len(calls), 32)
+
+    def test_max_batch_respected(self):
+        sizes = []
+        batcher = MicroBatcher(lambda items: (sizes.append(len(items)), items)[1], max_batch=4, max_delay=0.05)
+        futures = [batcher.submit(i) for i in range(10)]
+        self.assertEqual([f.result(timeout=5) for f in futures], list(range(10)))
+        batcher.stop()
+        self.assertTrue(all(size <= 4 for size in sizes))
+
+    def test_errors_propagate_to_callers(self):
+        def fail(items):
+            raise RuntimeError("model unavailable")
+        batcher = MicroBatcher(fail, max_delay=0.001)
+        with self.assertRaises(RuntimeError):
+            batcher.submit('x').result(timeout=5)
+        batcher.stop()
+
+    def test_submit_after_stop_raises(self):
+        batcher = MicroBatcher(lambda items: items, max_delay=0.001)
+        queued = batcher.submit('before')
+        batcher.stop()
+        self.assertEqual(queued.result(timeout=5), 'before')
+        with self.assertRaises(RuntimeError):
+            batcher.submit('after')
+        batcher.stop()  # idempotent
+
+    def test_leftover_items_fail_when_loop_exits(self):
+        batcher = MicroBatcher(lambda items: items, max_delay=0.001)
+        batcher.submit(1).result(timeout=5)
+        thread, late = batcher._thread, Future()
+        batcher._queue.put(_STOP)
+        batcher._queue.put(('late', late))
+        thread.join(timeout=5)
+        with self.assertRaises(RuntimeError):
+            late.result(timeout=1)
+        batcher.stop()
+
+class TestPhishingMicroBatching(unittest.TestCase):
+
+    def test_check_url_unchanged(self):
+        from utils import phishing
+        urls = ["https://paypa1.com/login", "https://www.google.com", "http://10.0.0.1/verify"]
+        phishing.clear_caches()
+        expected = [phishing.check_url(u) for u in urls]
+        phishing.clear_caches()
+        phishing.enable_micro_batching(max_batch=16, max_delay_ms=5)
+        try:
+            with ThreadPoolExecutor(max_workers=3) as pool:
+                self.assertEqual(list(pool.map(phishing.check_url, urls)), expected)
+        finally:
+            phishing.disable_micro_batching()
+
+    def test_malformed_url_fails_only_its_own_caller(self):
+        from utils import phishing
+        good = [f'http://good{i}.example.com/a' for i in range(5)]
+        bad = 'http://[bad/x'
+        phishing.clear_caches()
+        expected = [phishing.check_url(u) for u in good]
+        phishing.clear_caches()
+        batches = []
+        phishing.enable_micro_batching(max_batch=16, max_delay_ms=200)
+        batch_fn = phishing._batcher.batch_fn
+        phishing._batcher.batch_fn = lambda urls: (batches.append(len(urls)), batch_fn(urls))[1]
+        barrier = threading.Barrier(len(good) + 1)
+
+        def check(url):
+            barrier.wait()
+            try:
+                return phishing.check_url(url)
+            except ValueError as e:
+                return e
+
+        try:
+            with ThreadPoolExecutor(max_workers=len(good) + 1) as pool:
+                results = list(pool.map(check, good + [bad]))
+        finally:
+            phishing.disable_micro_batching()
+        if phishing.ensure_model():
+            self.assertIn(len(good) + 1, batches)  # the bad URL really shared a batch
+        self.assertEqual(results[:-1], expected)
+        self.assertIsInstance(results[-1], ValueError)
+
+    def test_predict_one_falls_back(self):
+        from utils import phishing
+        if not phishing.ensure_model():
+            self.skipTest("phishing model not available")
+        url = "https://paypa1.com/login"
+        direct = phishing.classifier.predict(url)
+
+        stopped = MicroBatcher(phishing._predict_many)
+        stopped.stop()
+        release = threading.Event()
+        stuck = MicroBatcher(lambda items: release.wait() and [None] * len(items), max_delay=0.001)
+        old_batcher, old_timeout = phishing._batcher, phishing.MICRO_BATCH_TIMEOUT
+        phishing.MICRO_BATCH_TIMEOUT = 0.2
+        try:
+            for batcher in (stopped, stuck):
+                phishing._batcher = batcher
+                self.assertEqual(phishing._predict_one(url), direct)
+        finally:
+            phishing._batcher, phishing.MICRO_BATCH_TIMEOUT = old_batcher, old_timeout
+            release.set()
+            stuck.stop()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,42 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import pickle
+import tempfile
+import unittest
+import numpy as np
+from utils.phishing_model import PhishingClassifier
+
+URLS = [
+    "https://www.google.com",
+    "http://192.168.1.1/login.html",
+    "http://secure-login-paypal.com.account-update.info/signin",
+    "https://faceb00k.com",
+    "https://example.org/downloads/tool.zip?x=1&y=2",
+]
+
+class TestNativeModel(unittest.TestCase):
+
+    def test_native_matches_pickle(self):
+        classifier = PhishingClassifier()
+        if not os.path.exists(classifier.model_path):
+            self.skipTest("No pickled model available")
+        with open(classifier.model_path, 'rb') as f:
+            legacy = pickle.load(f)
+        expected = legacy.predict_proba(classifier.extract_features_batch(URLS))[:, 1]
+
+        with tempfile.TemporaryDirectory() as tmp:
+            classifier.model = legacy
+            classifier.native_model_path = os.path.join(tmp, 'model.ubj')
+            classifier.save_native()
+
+            native = PhishingClassifier()
+            native.native_model_path = classifier.native_model_path
+            self.assertTrue(native.load_model())
+            self.assertIsNone(native.model)  # loaded without unpickling the sklearn wrapper
+            np.testing.assert_array_equal(native.predict_batch(URLS), expected)
+            self.assertEqual(native.predict(URLS[1]), expected[1])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import shutil
+import tempfile
+import unittest
+from utils.phishing import check_url, check_urls, url_error
+
+URLS = [
+    "https://www.google.com",
+    "https://github.com/rudrakumar7/DeepShield",
+    "http://192.168.1.1/login.html",
+    "http://secure-login-paypal.com.account-update.info/signin",
+    "https://google.com/url?q=http://malicious.com",
+    "https://xn--80ak6aa92e.com",
+    "https://faceb00k.com",
+    "https://paypa1.com",
+    "https://example.org/downloads/tool.zip",
+]
+
+class TestBatchPhishingCheck(unittest.TestCase):
+
+    def test_matches_single_check(self):
+        results = check_urls(URLS)
+        self.assertEqual(len(results), len(URLS))
+        for url, batch_result in zip(URLS, results):
+            self.assertEqual(batch_result, check_url(url), url)
+
+    def test_preserves_input_order(self):
+        reversed_results = check_urls(list(reversed(URLS)))
+        self.assertEqual(reversed_results, list(reversed(check_urls(URLS))))
+
+    def test_empty_batch(self):
+        self.assertEqual(check_urls([]), [])
+
+    def test_url_error(self):
+        self.assertIsNone(url_error("https://www.google.com"))
+        self.assertIn('IPv6', url_error("http://[bad/x"))
+        with self.assertRaises(ValueError):
+            check_urls(["http://ok.example.com", "http://[bad/x"])
+
+class TestBatchRoute(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(cls.tmp, 'phishing.db')
+        from werkzeug.security import generate_password_hash
+        from app import app, db
+        from utils.models import User
+        cls.app = app
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            db.session.add(User(username='urls', email='urls@example.com', password_hash=generate_password_hash('pw')))
+            db.session.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def test_malformed_urls_rejected_with_indexes(self):
+        client = self.app.test_client()
+        client.post('/login', data={'username': 'urls', 'password': 'pw'})
+        urls = ["http://ok.example.com", "http://[bad/x", "https://www.google.com", "https://[::1"]
+        response = client.post('/tools/phishing-checker/batch', json={'urls': urls})
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual([entry['index'] for entry in response.get_json()['invalid']], [1, 3])
+
+        response = client.post('/tools/phishing-checker/batch', json={'urls': [urls[0], urls[2]]})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.get_json()['results'], check_urls([urls[0], urls[2]]))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import random
+import re
+import unittest
+from utils.phishing_rules import AhoCorasick, RuleSet, expand_pattern, load_rules
+
+class TestAhoCorasick(unittest.TestCase):
+
+    def test_matches_naive_substring_search(self):
+        rng = random.Random(1)
+        for _ in range(500):
+            words = [''.join(rng.choice('abc') for _ in range(rng.randint(1, 4))) for _ in range(rng.randint(1, 8))]
+            matcher = AhoCorasick((w, w) for w in words)
+            text = ''.join(rng.choice('abcd') for _ in range(rng.randint(0, 20)))
+            self.assertEqual(matcher.find(text), {w for w in words if w in text})
+
+    def test_expand_pattern(self):
+        self.assertEqual(expand_pattern('g[0o]0gle'), ['g00gle', 'go0gle'])
+        self.assertEqual(expand_pattern('plain'), ['plain'])
+        self.assertEqual(expand_pattern('pay[-.]pal'), ['pay-pal', 'pay.pal'])  # '-' first or last is literal
+
+    def test_regex_syntax_rejected(self):
+        for pattern in ['g[a-z]ogle', 'paypa1.com', 'g[^o]ogle', 'goo+gle', 'g(o|0)ogle', 'g[oo', 'a\\d']:
+            with self.assertRaises(ValueError, msg=pattern) as error:
+                expand_pattern(pattern)
+            self.assertIn(pattern, str(error.exception))
+        with self.assertRaisesRegex(ValueError, "rule for 'google'.*ranges"):
+            RuleSet(typosquatting=[{'target': 'google', 'patterns': ['g[0o]0gle', 'g[a-z]gle']}],
+                    suspicious_keywords=[], redirect_keys=[], suspicious_exts=[])
+
+class TestRuleSet(unittest.TestCase):
+
+    def test_bundled_rules_match_regex_semantics(self):
+        rules = load_rules()
+        patterns = [(r'g[0o]0gle', 'google'), (r'faceb[0o]0k', 'facebook'), (r'paypa[1l]', 'paypal'),
+                    (r'amaz[0o]n', 'amazon'), (r'micr[0o]s[0o]ft', 'microsoft'), (r'app[1l]e', 'apple'),
+                    (r'netf[1l]ix', 'netflix')]
+        for domain in ['g00gle.com', 'google.com', 'paypa1-app1e.net', 'micr0soft.com', 'amazon.com', 'example.org']:
+            expected = [t for p, t in patterns if re.search(p, domain) and t not in domain]
+            self.assertEqual(rules.typosquat_targets(domain), expected, domain)
+        self.assertEqual(rules.keyword_count('http://secure-login.com/verify?free=1'), 4)
+
+    def test_large_brand_list(self):
+        rules = RuleSet(
+            typosquatting=[{'target': f"shop{i:04d}", 'patterns': [f"sh[0o]p{i:04d}"]} for i in range(3000)],
+            suspicious_keywords=[], redirect_keys=[], suspicious_exts=[]
+        )
+        self.assertEqual(rules.typosquat_targets('sh0p2999-login.com'), ['shop2999'])
+        self.assertEqual(rules.typosquat_targets('shop2999.com'), [])
+
+if __name__ == '__main__':
+    unittest.main()
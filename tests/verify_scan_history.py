@@ -0,0 +1,130 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import shutil
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from sqlalchemy import event, insert, text
+from sqlalchemy.dialects import sqlite
+
+class TestScanHistory(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(cls.tmp, 'history.db')
+        from werkzeug.security import generate_password_hash
+        from app import app, db
+        from utils.models import User, ScanResult
+        from utils import scans
+        cls.app, cls.db, cls.ScanResult, cls.scans = app, db, ScanResult, scans
+
+        app.config['TESTING'] = True
+        with app.app_context():
+            db.create_all()
+            for name in ('history', 'other'):
+                db.session.add(User(username=name, email=f'{name}@example.com', password_hash=generate_password_hash('pw')))
+            db.session.commit()
+            cls.user_id = User.query.filter_by(username='history').first().id
+            cls.other_id = User.query.filter_by(username='other').first().id
+
+            # 250 scans in batches of 10 sharing a timestamp (as /detect/batch
+            # writes them), interleaved with another user's scans
+            start = datetime(2024, 1, 1)
+            rows = []
+            for i in range(250):
+                for user_id in (cls.user_id, cls.other_id):
+                    rows.append({'filename': f'{user_id}-{i}.png', 'scan_type': 'image', 'result': 'Real',
+                                 'confidence': 90.0, 'timestamp': start + timedelta(minutes=i // 10), 'user_id': user_id})
+            db.session.execute(insert(ScanResult), rows)
+            db.session.commit()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def login(self, username='history'):
+        client = self.app.test_client()
+        client.post('/login', data={'username': username, 'password': 'pw'})
+        return client
+
+    def expected_order(self, user_id):
+        with self.app.app_context():
+            scans = self.ScanResult.query.filter_by(user_id=user_id).all()
+        return [s.id for s in sorted(scans, key=lambda s: (s.timestamp, s.id), reverse=True)]
+
+    def test_pages_cover_everything_once_in_order(self):
+        client = self.login()
+        seen, cursor, pages = [], None, 0
+        while True:
+            response = client.get('/api/scans', query_string={'limit': 7, **({'cursor': cursor} if cursor else {})})
+            self.assertEqual(response.status_code, 200)
+            page = response.get_json()
+            self.assertLessEqual(len(page['scans']), 7)
+            seen.extend(scan['id'] for scan in page['scans'])
+            pages += 1
+            cursor = page['next_cursor']
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.expected_order(self.user_id))
+        self.assertEqual(pages, 36)  # ceil(250 / 7)
+
+    def test_users_only_see_their_own_scans(self):
+        page = self.login('other').get('/api/scans?limit=100').get_json()
+        self.assertEqual(len(page['scans']), 100)
+        self.assertTrue(all(scan['filename'].startswith(f'{self.other_id}-') for scan in page['scans']))
+
+    def test_limit_is_clamped_and_bad_cursor_rejected(self):
+        client = self.login()
+        self.assertEqual(len(client.get('/api/scans?limit=100000').get_json()['scans']), self.scans.HISTORY_MAX_PAGE_SIZE)
+        self.assertEqual(len(client.get('/api/scans?limit=0').get_json()['scans']), 1)
+        self.assertEqual(client.get('/api/scans?cursor=not-a-cursor').status_code, 400)
+
+    def test_query_walks_the_index(self):
+        with self.app.app_context():
+            timestamp, scan_id = datetime(2024, 1, 1, 0, 12), 120
+            cursor = self.scans.encode_cursor(self.ScanResult(timestamp=timestamp, id=scan_id))
+            for args in ({}, {'cursor': cursor}):
+                query = self._history_query(**args)
+                compiled = query.compile(dialect=sqlite.dialect(), compile_kwargs={'literal_binds': True})
+                plan = ' '.join(row[-1] for row in self.db.session.execute(text(f'EXPLAIN QUERY PLAN {compiled}')))
+                self.assertIn('ix_scan_result_user_timestamp', plan)
+                self.assertNotIn('TEMP B-TREE', plan)  # no sort: rows come out of the index in order
+
+    def _history_query(self, cursor=None):
+        # Capture the SELECT scan_history issues
+        captured = []
+
+        def capture(conn, clauseelement, multiparams, params, execution_options):
+            captured.append(clauseelement)
+
+        engine = self.db.engine
+        event.listen(engine, 'before_execute', capture)
+        try:
+            self.scans.scan_history(self.user_id, limit=20, cursor=cursor)
+        finally:
+            event.remove(engine, 'before_execute', capture)
+        return captured[-1]
+
+    def test_dashboard_feed(self):
+        client = self.login()
+        html = client.get('/dashboard').get_data(as_text=True)
+        self.assertIn(f'{self.user_id}-249.png', html)
+        self.assertIn('loadMoreScans', html)
+
+    def test_ensure_history_index_on_existing_table(self):
+        with self.app.app_context():
+            self.db.session.execute(text('DROP INDEX ix_scan_result_user_timestamp'))
+            self.db.session.commit()
+            self.scans.ensure_history_index()
+            self.scans.ensure_history_index()  # idempotent
+        connection = sqlite3.connect(os.path.join(self.tmp, 'history.db'))
+        names = [row[1] for row in connection.execute("PRAGMA index_list('scan_result')")]
+        connection.close()
+        self.assertIn('ix_scan_result_user_timestamp', names)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,140 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import json
+import shutil
+import tempfile
+import time
+import unittest
+import numpy as np
+from PIL import Image
+
+class TestScanJobs(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(cls.tmp, 'jobs.db')
+        from werkzeug.security import generate_password_hash
+        from app import app, db
+        from utils.jobs import job_queue
+        from utils.models import User
+        cls.app, cls.db, cls.job_queue = app, db, job_queue
+
+        app.config['TESTING'] = True
+        app.config['UPLOAD_FOLDER'] = cls.tmp
+        with app.app_context():
+            db.create_all()
+            db.session.add(User(username='jobs', email='jobs@example.com', password_hash=generate_password_hash('pw')))
+            db.session.add(User(username='other', email='other@example.com', password_hash=generate_password_hash('pw')))
+            db.session.commit()
+
+        cls.image_path = os.path.join(cls.tmp, 'sample.png')
+        rng = np.random.default_rng(0)
+        Image.fromarray(rng.integers(0, 255, (64, 64, 3), dtype=np.uint8)).save(cls.image_path)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.job_queue.shutdown()
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def setUp(self):
+        self.job_queue.workers = 2
+
+    def login(self, username='jobs'):
+        client = self.app.test_client()
+        client.post('/login', data={'username': username, 'password': 'pw'})
+        return client
+
+    def upload(self, client, accept='application/json'):
+        with open(self.image_path, 'rb') as f:
+            return client.post('/detect/image', data={'file': (f, 'sample.png')},
+                               content_type='multipart/form-data', headers={'Accept': accept})
+
+    def wait_for(self, client, job_id, timeout=120):
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            job = client.get(f'/jobs/{job_id}').get_json()
+            if job['status'] in ('done', 'error'):
+                return job
+            time.sleep(0.2)
+        self.fail(f"job {job_id} did not finish")
+
+    def test_upload_returns_job_and_writes_scan_result(self):
+        from utils.models import ScanResult
+        client = self.login()
+        response = self.upload(client)
+        self.assertEqual(response.status_code, 202)
+        job = response.get_json()
+        self.assertIn(job['status'], ('queued', 'done'))
+        self.assertTrue(job['stream_url'].endswith('/stream'))
+
+        job = self.wait_for(client, job['id'])
+        self.assertEqual(job['status'], 'done')
+        self.assertIn('ELA Mean Error', job['result']['details'])
+        with self.app.app_context():
+            scan = self.db.session.get(ScanResult, job['scan_id'])
+            self.assertEqual(scan.filename, 'sample.png')
+            self.assertEqual(scan.confidence, job['result']['confidence'])
+
+    def test_stream_ends_with_done_event(self):
+        client = self.login()
+        job = self.upload(client).get_json()
+        body = client.get(f"/jobs/{job['id']}/stream").get_data(as_text=True)
+        events = [block for block in body.split('\n\n') if block.startswith('event:')]
+        self.assertTrue(events[0].startswith('event: status'))
+        self.assertTrue(events[-1].startswith('event: done'))
+        done = json.loads(events[-1].split('data: ', 1)[1])
+        self.assertEqual(done['status'], 'done')
+
+    def test_stale_queued_jobs_expire(self):
+        # Jobs whose process died before finishing them stay 'queued' in the table
+        from datetime import datetime, timedelta
+        from utils.models import ScanJob, User
+        client = self.login()
+        with self.app.app_context():
+            user_id = User.query.filter_by(username='jobs').first().id
+            old = datetime.utcnow() - timedelta(seconds=self.job_queue.stale_after + 60)
+            for job_id, created_at in (('lost1', old), ('lost2', old), ('lost3', old), ('recent', datetime.utcnow())):
+                self.db.session.add(ScanJob(id=job_id, user_id=user_id, filename='x.png', scan_type='image',
+                                            status='queued', created_at=created_at))
+            self.db.session.commit()
+
+        started = time.monotonic()
+        body = client.get('/jobs/lost1/stream').get_data(as_text=True)
+        self.assertLess(time.monotonic() - started, 5)
+        events = [block for block in body.split('\n\n') if block.startswith('event:')]
+        self.assertTrue(events[-1].startswith('event: done'))
+        self.assertEqual(json.loads(events[-1].split('data: ', 1)[1])['status'], 'error')
+
+        job = client.get('/jobs/lost2').get_json()
+        self.assertEqual(job['status'], 'error')
+        self.assertIn('still queued', job['result']['details'])
+
+        with self.app.app_context():
+            self.assertEqual(self.job_queue.expire_stale(), 1)  # lost3; 'recent' is left alone
+            self.assertEqual(self.db.session.get(ScanJob, 'recent').status, 'queued')
+            self.db.session.delete(self.db.session.get(ScanJob, 'recent'))
+            self.db.session.commit()
+
+    def test_jobs_are_private(self):
+        job = self.upload(self.login()).get_json()
+        other = self.login('other')
+        self.assertEqual(other.get(f"/jobs/{job['id']}").status_code, 404)
+        self.assertEqual(other.get(f"/jobs/{job['id']}/stream").status_code, 404)
+
+    def test_inline_mode_renders_result(self):
+        self.job_queue.workers = 0
+        response = self.upload(self.login(), accept='text/html')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'Detection Result:', response.data)
+        self.assertIn(b'ELA Mean Error', response.data)
+
+    def test_missing_file(self):
+        client = self.login()
+        response = client.post('/detect/image', data={}, headers={'Accept': 'application/json'})
+        self.assertEqual(response.status_code, 400)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,156 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import io
+import shutil
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+import numpy as np
+from PIL import Image
+from sqlalchemy import event, insert
+
+def analysis(result, confidence):
+    return {'result': result, 'confidence': confidence}
+
+class TestScanStats(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        os.environ['DATABASE_URL'] = 'sqlite:///' + os.path.join(cls.tmp, 'stats.db')
+        from werkzeug.security import generate_password_hash
+        from app import app, db
+        from utils.jobs import job_queue
+        from utils.models import User, ScanResult, ScanStats
+        from utils import scan_stats, scans
+        cls.app, cls.db, cls.job_queue = app, db, job_queue
+        cls.ScanResult, cls.ScanStats, cls.scan_stats, cls.scans = ScanResult, ScanStats, scan_stats, scans
+
+        app.config['TESTING'] = True
+        app.config['UPLOAD_FOLDER'] = cls.tmp
+        with app.app_context():
+            db.create_all()
+            db.session.add(User(username='stats', email='stats@example.com', password_hash=generate_password_hash('pw')))
+            db.session.commit()
+            cls.user_id = User.query.filter_by(username='stats').first().id
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.job_queue.shutdown()
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def setUp(self):
+        self.job_queue.workers = 0
+        with self.app.app_context():
+            self.ScanResult.query.delete()
+            self.ScanStats.query.delete()
+            self.db.session.commit()
+
+    def login(self):
+        client = self.app.test_client()
+        client.post('/login', data={'username': 'stats', 'password': 'pw'})
+        return client
+
+    def group_by_stats(self):
+        # What the rollup replaces: aggregating ScanResult itself
+        stats = {}
+        for scan in self.ScanResult.query.filter_by(user_id=self.user_id):
+            entry = stats.setdefault((scan.timestamp.date(), scan.scan_type, scan.result), [0, 0.0])
+            entry[0] += 1
+            entry[1] += scan.confidence
+        return stats
+
+    def rollup(self):
+        return {(c.day, c.scan_type, c.result): [c.count, c.confidence_sum]
+                for c in self.ScanStats.query.filter_by(user_id=self.user_id)}
+
+    def test_counters_follow_writes(self):
+        with self.app.app_context():
+            self.scans.save_scan_result(self.user_id, 'a.png', 'image', analysis('No Obvious Manipulation', 80.0))
+            self.scans.save_scan_result(self.user_id, 'b.png', 'image', analysis('No Obvious Manipulation', 60.0))
+            self.scans.save_scan_result(self.user_id, 'c.wav', 'audio', analysis('Fake/Synthetic', 95.5))
+            self.scans.save_scan_results(self.user_id, [('d.png', 'image', analysis('Potential Manipulation Detected', 70.0)),
+                                                        ('e.mp4', 'video', analysis('Real', 88.0)),
+                                                        ('f.mp4', 'video', analysis('Real', 90.0))])
+            self.assertEqual(self.rollup(), self.group_by_stats())
+            self.assertEqual(len(self.rollup()), 4)
+
+    def test_counters_roll_back_with_the_scan(self):
+        with self.app.app_context():
+            self.scans.save_scan_result(self.user_id, 'a.png', 'image', analysis('Real', 50.0), commit=False)
+            self.db.session.rollback()
+            self.assertEqual(self.ScanStats.query.count(), 0)
+
+    def test_upload_updates_rollup(self):
+        rng = np.random.default_rng(0)
+        buffer = io.BytesIO()
+        Image.fromarray(rng.integers(0, 255, (32, 32, 3), dtype=np.uint8)).save(buffer, format='PNG')
+        client = self.login()
+        for _ in range(2):  # the second upload is a media cache hit
+            response = client.post('/detect/image', data={'file': (io.BytesIO(buffer.getvalue()), 'x.png')},
+                                   content_type='multipart/form-data', headers={'Accept': 'application/json'})
+            self.assertEqual(response.status_code, 202)
+        stats = client.get('/api/scans/stats').get_json()
+        self.assertEqual(stats['total'], 2)
+        self.assertEqual(stats['by_type']['image']['count'], 2)
+        self.assertEqual(stats['daily'][-1]['count'], 2)
+        with self.app.app_context():
+            self.assertEqual(self.rollup(), self.group_by_stats())
+
+    def test_backfill(self):
+        with self.app.app_context():
+            start = datetime(2024, 3, 1, 12)
+            rows = [{'filename': f'{i}.png', 'scan_type': ('image', 'audio', 'video')[i % 3],
+                     'result': ('Real', 'Suspicious', 'Fake/Synthetic', 'Error')[i % 4], 'confidence': float(i % 100),
+                     'timestamp': start + timedelta(hours=i), 'user_id': self.user_id} for i in range(500)]
+            self.db.session.execute(insert(self.ScanResult), rows)
+            self.db.session.commit()
+            self.assertEqual(self.ScanStats.query.count(), 0)  # raw inserts bypass the rollup
+
+            counters = self.scan_stats.rebuild_scan_stats()
+            self.assertEqual(counters, len(self.group_by_stats()))
+            self.assertEqual(self.rollup(), self.group_by_stats())
+            self.assertEqual(self.scan_stats.rebuild_scan_stats(self.user_id), counters)  # re-runnable
+            self.assertEqual(self.rollup(), self.group_by_stats())
+
+    def test_stats_read_only_the_rollup(self):
+        with self.app.app_context():
+            today = datetime.utcnow()
+            self.scans.save_scan_results(self.user_id, [('a.png', 'image', analysis('Potential Manipulation Detected', 90.0)),
+                                                        ('b.png', 'image', analysis('No Obvious Manipulation', 70.0)),
+                                                        ('c.wav', 'audio', analysis('Suspicious', 60.0))])
+            old = [{'filename': 'old.png', 'scan_type': 'image', 'result': 'Real', 'confidence': 10.0,
+                    'timestamp': today - timedelta(days=40), 'user_id': self.user_id}]
+            self.db.session.execute(insert(self.ScanResult), old)
+            self.db.session.commit()
+            self.scan_stats.rebuild_scan_stats(self.user_id)
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        with self.app.app_context():
+            engine = self.db.engine
+        client = self.login()
+        event.listen(engine, 'before_cursor_execute', record)
+        try:
+            stats = client.get('/api/scans/stats?days=7').get_json()
+        finally:
+            event.remove(engine, 'before_cursor_execute', record)
+
+        self.assertFalse([s for s in statements if 'FROM scan_result' in s])
+        self.assertEqual(stats['total'], 4)
+        image = stats['by_type']['image']
+        self.assertEqual((image['count'], image['verdicts']['real'], image['verdicts']['fake']), (3, 2, 1))
+        self.assertEqual(image['avg_confidence'], round((90.0 + 70.0 + 10.0) / 3, 2))
+        self.assertEqual(stats['by_type']['audio']['verdicts']['suspicious'], 1)
+        self.assertEqual(len(stats['daily']), 7)
+        self.assertEqual(stats['daily'][-1]['date'], today.date().isoformat())
+        self.assertEqual((stats['daily'][-1]['count'], stats['daily'][-1]['avg_confidence']), (3, 73.33))
+        self.assertEqual(sum(day['count'] for day in stats['daily']), 3)  # the 40-day-old scan is outside the window
+        self.assertIn('Scan Statistics', client.get('/dashboard').get_data(as_text=True))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,86 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import tempfile
+import unittest
+import numpy as np
+import pandas as pd
+from utils.phishing_training import BloomFilter, FeatureShardWriter, StreamingDatasetBuilder, iter_shards, train_from_shards
+
+class TestBloomFilter(unittest.TestCase):
+
+    def test_drops_duplicates_across_and_within_chunks(self):
+        bloom = BloomFilter(10000, error_rate=0.001)
+        first = bloom.add_new(pd.Series(['a.com', 'b.com', 'a.com']))
+        second = bloom.add_new(pd.Series(['b.com', 'c.com']))
+        self.assertEqual(first.tolist(), [True, True, False])
+        self.assertEqual(second.tolist(), [False, True])
+
+    def test_false_positive_rate(self):
+        bloom = BloomFilter(20000, error_rate=0.01)
+        bloom.add_new(pd.Series([f"https://seen{i}.com" for i in range(20000)]))
+        fresh = bloom.add_new(pd.Series([f"https://unseen{i}.com" for i in range(20000)]))
+        self.assertGreater(fresh.mean(), 0.97)
+
+class TestShards(unittest.TestCase):
+
+    def test_writer_splits_into_shards(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            writer = FeatureShardWriter(tmp, shard_rows=4)
+            X = np.arange(10 * 18, dtype=np.float32).reshape(10, 18)
+            writer.append(X[:7], np.ones(7))
+            writer.append(X[7:], np.zeros(3))
+            self.assertEqual(writer.close(), 3)
+            shards = list(iter_shards(tmp))
+            np.testing.assert_array_equal(np.concatenate([s[0] for s in shards]), X)
+            self.assertEqual(sum(len(s[1]) for s in shards), 10)
+
+    def test_end_to_end_external_memory_training(self):
+        phishing = [f"http://10.0.{i % 250}.{i % 200}/verify-account-{i}" for i in range(3000)]
+        legit = [f"https://www.site{i}.com/" for i in range(3000)]
+        df = pd.DataFrame({'url': phishing + legit, 'label': [1] * 3000 + [0] * 3000}).sample(frac=1, random_state=1)
+        with tempfile.TemporaryDirectory() as tmp:
+            builder = StreamingDatasetBuilder(tmp, expected_urls=10000, shard_rows=1000)
+            for start in range(0, len(df), 1500):
+                builder.add_chunk(df.iloc[start:start + 1500])
+            builder.add_chunk(df.iloc[:500])  # duplicates are dropped
+            builder.close()
+            self.assertEqual(builder.train.rows + builder.test.rows, 6000)
+            self.assertEqual(builder.duplicates, 500)
+            booster, accuracy = train_from_shards(tmp, num_boost_round=10)
+            self.assertGreater(accuracy, 0.95)
+
+class TestLocalFileStreaming(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..', 'scripts')))
+        import train_phishing
+        cls.train_phishing = train_phishing
+
+    def stream(self, path):
+        return pd.concat(self.train_phishing.stream_local_file(path, os.path.basename(path), 1000))
+
+    def test_encoding_decided_before_any_row(self):
+        with tempfile.TemporaryDirectory() as tmp:
+            # The non-UTF-8 byte sits well past pandas' first read buffer
+            path = os.path.join(tmp, 'mixed.csv')
+            with open(path, 'wb') as f:
+                f.write(b'url,label\n')
+                f.write(b''.join(b'http://caf\xc3\xa9%d.example.com/,0\n' % i for i in range(50000)))
+                f.write(b'http://bad\xe9.example.com/,1\n')
+            self.assertEqual(self.train_phishing.detect_csv_encoding(path, block_size=4096), 'latin1')
+            urls = self.stream(path)['url']
+            self.assertEqual(len(urls), 50001)
+            self.assertFalse(urls.duplicated().any())
+            self.assertEqual(urls.iloc[-1], 'http://bad\xe9.example.com/')
+
+            path = os.path.join(tmp, 'utf8.csv')
+            with open(path, 'wb') as f:
+                f.write('url,label\nhttp://caf\u00e9.example.com/,0\n'.encode('utf-8'))
+            self.assertEqual(self.train_phishing.detect_csv_encoding(path, block_size=7), 'utf-8')  # splits the \u00e9
+            self.assertEqual(self.stream(path)['url'].tolist(), ['http://caf\u00e9.example.com/'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,103 @@
+import sys
+import os
+sys.path.append(os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+import inspect
+import shutil
+import subprocess
+import tempfile
+import unittest
+import cv2
+import imageio_ffmpeg
+import numpy as np
+import utils.ai_engine as ai_engine
+from utils.ai_engine import analyze_video, sample_frames, temporal_report
+
+class TestFrameSampling(unittest.TestCase):
+
+    @classmethod
+    def setUpClass(cls):
+        cls.tmp = tempfile.mkdtemp()
+        ffmpeg = imageio_ffmpeg.get_ffmpeg_exe()
+        cls.clean = os.path.join(cls.tmp, 'clean.mp4')
+        subprocess.run([ffmpeg, '-y', '-loglevel', 'error', '-f', 'lavfi', '-i', 'testsrc=size=320x240:rate=25',
+                        '-f', 'lavfi', '-i', 'sine', '-t', '12', '-c:v', 'libx264', '-pix_fmt', 'yuv420p', '-c:a', 'aac',
+                        cls.clean], check=True)
+
+        # A moving ball with a burst of noise every 7th frame
+        cls.flicker = os.path.join(cls.tmp, 'flicker.mp4')
+        rng = np.random.default_rng(0)
+        writer = cv2.VideoWriter(cls.flicker, cv2.VideoWriter_fourcc(*'mp4v'), 25, (320, 240))
+        for i in range(150):
+            frame = np.full((240, 320, 3), 90, dtype=np.uint8)
+            cv2.circle(frame, (40 + i * 2, 120), 30, (0, 200, 255), -1)
+            if i % 7 == 3:
+                frame = rng.integers(0, 255, frame.shape, dtype=np.uint8)
+            writer.write(frame)
+        writer.release()
+
+    @classmethod
+    def tearDownClass(cls):
+        shutil.rmtree(cls.tmp, ignore_errors=True)
+
+    def test_frames_are_decoded_lazily(self):
+        samples = sample_frames(self.clean, 8)
+        self.assertTrue(inspect.isgenerator(samples))
+        index, frame, next_frame = next(samples)
+        samples.close()
+        self.assertEqual(index, 0)
+        self.assertEqual(frame.shape, (240, 320, 3))
+        self.assertEqual(next_frame.shape, frame.shape)
+
+    def test_seek_matches_sequential_decode(self):
+        seeked = list(sample_frames(self.clean, 6))  # stride 50: seeks
+        old = ai_engine.VIDEO_SEEK_MIN_STRIDE
+        ai_engine.VIDEO_SEEK_MIN_STRIDE = 10 ** 9
+        try:
+            walked = list(sample_frames(self.clean, 6))
+        finally:
+            ai_engine.VIDEO_SEEK_MIN_STRIDE = old
+        self.assertEqual([s[0] for s in seeked], [0, 50, 100, 150, 200, 250])
+        self.assertEqual([s[0] for s in walked], [s[0] for s in seeked])
+        for a, b in zip(seeked, walked):
+            np.testing.assert_array_equal(a[1], b[1])
+            np.testing.assert_array_equal(a[2], b[2])
+
+    def test_frames_are_downscaled(self):
+        old = ai_engine.VIDEO_FRAME_MAX_SIDE
+        ai_engine.VIDEO_FRAME_MAX_SIDE = 160
+        try:
+            _, frame, _ = next(sample_frames(self.clean, 4))
+        finally:
+            ai_engine.VIDEO_FRAME_MAX_SIDE = old
+        self.assertEqual(frame.shape, (120, 160, 3))
+
+    def test_clean_clip_stops_early(self):
+        report = temporal_report(self.clean, max_frames=64)
+        self.assertFalse(report['inconsistent'])
+        self.assertTrue(report['stopped_early'])
+        self.assertEqual(report['frames'], ai_engine.VIDEO_MIN_FRAMES)
+
+    def test_flicker_is_inconsistent(self):
+        report = temporal_report(self.flicker, max_frames=64)
+        self.assertTrue(report['inconsistent'])
+        self.assertGreater(report['anomaly_rate'], ai_engine.VIDEO_ANOMALY_RATE)
+        self.assertLess(report['frames'], 64)
+
+    def test_time_budget(self):
+        report = temporal_report(self.clean, max_frames=64, time_budget=1e-6)
+        self.assertTrue(report['timed_out'])
+        self.assertEqual(report['frames'], 0)
+        self.assertFalse(report['inconsistent'])
+
+    def test_analyze_video_uses_frames(self):
+        clean = analyze_video(self.clean)
+        self.assertEqual(clean['result'], 'Real')
+        self.assertIn('Frames sampled: 16 (early stop)', clean['details'])
+        flicker = analyze_video(self.flicker)
+        self.assertEqual(flicker['result'], 'Suspicious')
+        self.assertIn('Temporal inconsistencies', flicker['details'])
+        self.assertTrue(flicker['temporal']['inconsistent'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,96 +1,480 @@
+import io
 import cv2
 import numpy as np
-from PIL import Image, ImageChops, ImageEnhance
+from PIL import Image, ImageEnhance
 import os
+import math
+import mmap
 import random
+import time
+import threading
+from itertools import islice
 
-def convert_to_ela_image(path, quality):
+# Tiled ELA: images above ELA_TILED_MIN_PIXELS are recompressed tile by tile
+# (tiles are multiples of 16px so they stay on the JPEG MCU grid), and images
+# above ELA_MAX_PIXELS (64 MP, ~190 MB as RGB; 0 disables) are downscaled
+# before analysis so the decoded image a worker holds stays bounded
+ELA_TILE_SIZE = 512
+ELA_TILED_MIN_PIXELS = 16_000_000
+ELA_MAX_PIXELS = int(os.environ.get('ELA_MAX_PIXELS', 64_000_000)) or None
+# cv2's fixed-point RGB->gray weights (out of 1 << 14)
+_GRAY_WEIGHTS = np.array([4899, 9617, 1868], dtype=np.float64) / (1 << 14)
+# Formats and PIL modes that cv2.imdecode turns into exactly the pixels of
+# PIL's convert('RGB') (in BGR order); anything else is decoded by PIL
+_CV2_DECODE_FORMATS = {'JPEG', 'PNG', 'BMP', 'TIFF', 'WEBP'}
+_CV2_DECODE_MODES = {'RGB', 'RGBA', 'L', 'LA', 'P', '1'}
+
+def _brightness_lut(scale):
     """
-    Generates an ELA image by saving the image at a specific quality 
-    and calculating the difference between the original and the compressed version.
+    256-entry table equal to ImageEnhance.Brightness(...).enhance(scale) per
+    value. Built by PIL itself so float rounding and clipping match exactly.
+    """
+    ramp = Image.frombytes('L', (256, 1), bytes(range(256)))
+    return np.frombuffer(ImageEnhance.Brightness(ramp).enhance(scale).tobytes(), dtype=np.uint8)
+
+def _open_image(source):
+    """
+    Image.open for a path or a file object (such as the mmap the scan
+    workers pass in); file objects are rewound so they can be reopened.
+    """
+    if hasattr(source, 'seek'):
+        source.seek(0)
+    return Image.open(source)
+
+def compute_ela(image, quality):
     """
-    filename = path
-    resaved_filename = filename.split('.')[0] + '.resaved.jpg'
-    ELA_filename = filename.split('.')[0] + '.ela.png'
-    
-    im = Image.open(filename).convert('RGB')
-    im.save(resaved_filename, 'JPEG', quality=quality)
-    resaved_im = Image.open(resaved_filename)
-    
-    ela_im = ImageChops.difference(im, resaved_im)
-    
-    extrema = ela_im.getextrema()
-    max_diff = max([ex[1] for ex in extrema])
+    In-memory Error Level Analysis: recompresses the image into a BytesIO
+    JPEG, takes the per-channel absolute difference and stretches it so the
+    largest error maps to 255. Returns an RGB uint8 array.
+    """
+    im = image.convert('RGB')
+    buffer = io.BytesIO()
+    im.save(buffer, 'JPEG', quality=quality)
+    buffer.seek(0)
+    original = np.asarray(im)
+    resaved = np.asarray(Image.open(buffer).convert('RGB'))
+
+    ela = cv2.absdiff(original, resaved)
+    max_diff = int(ela.max()) if ela.size else 0
     if max_diff == 0:
         max_diff = 1
     scale = 255.0 / max_diff
-    
-    ela_im = ImageEnhance.Brightness(ela_im).enhance(scale)
-    
-    # Cleanup temp file
-    try:
-        os.remove(resaved_filename)
-    except:
-        pass
-        
-    return ela_im
+    return cv2.LUT(ela, _brightness_lut(scale), dst=ela)
+
+def convert_to_ela_image(path, quality):
+    """
+    Generates an ELA image by saving the image at a specific quality 
+    and calculating the difference between the original and the compressed version.
+    """
+    with _open_image(path) as im:
+        return Image.fromarray(compute_ela(im, quality))
+
+def ela_mean_error(path, quality):
+    """
+    Mean grayscale intensity of the ELA image of `path`.
+    """
+    return ela_report(path, quality)['mean_error']
+
+def _tile_size(tile_size):
+    return max(16, tile_size // 16 * 16)
+
+def _read_bytes(source):
+    if isinstance(source, (str, os.PathLike)):
+        return np.fromfile(source, dtype=np.uint8)
+    if isinstance(source, mmap.mmap):
+        # A view of the mapped pages, no copy. It must be released before
+        # the map is closed, so don't keep it beyond the decode
+        return np.frombuffer(source, dtype=np.uint8)
+    source.seek(0)
+    return np.frombuffer(source.read(), dtype=np.uint8)
+
+class ELAWorkspace:
+    """
+    Reusable buffers for full-resolution ELA over many images. JPEG
+    recompression goes through cv2.imencode/imdecode on BGR arrays (the same
+    libjpeg-turbo settings PIL uses, so results are bit-identical to
+    compute_ela), the error is computed in place in the decoded original and
+    the grayscale error and per-tile sums go to named buffers that grow to
+    the largest image seen and are reused after that. Per image that leaves
+    two decoded frames (original and recompressed) instead of about six
+    full-size copies. Not thread-safe; ela_workspace() gives one per thread.
+    """
+    def __init__(self):
+        self._buffers = {}
+
+    def buffer(self, name, shape, dtype=np.uint8):
+        """
+        A `shape` view of the named buffer, reallocated only when it grows.
+        """
+        size = math.prod(shape)
+        flat = self._buffers.get(name)
+        if flat is None or flat.size < size or flat.dtype != dtype:
+            flat = self._buffers[name] = np.empty(size, dtype=dtype)
+        return flat[:size].reshape(shape)
+
+    @property
+    def nbytes(self):
+        return sum(flat.nbytes for flat in self._buffers.values())
+
+    def decode(self, source):
+        """
+        Decodes a path or file object to a BGR uint8 array, pixel for pixel
+        what PIL's convert('RGB') gives.
+        """
+        with _open_image(source) as im:
+            if im.format in _CV2_DECODE_FORMATS and im.mode in _CV2_DECODE_MODES:
+                # IGNORE_ORIENTATION: PIL doesn't apply EXIF rotation either
+                image = cv2.imdecode(_read_bytes(source), cv2.IMREAD_COLOR | cv2.IMREAD_IGNORE_ORIENTATION)
+                if image is not None:
+                    return image
+            rgb = np.asarray(im.convert('RGB'))
+        return cv2.cvtColor(rgb, cv2.COLOR_RGB2BGR, dst=self.buffer('bgr', rgb.shape))
+
+    def tile_means(self, gray, tile_size):
+        """
+        Mean of every tile_size x tile_size tile and of the whole image, from
+        two reduceat passes (rows, then columns) instead of a slice per tile.
+        """
+        height, width = gray.shape
+        ys, xs = np.arange(0, height, tile_size), np.arange(0, width, tile_size)
+        rows = np.add.reduceat(gray, ys, axis=0, dtype=np.float64, out=self.buffer('rows', (len(ys), width), np.float64))
+        sums = np.add.reduceat(rows, xs, axis=1)
+        counts = np.outer(np.minimum(tile_size, height - ys), np.minimum(tile_size, width - xs))
+        return sums / counts, sums.sum() / gray.size
+
+    def report(self, source, quality, tile_size=ELA_TILE_SIZE):
+        """
+        Same result as ela_report, computed in this workspace.
+        """
+        image = self.decode(source)
+        ok, encoded = cv2.imencode('.jpg', image, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if not ok:
+            raise ValueError("JPEG recompression failed")
+        ela = cv2.absdiff(image, cv2.imdecode(encoded, cv2.IMREAD_COLOR), dst=image)
+        cv2.LUT(ela, _brightness_lut(255.0 / (int(ela.max()) or 1)), dst=ela)
+        gray = cv2.cvtColor(ela, cv2.COLOR_BGR2GRAY, dst=self.buffer('gray', ela.shape[:2]))
+        del image, ela
+        tile_size = _tile_size(tile_size)
+        heatmap, mean_error = self.tile_means(gray, tile_size)
+        return {'mean_error': mean_error, 'heatmap': heatmap, 'tile_size': tile_size, 'tiled': False, 'downscale': 1.0}
+
+_workspaces = threading.local()
+
+def ela_workspace():
+    """
+    The calling thread's ELAWorkspace, so scan workers reuse their buffers
+    from one image to the next.
+    """
+    workspace = getattr(_workspaces, 'ela', None)
+    if workspace is None:
+        workspace = _workspaces.ela = ELAWorkspace()
+    return workspace
+
+def ela_report(path, quality, tile_size=ELA_TILE_SIZE):
+    """
+    Full-resolution ELA: global mean grayscale error plus a heatmap of the
+    mean error per tile_size x tile_size tile.
+    """
+    return ela_workspace().report(path, quality, tile_size)
+
+def downscale_for_ela(im, max_pixels):
+    """
+    Pre-resize policy: shrinks an opened image to at most max_pixels.
+    JPEGs use draft() so the decoder itself scales by 1/2, 1/4 or 1/8 (the
+    full-size image is never decoded, and up to 256 x max_pixels what is
+    decoded stays under 4 x max_pixels); any remaining excess is removed with an integer box
+    reduce(). Other formats can only be decoded whole, so for them the
+    bound is PIL's decompression bomb limit (Image.MAX_IMAGE_PIXELS).
+    Returns (image, downscale factor).
+    Note that downscaling averages away some compression artifacts.
+    """
+    width, height = im.size
+    if not max_pixels or width * height <= max_pixels:
+        return im, 1.0
+    factor = math.sqrt(width * height / max_pixels)
+    if im.format == 'JPEG':
+        im.draft('RGB', (math.ceil(width / factor), math.ceil(height / factor)))
+    if im.width * im.height > max_pixels:
+        im = im.reduce(math.ceil(math.sqrt(im.width * im.height / max_pixels)))
+    return im, width / im.width
+
+def ela_tiled_report(path, quality, tile_size=ELA_TILE_SIZE, max_pixels=ELA_MAX_PIXELS):
+    """
+    Tiled ELA with bounded working memory: each tile is cropped, recompressed
+    and diffed on its own, keeping only per-channel error histograms per tile.
+    The global brightness stretch is applied to the histograms at the end, so
+    one pass gives the mean error and the per-tile heatmap. Besides the
+    decoded image, which max_pixels bounds (see downscale_for_ela), memory
+    is O(tile) plus 3x256 counters per tile.
+    Tiles are recompressed independently, so values near tile borders (and
+    the gray mean, computed with cv2's weights) differ slightly from ela_report.
+    """
+    tile_size = _tile_size(tile_size)
+    with _open_image(path) as opened:
+        im, downscale = downscale_for_ela(opened, max_pixels)
+        im.load()
+    width, height = im.size
+    rows, cols = math.ceil(height / tile_size), math.ceil(width / tile_size)
+    hists = np.zeros((rows, cols, 3, 256), dtype=np.int64)
+    max_diff = 0
+    buffer = io.BytesIO()
+
+    for r in range(rows):
+        for c in range(cols):
+            box = (c * tile_size, r * tile_size, min((c + 1) * tile_size, width), min((r + 1) * tile_size, height))
+            # Mode conversion is per pixel, so converting each tile avoids a
+            # second full-size copy
+            tile = im.crop(box).convert('RGB')
+            buffer.seek(0)
+            buffer.truncate()
+            tile.save(buffer, 'JPEG', quality=quality)
+            buffer.seek(0)
+            diff = cv2.absdiff(np.asarray(tile), np.asarray(Image.open(buffer).convert('RGB')))
+            max_diff = max(max_diff, int(diff.max()))
+            for channel in range(3):
+                hists[r, c, channel] = np.bincount(diff[..., channel].ravel(), minlength=256)
+
+    lut = _brightness_lut(255.0 / (max_diff or 1)).astype(np.float64)
+    channel_sums = hists @ lut                         # (rows, cols, 3) sums of stretched errors
+    gray_sums = channel_sums @ _GRAY_WEIGHTS           # (rows, cols)
+    pixel_counts = hists[:, :, 0, :].sum(axis=2)
+    return {
+        'mean_error': float(gray_sums.sum() / pixel_counts.sum()),
+        'heatmap': gray_sums / pixel_counts,
+        'tile_size': tile_size,
+        'tiled': True,
+        'downscale': round(downscale, 3)
+    }
+
+def _heatmap_summary(report):
+    heatmap = report['heatmap']
+    row, col = np.unravel_index(np.argmax(heatmap), heatmap.shape)
+    return {
+        'tile_size': report['tile_size'],
+        'downscale': report['downscale'],
+        'values': np.round(heatmap, 2).tolist(),
+        'max_tile': {'row': int(row), 'col': int(col), 'mean_error': round(float(heatmap[row, col]), 2)}
+    }
+
+def _image_report(source, workspace):
+    # Very large images go through the tiled path to bound memory
+    with _open_image(source) as im:
+        pixels = im.width * im.height
+    if pixels > ELA_TILED_MIN_PIXELS or (ELA_MAX_PIXELS and pixels > ELA_MAX_PIXELS):
+        return ela_tiled_report(source, 90)
+    return workspace.report(source, 90)
+
+def analyze_images(filepaths, workspace=None):
+    """
+    Performs Error Level Analysis (ELA) on a batch of images, reusing one
+    ELAWorkspace for all of them. Returns one result per image, in order.
+    """
+    workspace = workspace or ela_workspace()
+    results = []
+    for filepath in filepaths:
+        try:
+            # Calculate mean intensity of ELA
+            # Higher mean intensity generally implies more compression artifacts or manipulation
+            report = _image_report(filepath, workspace)
+            mean_error = report['mean_error']
+
+            # Simple heuristic threshold
+            # In a real system, a CNN would analyze the ELA image
+            threshold = 25.0
+
+            is_fake = mean_error > threshold
+            confidence = min(100.0, (mean_error / threshold) * 50.0 + 50.0) if is_fake else min(100.0, (1 - mean_error/threshold) * 50.0 + 50.0)
+
+            result_text = 'Potential Manipulation Detected' if is_fake else 'No Obvious Manipulation'
+            risk_level = 'High' if is_fake else 'Low'
+            details = f"ELA Mean Error: {mean_error:.2f} (Threshold: {threshold}). High error levels often indicate resaving or modification."
+            heatmap = _heatmap_summary(report)
+            if report['tiled']:
+                details += f" Tiled analysis ({len(heatmap['values'])}x{len(heatmap['values'][0])} tiles"
+                details += f", downscaled {heatmap['downscale']}x)." if report['downscale'] > 1 else ")."
+
+            results.append({
+                'result': result_text,
+                'confidence': round(confidence, 2),
+                'details': details,
+                'risk_level': risk_level,
+                'heatmap': heatmap
+            })
+
+        except Exception as e:
+            print(f"Error in analyze_image: {e}")
+            results.append({
+                'result': 'Error',
+                'confidence': 0.0,
+                'details': f"Analysis failed: {str(e)}",
+                'risk_level': 'Unknown'
+            })
+    return results
 
 def analyze_image(filepath):
     """
     Performs Error Level Analysis (ELA) on the uploaded image.
     """
-    try:
-        ela_image = convert_to_ela_image(filepath, 90)
-        
-        # Convert PIL image to OpenCV format
-        ela_cv = cv2.cvtColor(np.array(ela_image), cv2.COLOR_RGB2BGR)
-        
-        # Calculate mean intensity of ELA
-        # Higher mean intensity generally implies more compression artifacts or manipulation
-        gray_ela = cv2.cvtColor(ela_cv, cv2.COLOR_BGR2GRAY)
-        mean_error = np.mean(gray_ela)
-        
-        # Simple heuristic threshold
-        # In a real system, a CNN would analyze the ELA image
-        threshold = 25.0 
-        
-        is_fake = mean_error > threshold
-        confidence = min(100.0, (mean_error / threshold) * 50.0 + 50.0) if is_fake else min(100.0, (1 - mean_error/threshold) * 50.0 + 50.0)
-        
-        result_text = 'Potential Manipulation Detected' if is_fake else 'No Obvious Manipulation'
-        risk_level = 'High' if is_fake else 'Low'
-        
-        return {
-            'result': result_text,
-            'confidence': round(confidence, 2),
-            'details': f"ELA Mean Error: {mean_error:.2f} (Threshold: {threshold}). High error levels often indicate resaving or modification.",
-            'risk_level': risk_level
-        }
-        
-    except Exception as e:
-        print(f"Error in analyze_image: {e}")
-        return {
-            'result': 'Error',
-            'confidence': 0.0,
-            'details': f"Analysis failed: {str(e)}",
-            'risk_level': 'Unknown'
-        }
+    return analyze_images([filepath])[0]
 
 # Audio/Video Imports
 import librosa
-from moviepy import VideoFileClip
+import soundfile as sf
+import soxr
+from .media_probe import probe_video
+
+# Streaming audio analysis: same rate and framing as librosa's defaults
+# (librosa.load -> 22.05 kHz, 2048-sample frames, 512 hop, centered frames)
+AUDIO_SR = 22050
+AUDIO_FRAME_LENGTH = 2048
+AUDIO_HOP_LENGTH = 512
+AUDIO_BLOCK_SECONDS = 10
+# Seconds of audio analyzed per file (0 = the whole file)
+AUDIO_MAX_SECONDS = float(os.environ.get('AUDIO_MAX_SECONDS', 30))
+
+class _RunningStats:
+    """
+    Streaming count/mean/variance (Chan et al. pairwise merge of per-block
+    moments), so std over millions of frames needs no stored history.
+    """
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+
+    def update(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        if values.size == 0:
+            return
+        count = values.size
+        mean = values.mean()
+        m2 = np.sum((values - mean) ** 2)
+        delta = mean - self.mean
+        total = self.count + count
+        self.mean += delta * count / total
+        self.m2 += m2 + delta ** 2 * self.count * count / total
+        self.count = total
+
+    def std(self):
+        return float(np.sqrt(self.m2 / self.count)) if self.count else 0.0
+
+def _audio_blocks(filepath, max_seconds=AUDIO_MAX_SECONDS, block_seconds=AUDIO_BLOCK_SECONDS):
+    """
+    Yields mono float32 blocks resampled to AUDIO_SR in a single decode pass:
+    soundfile reads fixed-size blocks and soxr resamples them as a stream
+    (same 'HQ' filter librosa.load uses, so the samples are identical).
+    Formats libsndfile can't read fall back to one librosa.load call.
+    """
+    try:
+        f = sf.SoundFile(filepath)
+    except sf.SoundFileRuntimeError:
+        y, _ = librosa.load(filepath, sr=AUDIO_SR, duration=max_seconds or None)
+        yield y
+        return
+
+    with f:
+        sr_native = f.samplerate
+        remaining = int(max_seconds * sr_native) if max_seconds else -1
+        resampler = soxr.ResampleStream(sr_native, AUDIO_SR, 1, dtype='float32', quality='HQ') if sr_native != AUDIO_SR else None
+        blocksize = max(int(block_seconds * sr_native), 1)
+        while remaining != 0:
+            frames = blocksize if remaining < 0 else min(blocksize, remaining)
+            block = f.read(frames, dtype='float32', always_2d=True)
+            if len(block) == 0:
+                break
+            if remaining > 0:
+                remaining -= len(block)
+            mono = block.mean(axis=1, dtype=np.float32) if block.shape[1] > 1 else block[:, 0]
+            yield resampler.resample_chunk(mono, last=False) if resampler else mono
+        if resampler:
+            yield resampler.resample_chunk(np.zeros(0, dtype=np.float32), last=True)
+
+def audio_features(filepath, max_seconds=AUDIO_MAX_SECONDS, block_seconds=AUDIO_BLOCK_SECONDS):
+    """
+    Block-streaming equivalent of librosa's rms, zero_crossing_rate and
+    spectral_centroid (default frame/hop, center=True) summarized the way
+    analyze_audio uses them. Each block is framed once; RMS and ZCR come from
+    the frames, the centroid from one rfft of the same frames. Memory is
+    bounded by the block size, not the file length.
+    """
+    frame_length, hop = AUDIO_FRAME_LENGTH, AUDIO_HOP_LENGTH
+    half = frame_length // 2
+    window = librosa.filters.get_window('hann', frame_length, fftbins=True).astype(np.float32)
+    freqs = np.fft.rfftfreq(frame_length, d=1.0 / AUDIO_SR)
+
+    rms = _RunningStats()
+    zcr = _RunningStats()
+    centroid = _RunningStats()
+    silent_frames = 0
+    samples = 0
+
+    # Zero-padded signal (rms/stft pad with zeros) plus, per sample, whether a
+    # zero crossing happens between it and the previous sample. librosa pads
+    # ZCR frames with edge values, which never cross, so padding gets False.
+    buf = np.zeros(half, dtype=np.float32)
+    crossings = np.zeros(half, dtype=bool)
+    last_negative = None
+
+    def process(buf, crossings):
+        nonlocal silent_frames
+        count = 1 + (len(buf) - frame_length) // hop if len(buf) >= frame_length else 0
+        if count <= 0:
+            return 0
+        frames = np.lib.stride_tricks.sliding_window_view(buf, frame_length)[::hop][:count]
+        frame_rms = np.sqrt(np.mean(np.square(frames, dtype=np.float32), axis=1))
+        rms.update(frame_rms)
+        silent_frames += int(np.sum(frame_rms < 0.005))
+
+        # ZCR: crossings inside each frame, excluding its first sample
+        cumulative = np.concatenate([[0], np.cumsum(crossings, dtype=np.int64)])
+        starts = np.arange(count) * hop
+        zcr.update((cumulative[starts + frame_length] - cumulative[starts + 1]) / frame_length)
+
+        magnitudes = np.abs(np.fft.rfft(frames * window, axis=1))
+        totals = magnitudes.sum(axis=1)
+        weighted = magnitudes @ freqs
+        tiny = np.finfo(np.float32).tiny
+        centroid.update(np.where(totals > tiny, weighted / np.maximum(totals, tiny), weighted))
+        return count * hop
+
+    for block in _audio_blocks(filepath, max_seconds, block_seconds):
+        if len(block) == 0:
+            continue
+        samples += len(block)
+        # librosa.zero_crossings: |x| <= 1e-10 counts as 0, and 0 as positive
+        negative = np.signbit(np.where(np.abs(block) <= 1e-10, 0, block))
+        block_crossings = np.empty(len(block), dtype=bool)
+        block_crossings[1:] = negative[1:] != negative[:-1]
+        block_crossings[0] = last_negative is not None and negative[0] != last_negative
+        last_negative = negative[-1]
+
+        buf = np.concatenate([buf, block])
+        crossings = np.concatenate([crossings, block_crossings])
+        consumed = process(buf, crossings)
+        buf, crossings = buf[consumed:], crossings[consumed:]
+
+    if samples == 0:
+        raise ValueError("no audio samples decoded")
+    buf = np.concatenate([buf, np.zeros(half, dtype=np.float32)])
+    crossings = np.concatenate([crossings, np.zeros(half, dtype=bool)])
+    process(buf, crossings)
+
+    return {
+        'seconds': samples / AUDIO_SR,
+        'frames': rms.count,
+        'rmse_mean': float(rms.mean),
+        'silence_ratio': silent_frames / rms.count,
+        'zcr_std': zcr.std(),
+        'cent_std': centroid.std()
+    }
 
 def analyze_audio(filepath):
     """
     Analyzes audio using Librosa to check for anomalies.
     """
     try:
-        # Load audio file
-        y, sr = librosa.load(filepath, duration=30) 
-        
-        # Feature Extraction
-        rmse = librosa.feature.rms(y=y)
-        spec_cent = librosa.feature.spectral_centroid(y=y, sr=sr)
+        # Single streaming decode pass; features computed block by block
+        features = audio_features(filepath)
         
         details = []
         risk_score = 0
@@ -98,9 +482,8 @@ def analyze_audio(filepath):
         # 1. Silence/Pause Analysis
         # Natural speech has micro-pauses for breathing (silence > 0.0). 
         # AI models often generate continuous waveforms or absolute silence (0.0).
-        rmse_mean = np.mean(rmse)
-        silence_frames = np.sum(rmse < 0.005)
-        silence_ratio = silence_frames / len(rmse[0])
+        rmse_mean = features['rmse_mean']
+        silence_ratio = features['silence_ratio']
         
         # Heuristic A: Too continuous (AI often forgets to breathe)
         if silence_ratio < 0.02: 
@@ -114,14 +497,13 @@ def analyze_audio(filepath):
 
         # 2. Zero-Crossing Rate (ZCR) Consistency
         # Human speech is chaotic. AI speech ZCR is often smoother.
-        zcr = librosa.feature.zero_crossing_rate(y)
-        zcr_std = np.std(zcr)
+        zcr_std = features['zcr_std']
         if zcr_std < 0.02: # Very low variation in signal changes
             risk_score += 30
             details.append("Signal structure is suspiciously consistent (low ZCR variance).")
 
         # 3. Spectral Consistency
-        cent_std = np.std(spec_cent)
+        cent_std = features['cent_std']
         if cent_std < 30: # Tightened threshold
             risk_score += 30
             details.append("Spectral features are too stable (robotic/synthetic characteristics).")
@@ -163,16 +545,174 @@ def analyze_audio(filepath):
             'risk_level': 'Unknown'
         }
 
+# Frame-level video analysis: up to VIDEO_SAMPLE_FRAMES evenly spaced sample
+# points are decoded lazily and scored in batches until the verdict is
+# statistically settled or VIDEO_TIME_BUDGET seconds run out
+VIDEO_SAMPLE_FRAMES = int(os.environ.get('VIDEO_SAMPLE_FRAMES', 48))
+VIDEO_TIME_BUDGET = float(os.environ.get('VIDEO_TIME_BUDGET', 10))
+VIDEO_BATCH_FRAMES = 8
+VIDEO_MIN_FRAMES = 16
+VIDEO_FRAME_MAX_SIDE = 640
+# Strides at least this long seek (keyframe + decode forward) instead of grab()
+VIDEO_SEEK_MIN_STRIDE = 30
+# A clip is inconsistent when more than this share of sample points is anomalous
+VIDEO_ANOMALY_RATE = 0.15
+VIDEO_MOTION_SPIKE = 10.0
+_DECISION_Z = 1.645  # one-sided 95%
+
+def _shrink_frame(frame):
+    height, width = frame.shape[:2]
+    scale = VIDEO_FRAME_MAX_SIDE / max(height, width)
+    if scale >= 1:
+        return frame
+    return cv2.resize(frame, (max(1, round(width * scale)), max(1, round(height * scale))), interpolation=cv2.INTER_AREA)
+
+def sample_frames(filepath, max_frames=VIDEO_SAMPLE_FRAMES, deadline=None, frame_count=None):
+    """
+    Generator over up to max_frames evenly spaced sample points, yielding
+    (frame index, frame, next frame) as BGR arrays no larger than
+    VIDEO_FRAME_MAX_SIDE; the next frame gives true frame-to-frame motion.
+    Short strides are walked with grab() (decode without color conversion),
+    long ones seek, which jumps to the preceding keyframe and decodes forward.
+    Only the current pair is held, so memory does not grow with clip length.
+    Stops once time.monotonic() passes `deadline`.
+    """
+    cap = cv2.VideoCapture(filepath)
+    try:
+        if not cap.isOpened():
+            raise ValueError("OpenCV could not open the video")
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        if total <= 0:
+            total = frame_count or 2 * max_frames
+        # At least 2 so sample pairs never overlap
+        stride = max(2, total // max_frames)
+        position = 0
+        for k in range(max_frames):
+            index = k * stride
+            if index + 1 >= total or (deadline is not None and time.monotonic() > deadline):
+                return
+            if index - position >= VIDEO_SEEK_MIN_STRIDE:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, index)
+            else:
+                while position < index:
+                    if not cap.grab():
+                        return
+                    position += 1
+            ok, frame = cap.read()
+            ok_next, next_frame = cap.read() if ok else (False, None)
+            if not ok_next:
+                return
+            position = index + 2
+            yield index, _shrink_frame(frame), _shrink_frame(next_frame)
+    finally:
+        cap.release()
+
+def _frame_batch_stats(batch):
+    """
+    Per-sample ELA level and motion for a batch of (index, frame, next)
+    samples. Frames are JPEG-recompressed one by one (cv2 encoder); the
+    differences and reductions run on the stacked batch. The ELA level is the
+    mean gray error stretched by 255 / max error, as in the image analysis.
+    """
+    frames = np.stack([frame for _, frame, _ in batch])
+    nexts = np.stack([next_frame for _, _, next_frame in batch])
+    params = [cv2.IMWRITE_JPEG_QUALITY, 90]
+    resaved = np.stack([cv2.imdecode(cv2.imencode('.jpg', frame, params)[1], cv2.IMREAD_COLOR) for frame in frames])
+
+    diff = (np.maximum(frames, resaved) - np.minimum(frames, resaved)).reshape(len(batch), -1, 3)
+    max_diff = np.maximum(diff.max(axis=(1, 2)), 1).astype(np.float64)
+    ela = diff.mean(axis=1) @ _GRAY_WEIGHTS[::-1] * 255.0 / max_diff  # frames are BGR
+
+    gray = frames.reshape(len(batch), -1, 3) @ _GRAY_WEIGHTS[::-1]
+    gray_next = nexts.reshape(len(batch), -1, 3) @ _GRAY_WEIGHTS[::-1]
+    motion = np.abs(gray - gray_next).mean(axis=1)
+    return ela, motion
+
+def _temporal_anomalies(ela, motion):
+    """
+    Flags sample points whose frame-to-frame change spikes (flicker, inserted
+    or swapped frames) or whose ELA level jumps away from the rest of the clip.
+    """
+    ela = np.asarray(ela)
+    motion = np.asarray(motion)
+    motion_median = np.median(motion)
+    spikes = motion > max(3 * motion_median, motion_median + VIDEO_MOTION_SPIKE)
+    ela_median = np.median(ela)
+    mad = np.median(np.abs(ela - ela_median))
+    outliers = np.abs(ela - ela_median) > max(4 * 1.4826 * mad, 0.5 * ela_median, 2.0)
+    return spikes | outliers
+
+def _rate_decided(hits, n, rate, z=_DECISION_Z):
+    """
+    True when the Wilson score interval for hits / n lies entirely on one
+    side of `rate`, i.e. more samples would not change the verdict.
+    """
+    if n == 0:
+        return False
+    p = hits / n
+    centre = p + z * z / (2 * n)
+    margin = z * math.sqrt(p * (1 - p) / n + z * z / (4 * n * n))
+    denominator = 1 + z * z / n
+    return (centre + margin) / denominator < rate or (centre - margin) / denominator > rate
+
+def temporal_report(filepath, max_frames=VIDEO_SAMPLE_FRAMES, time_budget=VIDEO_TIME_BUDGET,
+                    batch_size=VIDEO_BATCH_FRAMES, min_frames=VIDEO_MIN_FRAMES, frame_count=None):
+    """
+    Temporal consistency of a clip from sampled frames: per-frame ELA and
+    inter-frame difference statistics, computed batch by batch. Stops early
+    once at least min_frames are scored and the anomaly rate is confidently
+    above or below VIDEO_ANOMALY_RATE, and stops when time_budget seconds
+    (0 = no limit) have passed; the budget is checked per decoded sample, so
+    it is overrun by at most the scoring of one batch.
+    """
+    started = time.monotonic()
+    deadline = started + time_budget if time_budget else None
+    ela, motion = [], []
+    anomalies = np.zeros(0, dtype=bool)
+    stopped_early = False
+
+    samples = sample_frames(filepath, max_frames, deadline, frame_count)
+    try:
+        while True:
+            batch = list(islice(samples, batch_size))
+            if not batch:
+                break
+            batch_ela, batch_motion = _frame_batch_stats(batch)
+            ela.extend(batch_ela.tolist())
+            motion.extend(batch_motion.tolist())
+            anomalies = _temporal_anomalies(ela, motion)
+            if len(ela) >= min_frames and len(ela) < max_frames and _rate_decided(int(anomalies.sum()), len(ela), VIDEO_ANOMALY_RATE):
+                stopped_early = True
+                break
+    finally:
+        samples.close()
+
+    frames = len(ela)
+    elapsed = time.monotonic() - started
+    return {
+        'frames': frames,
+        'anomalies': int(anomalies.sum()),
+        'anomaly_rate': round(float(anomalies.mean()), 4) if frames else 0.0,
+        'inconsistent': bool(frames and anomalies.mean() > VIDEO_ANOMALY_RATE),
+        'ela_mean': round(float(np.mean(ela)), 4) if frames else 0.0,
+        'ela_std': round(float(np.std(ela)), 4) if frames else 0.0,
+        'motion_median': round(float(np.median(motion)), 4) if frames else 0.0,
+        'stopped_early': stopped_early,
+        'timed_out': deadline is not None and not stopped_early and frames < max_frames and time.monotonic() > deadline,
+        'elapsed': round(elapsed, 3)
+    }
+
 def analyze_video(filepath):
     """
     Analyzes video metadata and frame consistency.
     """
     try:
-        clip = VideoFileClip(filepath)
-        duration = clip.duration
-        fps = clip.fps
-        size = clip.size
-        
+        # Metadata comes straight from the container headers; nothing is decoded
+        meta = probe_video(filepath)
+        duration = meta['duration']
+        fps = meta['fps']
+        size = meta['size']
+
         details = [f"Resolution: {size[0]}x{size[1]}", f"FPS: {fps}", f"Duration: {duration:.2f}s"]
         risk_score = 0
         
@@ -182,12 +722,28 @@ def analyze_video(filepath):
             details.append(f"Non-standard variable FPS ({fps:.2f}) detected.")
         
         # Check if audio is missing (common in some generative video)
-        if clip.audio is None:
+        if not meta['has_audio']:
             risk_score += 40
             details.append("No audio track found (suspicious for certain deepfake types).")
-        
-        clip.close()
-        
+
+        # Frame-level temporal consistency on sampled frames; a decode failure
+        # here leaves the metadata verdict standing
+        try:
+            temporal = temporal_report(filepath, frame_count=int(duration * fps))
+        except Exception as e:
+            print(f"Frame analysis failed in analyze_video: {e}")
+            temporal = None
+        if not temporal or not temporal['frames']:
+            details.append("Frame analysis unavailable.")
+        else:
+            note = " (early stop)" if temporal['stopped_early'] else " (time budget reached)" if temporal['timed_out'] else ""
+            details.append(f"Frames sampled: {temporal['frames']}{note}, ELA {temporal['ela_mean']:.2f} +/- {temporal['ela_std']:.2f}, "
+                           f"median motion {temporal['motion_median']:.2f}")
+            if temporal['inconsistent']:
+                risk_score += 45
+                details.append(f"Temporal inconsistencies in {temporal['anomalies']} of {temporal['frames']} sampled frames "
+                               "(flicker or frame-level compression jumps).")
+
         if risk_score > 40:
             result_text = 'Suspicious'
             risk_level = 'Medium'
@@ -200,9 +756,10 @@ def analyze_video(filepath):
             'result': result_text,
             'confidence': round(max(60.0, 100.0 - risk_score), 2),
             'details': " | ".join(details),
-            'risk_level': risk_level
+            'risk_level': risk_level,
+            'temporal': temporal
         }
-        
+
     except Exception as e:
         print(f"Error in analyze_video: {e}")
         return {
@@ -1,6 +1,5 @@
 import re
 import os
-import google.generativeai as genai
 from flask import current_app
 from flask_login import current_user
 from utils.db import db
@@ -34,6 +33,8 @@ def get_ai_response(user_message):
         return None  # Trigger fallback
 
     try:
+        # Imported on first use: the SDK takes most of a second to import
+        import google.generativeai as genai
         genai.configure(api_key=api_key)
         model = genai.GenerativeModel('gemini-flash-latest')
         
@@ -0,0 +1,150 @@
+import os
+import numpy as np
+
+DEFAULT_TRUSTED_DOMAINS_PATH = os.path.join(os.path.dirname(__file__), 'trusted_domains.txt')
+DEFAULT_PUBLIC_SUFFIX_PATH = os.path.join(os.path.dirname(__file__), 'public_suffixes.txt')
+
+class PublicSuffixList:
+    """
+    Minimal Public Suffix List matcher (plain rules, '*.' wildcards, '!' exceptions).
+    """
+    def __init__(self, rules=()):
+        self._rules = set()
+        self._wildcards = set()
+        self._exceptions = set()
+        for rule in rules:
+            rule = rule.strip().lower()
+            if not rule or rule.startswith('//'):
+                continue
+            rule = rule.split()[0]
+            if rule.startswith('!'):
+                self._exceptions.add(rule[1:])
+            elif rule.startswith('*.'):
+                self._wildcards.add(rule[2:])
+            else:
+                self._rules.add(rule)
+
+    @classmethod
+    def load(cls, path=None):
+        path = path or os.environ.get('PUBLIC_SUFFIX_FILE') or DEFAULT_PUBLIC_SUFFIX_PATH
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls(f)
+
+    def public_suffix(self, domain):
+        """
+        Returns the public suffix of domain, e.g. 'co.uk' for 'shop.example.co.uk'.
+        """
+        labels = domain.split('.')
+        # Longest candidate first, so the longest matching rule wins
+        for i in range(len(labels)):
+            name = '.'.join(labels[i:])
+            if name in self._exceptions:
+                return '.'.join(labels[i + 1:])
+            if name in self._rules:
+                return name
+            if i + 1 < len(labels) and '.'.join(labels[i + 1:]) in self._wildcards:
+                return name
+        return labels[-1]  # Default rule '*': every TLD is a public suffix
+
+    def is_public_suffix(self, name):
+        return self.public_suffix(name) == name
+
+class DomainIndex:
+    """
+    Allowlist of registrable domains stored as a sorted array of UTF-8 domain
+    names. A domain matches if it equals an entry or is a subdomain of one; a
+    lookup checks each label suffix above the public suffix (O(labels)
+    probes, each a binary search on the names themselves, so there are no
+    hash collisions). Entries that are public suffixes ('co.uk', 'github.io')
+    are rejected so they can't whitelist unrelated sites.
+    The array can be saved as .npy and memory-mapped by every worker.
+    """
+    def __init__(self, domains=None, public_suffixes=None):
+        self.public_suffixes = public_suffixes if public_suffixes is not None else PublicSuffixList.load()
+        self._domains = domains if domains is not None else np.empty(0, dtype='S1')
+        if self._domains.dtype.kind != 'S':
+            raise ValueError("Not a domain name index (hash-only indexes from older builds must be rebuilt "
+                             "with scripts/build_trusted_index.py)")
+        self.rejected = []
+
+    @classmethod
+    def from_domains(cls, domains, public_suffixes=None):
+        index = cls(public_suffixes=public_suffixes)
+        names = set()
+        for domain in domains:
+            domain = domain.strip().lower().rstrip('.')
+            if domain.startswith('www.'):
+                domain = domain[4:]
+            if not domain:
+                continue
+            if index.public_suffixes.is_public_suffix(domain):
+                index.rejected.append(domain)
+                continue
+            names.add(domain.encode('utf-8'))
+        # Fixed width (the longest name); numpy compares and sorts these bytewise
+        index._domains = np.array(sorted(names), dtype=f'S{max(map(len, names), default=1)}')
+        return index
+
+    @classmethod
+    def load(cls, path=None, public_suffixes=None):
+        """
+        Loads an allowlist: a .npy name array (memory-mapped), or a text file with
+        one domain per line / Tranco-style 'rank,domain' rows ('#' starts a comment).
+        Defaults to TRUSTED_DOMAINS_FILE from the environment, then utils/trusted_domains.txt.
+        """
+        path = path or os.environ.get('TRUSTED_DOMAINS_FILE') or DEFAULT_TRUSTED_DOMAINS_PATH
+        if path.endswith('.npy'):
+            return cls(np.load(path, mmap_mode='r'), public_suffixes)
+        with open(path, 'r', encoding='utf-8') as f:
+            return cls.from_domains(_iter_domain_lines(f), public_suffixes)
+
+    def save(self, path):
+        """
+        Writes the name array as .npy so it can be memory-mapped by load().
+        """
+        np.save(path, np.asarray(self._domains))
+
+    def __len__(self):
+        return len(self._domains)
+
+    def match(self, domain):
+        """
+        Returns the allowlisted entry covering domain, or None.
+        """
+        if not domain or not len(self._domains):
+            return None
+        suffix = self.public_suffixes.public_suffix(domain)
+        stop = len(domain) - len(suffix)
+
+        # The domain itself, then each parent down to (not including) the public suffix
+        candidates = []
+        start = 0
+        while start < stop:
+            candidates.append(domain[start:])
+            dot = domain.find('.', start)
+            if dot < 0:
+                break
+            start = dot + 1
+        if not candidates:
+            return None
+
+        # One binary search call for all candidates. Names longer than the
+        # array's width can't be entries (casting would truncate them)
+        width = self._domains.dtype.itemsize
+        encoded = [c.encode('utf-8') for c in candidates]
+        probes = np.array([name if len(name) <= width else b'' for name in encoded], dtype=self._domains.dtype)
+        positions = np.minimum(np.searchsorted(self._domains, probes), len(self._domains) - 1)
+        hits = np.flatnonzero((np.asarray(self._domains[positions]) == probes) & (probes != b''))
+        return candidates[hits[0]] if len(hits) else None
+
+    def __contains__(self, domain):
+        return self.match(domain) is not None
+
+def _iter_domain_lines(lines):
+    for line in lines:
+        line = line.split('#', 1)[0].strip()
+        if not line:
+            continue
+        if ',' in line:
+            line = line.rsplit(',', 1)[1]
+        yield line
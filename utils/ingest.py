@@ -0,0 +1,285 @@
+import os
+import io
+import mmap
+import uuid
+import zipfile
+from contextlib import contextmanager
+from flask import Request, current_app
+from werkzeug.exceptions import RequestEntityTooLarge, UnsupportedMediaType
+from werkzeug.utils import secure_filename
+from .media_cache import content_hasher
+
+# Uploads are spooled under UPLOAD_FOLDER/SPOOL_DIR and then renamed to
+# UPLOAD_FOLDER/<digest[:2]>/<digest><ext> (same filesystem, so the move is atomic)
+SPOOL_DIR = '.spool'
+SNIFF_BYTES = 64
+COPY_CHUNK_SIZE = 1024 * 1024
+# Zip members that inflate more than this many times over are rejected
+# (media formats are already compressed and barely shrink in a zip)
+ZIP_MAX_RATIO = int(os.environ.get('ZIP_MAX_RATIO', 100))
+
+# ISO BMFF brands that mean audio-only files
+_AUDIO_BRANDS = {b'M4A ', b'M4B ', b'M4P ', b'F4A '}
+
+def sniff_media_type(head):
+    """
+    Detects the media type from a file's leading bytes (magic numbers).
+    Returns (scan type, extension) or (None, None) when unrecognised.
+    """
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'image', '.jpg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'image', '.png'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'image', '.gif'
+    if head[:4] in (b'II*\x00', b'MM\x00*'):
+        return 'image', '.tif'
+    if head[:4] == b'RIFF':
+        return {b'WEBP': ('image', '.webp'), b'WAVE': ('audio', '.wav'), b'AVI ': ('video', '.avi')}.get(head[8:12], (None, None))
+    if head[:4] == b'FORM' and head[8:12] in (b'AIFF', b'AIFC'):
+        return 'audio', '.aiff'
+    if head[:4] == b'fLaC':
+        return 'audio', '.flac'
+    if head[:4] == b'OggS':
+        return 'audio', '.ogg'
+    if head[:3] == b'ID3' or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+        return 'audio', '.mp3'
+    if head[4:8] == b'ftyp':
+        return ('audio', '.m4a') if head[8:12] in _AUDIO_BRANDS else ('video', '.mov' if head[8:12] == b'qt  ' else '.mp4')
+    if head[4:8] in (b'moov', b'mdat', b'wide', b'free'):
+        return 'video', '.mov'
+    if head[:4] == b'\x1a\x45\xdf\xa3':
+        return 'video', '.webm' if b'webm' in head else '.mkv'
+    if head[:2] == b'BM':
+        return 'image', '.bmp'
+    if head[:4] == b'PK\x03\x04':
+        return 'archive', '.zip'
+    return None, None
+
+class SpoolFile:
+    """
+    Write target for one uploaded file, and the one place uploads are
+    hashed. As the request body is parsed, each chunk is hashed
+    (media_cache.content_hasher), the first bytes are kept for sniffing, the
+    size limit is enforced and the data is written to a uniquely named spool
+    file, all in one pass. commit() moves it to its content-addressed path;
+    a spool that is closed uncommitted is deleted. Reads and seeks go to the
+    underlying file.
+    """
+    def __init__(self, root, max_size=None):
+        directory = os.path.join(root, SPOOL_DIR)
+        os.makedirs(directory, exist_ok=True)
+        self.root = root
+        self.max_size = max_size
+        self.size = 0
+        self.head = b''
+        self.digest = None
+        self.path = os.path.join(directory, uuid.uuid4().hex)
+        self._hash = content_hasher()
+        self._file = open(self.path, 'w+b')
+        self._committed = False
+
+    def write(self, data):
+        self.size += len(data)
+        if self.max_size is not None and self.size > self.max_size:
+            self.close()
+            raise RequestEntityTooLarge(f"Upload exceeds {self.max_size} bytes")
+        if len(self.head) < SNIFF_BYTES:
+            self.head += bytes(data[:SNIFF_BYTES - len(self.head)])
+        self._hash.update(data)
+        return self._file.write(data)
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+    @property
+    def media_type(self):
+        return sniff_media_type(self.head)
+
+    def commit(self):
+        """
+        Finishes the upload and returns its content-addressed path. If the
+        same content is already stored, that file is reused and the spool
+        is dropped.
+        """
+        if self._committed:
+            return self.path
+        self._file.close()
+        self.digest = self._hash.hexdigest()
+        directory = os.path.join(self.root, self.digest[:2])
+        os.makedirs(directory, exist_ok=True)
+        final_path = os.path.join(directory, self.digest + (self.media_type[1] or '.bin'))
+        if os.path.exists(final_path):
+            os.remove(self.path)
+        else:
+            os.replace(self.path, final_path)
+        self.path = final_path
+        self._committed = True
+        return final_path
+
+    def close(self):
+        if self._committed:
+            return
+        self._file.close()
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
+
+class IngestRequest(Request):
+    """
+    Request class that streams multipart file parts straight into SpoolFiles
+    under UPLOAD_FOLDER instead of werkzeug's temporary files, so an upload
+    is written once and never copied. Each part is capped at
+    MAX_CONTENT_LENGTH. Flask closes the request's files when the request
+    ends, which deletes any spool that wasn't committed.
+    """
+    # Endpoints allowed a larger body than MAX_CONTENT_LENGTH (endpoint -> config key)
+    upload_limits = {'detect_batch': 'BATCH_MAX_CONTENT_LENGTH'}
+
+    @property
+    def max_content_length(self):
+        config = current_app.config
+        return config.get(self.upload_limits.get(self.endpoint), config['MAX_CONTENT_LENGTH'])
+
+    def _get_file_stream(self, total_content_length, content_type, filename=None, content_length=None):
+        return SpoolFile(current_app.config['UPLOAD_FOLDER'], max_size=self.max_content_length)
+
+def spool_stream(stream, root, max_size=None, chunk_size=COPY_CHUNK_SIZE):
+    """
+    Copies any readable stream (e.g. a zip member) into a SpoolFile.
+    """
+    spool = SpoolFile(root, max_size)
+    try:
+        for chunk in iter(lambda: stream.read(chunk_size), b''):
+            spool.write(chunk)
+    except BaseException:
+        spool.close()
+        raise
+    return spool
+
+def ingest_upload(file, expected_type=None):
+    """
+    Commits an uploaded FileStorage and returns (path, digest, scan type).
+    Raises UnsupportedMediaType if the content isn't a recognised media type
+    or doesn't match expected_type.
+    """
+    spool = file.stream
+    if not isinstance(spool, SpoolFile):
+        # Parsed by another request class: one extra copy, same result
+        config = current_app.config
+        spool = spool_stream(file.stream, config['UPLOAD_FOLDER'], config.get('MAX_CONTENT_LENGTH'))
+    return _commit_spool(spool, expected_type)
+
+def _commit_spool(spool, expected_type=None):
+    scan_type, extension = spool.media_type
+    if scan_type in (None, 'archive') or (expected_type is not None and scan_type != expected_type):
+        spool.close()
+        detected = f"{scan_type} ({extension})" if scan_type else "an unrecognised format"
+        raise UnsupportedMediaType(f"Expected a {expected_type} file, got {detected}." if expected_type
+                                   else f"Unsupported file type: {detected}.")
+    path = spool.commit()
+    return path, spool.digest, scan_type
+
+def _zip_members(archive):
+    # Regular files only: no directories, macOS resource forks or dotfiles
+    for info in archive.infolist():
+        name = info.filename.rsplit('/', 1)[-1]
+        if info.is_dir() or info.filename.startswith('__MACOSX/') or not name or name.startswith('.'):
+            continue
+        yield info
+
+def ingest_batch(files, max_files, max_size=None, max_total=None):
+    """
+    Commits every file of a batch upload. Zip archives among the files are
+    expanded, each member spooled (and hashed and sniffed) straight from the
+    archive. Returns one dict per media file, in upload order, with
+    filename, path, digest and scan_type, or filename and error for files
+    that can't be scanned. Files over max_size are rejected individually.
+    Archives are checked against their declared sizes before anything is
+    extracted: one whose members would take the batch past max_total bytes
+    is rejected whole, and members with a compression ratio above
+    ZIP_MAX_RATIO are skipped. Raises RequestEntityTooLarge when the batch
+    holds more than max_files.
+    """
+    root = current_app.config['UPLOAD_FOLDER']
+    entries = []
+    stored = 0  # bytes spooled for the batch so far
+
+    def check_count():
+        if len(entries) >= max_files:
+            raise RequestEntityTooLarge(f"Too many files (max {max_files})")
+
+    def add(filename, spool):
+        if max_size is not None and spool.size > max_size:
+            spool.close()
+            entries.append({'filename': filename, 'error': f"File exceeds {max_size} bytes."})
+            return
+        try:
+            path, digest, scan_type = _commit_spool(spool)
+        except UnsupportedMediaType as e:
+            entries.append({'filename': filename, 'error': e.description})
+            return
+        entries.append({'filename': filename, 'path': path, 'digest': digest, 'scan_type': scan_type})
+
+    for file in files:
+        filename = secure_filename(file.filename or '') or 'upload'
+        spool = file.stream
+        if not isinstance(spool, SpoolFile):
+            spool = spool_stream(file.stream, root)
+        if spool.media_type[0] != 'archive':
+            check_count()
+            stored += spool.size
+            add(filename, spool)
+            continue
+        try:
+            spool.seek(0)
+            with zipfile.ZipFile(spool) as archive:
+                members = list(_zip_members(archive))
+                declared = sum(info.file_size for info in members)
+                if max_total is not None and stored + declared > max_total:
+                    entries.append({'filename': filename, 'error': f"Archive expands past the {max_total} byte batch limit."})
+                    continue
+                for info in members:
+                    check_count()
+                    member_name = secure_filename(info.filename) or 'upload'
+                    if info.file_size > ZIP_MAX_RATIO * max(info.compress_size, 1):
+                        entries.append({'filename': member_name, 'error': "Compression ratio too high (possible zip bomb)."})
+                        continue
+                    try:
+                        # zipfile stops at the declared file_size, so this is
+                        # bounded by the check above
+                        with archive.open(info) as member:
+                            member_spool = spool_stream(member, root, max_size)
+                    except RequestEntityTooLarge as e:
+                        entries.append({'filename': member_name, 'error': e.description})
+                        continue
+                    except (zipfile.BadZipFile, NotImplementedError, RuntimeError, EOFError) as e:
+                        # Corrupt, encrypted or unsupported-compression member
+                        entries.append({'filename': member_name, 'error': f"Unreadable archive member: {e}"})
+                        continue
+                    stored += member_spool.size
+                    if max_total is not None and stored > max_total:
+                        member_spool.close()
+                        entries.append({'filename': filename, 'error': f"Archive expands past the {max_total} byte batch limit."})
+                        break
+                    add(member_name, member_spool)
+        except zipfile.BadZipFile as e:
+            entries.append({'filename': filename, 'error': f"Unreadable archive: {e}"})
+        finally:
+            spool.close()
+    return entries
+
+@contextmanager
+def map_file(path):
+    """
+    Read-only mmap of a stored upload (file-like: read/seek/tell), so an
+    analyzer decodes straight from the page cache. Empty files give an
+    empty BytesIO since they can't be mapped.
+    """
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            yield io.BytesIO()
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
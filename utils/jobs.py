@@ -0,0 +1,325 @@
+import os
+import json
+import uuid
+import threading
+import multiprocessing
+from datetime import datetime, timedelta
+from concurrent.futures import Future, ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from sqlalchemy import update
+from .db import db
+from .media_cache import media_cache
+from .models import ScanJob
+from .scans import save_scan_result, save_scan_results
+
+# Analyzer per scan type, resolved inside the worker process (by name, so
+# only strings cross the process boundary and the parent never has to
+# import librosa/moviepy just to enqueue a job)
+ANALYZERS = {
+    'image': 'analyze_image',
+    'audio': 'analyze_audio',
+    'video': 'analyze_video'
+}
+
+# Scan types whose analyzer gets a read-only mmap of the upload instead of
+# its path. Audio and video stay on paths: they stream from disk in blocks
+# and their decoders (libsndfile/audioread, ffmpeg via OpenCV) open files
+# by name.
+MAPPED_SCAN_TYPES = {'image'}
+
+def run_analysis(scan_type, filepath):
+    """
+    Worker entry point: runs the analyzer for scan_type on filepath.
+    """
+    from utils import ai_engine
+    from utils.ingest import map_file
+    analyzer = getattr(ai_engine, ANALYZERS[scan_type])
+    if scan_type in MAPPED_SCAN_TYPES:
+        with map_file(filepath) as data:
+            return analyzer(data)
+    return analyzer(filepath)
+
+# Modules the forkserver imports once after warm_up(), so every worker
+# forked from it starts with the analyzers loaded
+WORKER_PRELOAD = ['utils.ai_engine', 'librosa.filters']
+
+def _warm_worker():
+    from utils.warmup import import_media_analyzers
+    import_media_analyzers()
+    return os.getpid()
+
+def _run_inline(scan_type, filepath):
+    # workers=0: analyze in this process, wrapped like a pool result
+    future = Future()
+    try:
+        future.set_result(run_analysis(scan_type, filepath))
+    except Exception as e:
+        future.set_exception(e)
+    return future
+
+def _error_analysis(message):
+    # Same shape the analyzers return on failure
+    return {
+        'result': 'Error',
+        'confidence': 0.0,
+        'details': f"Analysis failed: {message}",
+        'risk_level': 'Unknown'
+    }
+
+class JobQueue:
+    """
+    Runs media scans in a local process pool so uploads return immediately.
+    Jobs are ScanJob rows; when a job finishes its analysis is stored on the
+    row, a ScanResult is written and anything blocked in wait() wakes up.
+    workers=0 runs jobs inline in the request (tests, debugging).
+    """
+    def __init__(self, app=None):
+        self.app = None
+        self.workers = 0
+        self.stale_after = 3600
+        self.preload = False
+        self._pool = None
+        self._pool_pid = None
+        self._lock = threading.Lock()
+        self._finished = threading.Condition()
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.app = app
+        self.workers = app.config.get('SCAN_JOB_WORKERS', 2)
+        self.stale_after = app.config.get('SCAN_JOB_STALE_AFTER', self.stale_after)
+        app.extensions['scan_jobs'] = self
+
+    def _get_pool(self):
+        with self._lock:
+            # A pool inherited across fork() is unusable; make one per process
+            if self._pool is None or self._pool_pid != os.getpid():
+                methods = multiprocessing.get_all_start_methods()
+                context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else None)
+                if self.preload and context.get_start_method() == 'forkserver':
+                    # Only applies if the forkserver is not running yet
+                    context.set_forkserver_preload(WORKER_PRELOAD)
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=context)
+                self._pool_pid = os.getpid()
+            return self._pool
+
+    def _reset_pool(self, pool):
+        with self._lock:
+            if self._pool is pool:
+                self._pool = None
+
+    def submit(self, user_id, filename, filepath, scan_type, digest=None):
+        """
+        Creates a ScanJob for an uploaded file and queues its analysis.
+        With a content digest, a cached analysis of the same file finishes the
+        job immediately. Returns the job (already finished on a cache hit or
+        when workers=0).
+        """
+        job = ScanJob(id=uuid.uuid4().hex, user_id=user_id, filename=filename, scan_type=scan_type,
+                      status='queued', digest=digest)
+        cached = media_cache.get(digest, scan_type) if digest else None
+        if cached is not None:
+            # Every user still gets their own ScanResult row
+            scan = save_scan_result(user_id, filename, scan_type, cached, commit=False)
+            db.session.flush()
+            job.scan_id = scan.id
+            job.status = 'done'
+            job.from_cache = True
+            job.result_json = json.dumps(cached)
+            job.finished_at = datetime.utcnow()
+            db.session.add(job)
+            db.session.commit()
+            return job
+
+        db.session.add(job)
+        db.session.commit()
+        job_id = job.id
+
+        if self.workers <= 0:
+            self._finish(job_id, _run_inline(scan_type, filepath))
+            db.session.refresh(job)
+            return job
+
+        pool = self._get_pool()
+        try:
+            future = pool.submit(run_analysis, scan_type, filepath)
+        except BrokenProcessPool:
+            self._reset_pool(pool)
+            future = self._get_pool().submit(run_analysis, scan_type, filepath)
+        future.add_done_callback(lambda f: self._finish(job_id, f, pool))
+        return job
+
+    def _outcome(self, future, pool, label):
+        """
+        Returns (analysis, crashed) for a finished future. A worker that
+        raised or died gives an error analysis and crashed=True.
+        """
+        try:
+            return future.result(), False
+        except BrokenProcessPool as e:
+            # A worker died (e.g. out of memory); start a fresh pool next time
+            self._reset_pool(pool)
+            return _error_analysis(f"worker process crashed ({e})"), True
+        except Exception as e:
+            print(f"Error in {label}: {e}")
+            return _error_analysis(str(e)), True
+
+    def _finish(self, job_id, future, pool=None):
+        """
+        Done-callback (runs on the pool's management thread): stores the
+        analysis, writes the ScanResult and wakes up streamers.
+        """
+        analysis, crashed = self._outcome(future, pool, f"scan job {job_id}")
+
+        try:
+            with self.app.app_context():
+                job = db.session.get(ScanJob, job_id)
+                if job is not None:
+                    # Same as the old synchronous path: every analyzer verdict
+                    # (including its own 'Error' result) is recorded
+                    if not crashed:
+                        scan = save_scan_result(job.user_id, job.filename, job.scan_type, analysis, commit=False)
+                        db.session.flush()
+                        job.scan_id = scan.id
+                    job.status = 'error' if analysis.get('result') == 'Error' else 'done'
+                    job.result_json = json.dumps(analysis)
+                    job.finished_at = datetime.utcnow()
+                    db.session.commit()
+                    if job.digest and not crashed:
+                        media_cache.set(job.digest, job.scan_type, analysis)
+        except Exception as e:
+            print(f"Error saving scan job {job_id}: {e}")
+        finally:
+            with self._finished:
+                self._finished.notify_all()
+
+    def expire_stale(self, job=None):
+        """
+        Marks jobs still queued SCAN_JOB_STALE_AFTER seconds after creation
+        as errors: the process running them is gone (e.g. the server was
+        restarted), so they would never finish. Checks just `job` if given,
+        otherwise every queued job. Returns the number of jobs expired.
+        """
+        if not self.stale_after:
+            return 0
+        cutoff = datetime.utcnow() - timedelta(seconds=self.stale_after)
+        if job is not None and (job.finished or job.created_at >= cutoff):
+            return 0
+        # Conditional on status so a job that finished meanwhile is left alone
+        statement = update(ScanJob).where(ScanJob.status == 'queued', ScanJob.created_at < cutoff)
+        if job is not None:
+            statement = statement.where(ScanJob.id == job.id)
+        analysis = _error_analysis(f"job was still queued after {self.stale_after} seconds (server restarted?)")
+        expired = db.session.execute(statement.values(status='error', result_json=json.dumps(analysis),
+                                                      finished_at=datetime.utcnow())
+                                     .execution_options(synchronize_session=False)).rowcount
+        db.session.commit()
+        if job is not None and expired:
+            db.session.refresh(job)
+        return expired
+
+    def _run_many(self, tasks):
+        """
+        Runs {key: (scan type, path)} analyses in the pool and yields
+        (key, analysis, crashed) as each one finishes. Work that hasn't
+        started is cancelled if the consumer stops early.
+        """
+        if self.workers <= 0:
+            for key, (scan_type, filepath) in tasks.items():
+                yield (key, *self._outcome(_run_inline(scan_type, filepath), None, f"batch scan of {filepath}"))
+            return
+
+        pool = self._get_pool()
+        futures = {}
+        try:
+            for key, (scan_type, filepath) in tasks.items():
+                try:
+                    future = pool.submit(run_analysis, scan_type, filepath)
+                except BrokenProcessPool:
+                    self._reset_pool(pool)
+                    pool = self._get_pool()
+                    future = pool.submit(run_analysis, scan_type, filepath)
+                futures[future] = (key, filepath, pool)
+            for future in as_completed(futures):
+                key, filepath, used = futures[future]
+                yield (key, *self._outcome(future, used, f"batch scan of {filepath}"))
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def scan_batch(self, user_id, entries):
+        """
+        Analyzes a batch upload (the entries from ingest.ingest_batch) and
+        yields one dict per file as its result is known: rejected files and
+        cache hits first, then pool results in completion order. Files with
+        the same content are analyzed once. When the batch ends, or the
+        client goes away, every result so far is saved with one bulk
+        ScanResult insert and one cache write; the final dict is a summary.
+        """
+        keys = [(e['digest'], e['scan_type']) if 'digest' in e else None for e in entries]
+        cached = media_cache.get_many(key for key in keys if key is not None)
+        pending = {}  # (digest, scan type) -> indexes of the files with that content
+        finished = []  # (filename, scan type, analysis) for save_scan_results
+        fresh = []  # (digest, scan type, analysis) for the media cache
+        summary = {'files': len(entries), 'done': 0, 'error': 0, 'cached': 0, 'rejected': 0}
+
+        def report(index, analysis, from_cache):
+            entry = entries[index]
+            status = 'error' if analysis.get('result') == 'Error' else 'done'
+            summary[status] += 1
+            summary['cached'] += from_cache
+            return {'index': index, 'filename': entry['filename'], 'scan_type': entry['scan_type'],
+                    'status': status, 'cached': from_cache, 'result': analysis}
+
+        try:
+            for index, (entry, key) in enumerate(zip(entries, keys)):
+                if key is None:
+                    summary['rejected'] += 1
+                    yield {'index': index, 'filename': entry['filename'], 'status': 'rejected', 'error': entry['error']}
+                elif key in cached:
+                    finished.append((entry['filename'], entry['scan_type'], cached[key]))
+                    yield report(index, cached[key], True)
+                else:
+                    pending.setdefault(key, []).append(index)
+
+            tasks = {key: (key[1], entries[indexes[0]]['path']) for key, indexes in pending.items()}
+            for key, analysis, crashed in self._run_many(tasks):
+                if not crashed:
+                    fresh.append((*key, analysis))
+                for index in pending[key]:
+                    if not crashed:
+                        finished.append((entries[index]['filename'], key[1], analysis))
+                    yield report(index, analysis, False)
+        finally:
+            summary['saved'] = save_scan_results(user_id, finished)
+            media_cache.set_many(fresh)
+        yield {'summary': summary}
+
+    def wait(self, timeout):
+        """
+        Blocks until any job finishes in this process or timeout seconds pass.
+        """
+        with self._finished:
+            self._finished.wait(timeout)
+
+    def warm_up(self):
+        """
+        Starts the worker processes and loads the media analyzers in each of
+        them, so the first scans don't pay for process start-up and imports.
+        Workers started later (after a crash) come from a preloaded forkserver.
+        """
+        if self.workers <= 0:
+            return []
+        self.preload = True
+        pool = self._get_pool()
+        futures = [pool.submit(_warm_worker) for _ in range(self.workers)]
+        return sorted({f.result() for f in futures})
+
+    def shutdown(self, wait=True):
+        with self._lock:
+            if self._pool is not None and self._pool_pid == os.getpid():
+                self._pool.shutdown(wait=wait)
+            self._pool = None
+
+job_queue = JobQueue()
@@ -0,0 +1,216 @@
+import os
+import json
+import zlib
+import hashlib
+import threading
+from datetime import datetime
+from sqlalchemy import update
+from sqlalchemy.exc import IntegrityError
+from .db import db
+from .models import MediaScanCache
+
+# 32-byte BLAKE2b: 64 hex characters, the size of the digest columns
+DIGEST_SIZE = 32
+
+# Bump a scan type's version whenever its analyzer in utils/ai_engine.py
+# changes; older cache entries then stop matching and age out
+ANALYZER_VERSIONS = {
+    'image': 2,  # 2: tiled ELA for large images, per-tile heatmap
+    'audio': 1,
+    'video': 2  # 2: sampled-frame temporal consistency checks
+}
+
+# The table is counted (to enforce max_entries) after every this fraction
+# of max_entries inserts by a process, not after every insert
+EVICT_CHECK_FRACTION = 0.01
+# Ids per DELETE ... WHERE id IN (...) when evicting
+EVICT_DELETE_CHUNK = 500
+
+# Environment settings of utils/ai_engine.py that change a scan type's
+# result for the same file; they are part of its cache key, so entries
+# computed under other settings don't match (changing a default in code
+# still needs a version bump)
+ANALYZER_SETTINGS = {
+    'image': ('ELA_MAX_PIXELS',),
+    'audio': ('AUDIO_MAX_SECONDS',),
+    'video': ('VIDEO_SAMPLE_FRAMES', 'VIDEO_TIME_BUDGET')
+}
+
+def analyzer_version(scan_type):
+    """
+    Value stored in MediaScanCache.analyzer_version for scan_type: its
+    ANALYZER_VERSIONS entry, or with ANALYZER_SETTINGS a 31-bit checksum of
+    the version and the current values of those settings.
+    """
+    version = ANALYZER_VERSIONS.get(scan_type)
+    settings = ANALYZER_SETTINGS.get(scan_type)
+    if version is None or not settings:
+        return version
+    key = json.dumps([version, [os.environ.get(name) for name in settings]])
+    return zlib.crc32(key.encode('utf-8')) & 0x7fffffff
+
+def content_hasher():
+    """
+    New hash object for upload contents, as used by utils/ingest.SpoolFile
+    (digests fit ScanJob.digest and MediaScanCache.digest).
+    """
+    return hashlib.blake2b(digest_size=DIGEST_SIZE)
+
+class MediaResultCache:
+    """
+    Persistent cache of media analyses keyed on (content digest, scan type,
+    analyzer version), stored in the MediaScanCache table so it is shared by
+    every server process and survives restarts. Least recently used entries
+    are evicted beyond max_entries. Hit/miss counters are per process.
+    """
+    def __init__(self, app=None):
+        self.max_entries = 100000
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._unchecked_inserts = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_entries = app.config.get('MEDIA_CACHE_MAX_ENTRIES', self.max_entries)
+        app.extensions['media_cache'] = self
+
+    def get(self, digest, scan_type):
+        """
+        Returns the cached analysis dict (and records the hit) or None.
+        """
+        version = analyzer_version(scan_type)
+        entry = MediaScanCache.query.filter_by(digest=digest, scan_type=scan_type, analyzer_version=version).first()
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        analysis = json.loads(entry.result_json)
+        self._touch([entry.id])
+        return analysis
+
+    def get_many(self, keys):
+        """
+        Batch form of get(): looks up (digest, scan type) pairs with one
+        query and one commit. Returns {(digest, scan type): analysis} for
+        the hits.
+        """
+        keys = set(keys)
+        if not keys:
+            return {}
+        versions = {(d, s): analyzer_version(s) for d, s in keys}
+        candidates = MediaScanCache.query.filter(MediaScanCache.digest.in_({d for d, _ in keys})).all()
+        found = {}
+        hit_ids = []
+        for entry in candidates:
+            key = (entry.digest, entry.scan_type)
+            if key in versions and entry.analyzer_version == versions[key]:
+                hit_ids.append(entry.id)
+                found[key] = json.loads(entry.result_json)
+        with self._lock:
+            self.hits += len(found)
+            self.misses += len(keys) - len(found)
+        if hit_ids:
+            self._touch(hit_ids)
+        return found
+
+    def _touch(self, entry_ids):
+        # Incremented in SQL so concurrent hits from other workers aren't lost
+        db.session.execute(update(MediaScanCache).where(MediaScanCache.id.in_(entry_ids))
+                           .values(hit_count=MediaScanCache.hit_count + 1, last_used_at=datetime.utcnow())
+                           .execution_options(synchronize_session=False))
+        db.session.commit()
+
+    def set(self, digest, scan_type, analysis):
+        """
+        Stores an analysis. Error results are not cached.
+        """
+        if analysis.get('result') == 'Error':
+            return
+        entry = MediaScanCache(digest=digest, scan_type=scan_type, analyzer_version=analyzer_version(scan_type),
+                               result_json=json.dumps(analysis))
+        db.session.add(entry)
+        try:
+            db.session.commit()
+        except IntegrityError:
+            # Another job stored the same file first
+            db.session.rollback()
+            return
+        self._evict()
+
+    def set_many(self, entries):
+        """
+        Batch form of set() for (digest, scan type, analysis) tuples: one
+        commit, falling back to one entry at a time if another process
+        stored some of them first.
+        """
+        entries = [(d, s, a) for d, s, a in entries if a.get('result') != 'Error']
+        if not entries:
+            return
+        db.session.add_all([MediaScanCache(digest=d, scan_type=s, analyzer_version=analyzer_version(s),
+                                           result_json=json.dumps(a)) for d, s, a in entries])
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()
+            for entry in entries:
+                self.set(*entry)
+            return
+        self._evict(len(entries))
+
+    def _evict(self, inserted=1):
+        """
+        Trims the table to 90% of max_entries once it is over the cap. The
+        count runs only every EVICT_CHECK_FRACTION x max_entries inserts,
+        so each process may overshoot the cap by that much in between.
+        """
+        with self._lock:
+            self._unchecked_inserts += inserted
+            if self._unchecked_inserts < max(1, int(self.max_entries * EVICT_CHECK_FRACTION)):
+                return
+            self._unchecked_inserts = 0
+        count = MediaScanCache.query.count()
+        if count <= self.max_entries:
+            return
+        # Trim to 90% so eviction runs once per batch of inserts, not every insert.
+        # Ids are read first and deleted by value: MySQL rejects a DELETE whose
+        # IN subquery reads the same table (and LIMIT inside IN)
+        excess = count - int(self.max_entries * 0.9)
+        oldest = [row.id for row in db.session.query(MediaScanCache.id)
+                  .order_by(MediaScanCache.last_used_at, MediaScanCache.id).limit(excess)]
+        removed = 0
+        for start in range(0, len(oldest), EVICT_DELETE_CHUNK):
+            chunk = oldest[start:start + EVICT_DELETE_CHUNK]
+            removed += MediaScanCache.query.filter(MediaScanCache.id.in_(chunk)).delete(synchronize_session=False)
+        db.session.commit()
+        with self._lock:
+            self.evictions += removed
+
+    def clear(self):
+        MediaScanCache.query.delete()
+        db.session.commit()
+
+    def stats(self):
+        """
+        Returns a snapshot of the cache counters (same keys as TTLCache.stats
+        where they apply).
+        """
+        size = MediaScanCache.query.count()
+        stored_hits = db.session.query(db.func.coalesce(db.func.sum(MediaScanCache.hit_count), 0)).scalar()
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': size,
+                'maxsize': self.max_entries,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'lifetime_hits': int(stored_hits),
+                'analyzer_versions': dict(ANALYZER_VERSIONS)
+            }
+
+media_cache = MediaResultCache()
@@ -0,0 +1,345 @@
+import math
+import os
+import struct
+
+# Containers larger than this are not parsed in memory; the probe falls back
+# to a single ffmpeg stream parse instead
+MAX_MOOV_BYTES = 64 * 1024 * 1024
+
+# Boxes whose children the MP4 walker descends into
+MP4_CONTAINER_BOXES = {b'moov', b'trak', b'mdia', b'minf', b'stbl'}
+
+# Matroska / WebM element IDs (marker bits kept, as in the spec tables)
+EBML_HEADER = 0x1A45DFA3
+MKV_SEGMENT = 0x18538067
+MKV_SEEK_HEAD = 0x114D9B74
+MKV_SEEK = 0x4DBB
+MKV_SEEK_ID = 0x53AB
+MKV_SEEK_POSITION = 0x53AC
+MKV_INFO = 0x1549A966
+MKV_TIMECODE_SCALE = 0x2AD7B1
+MKV_DURATION = 0x4489
+MKV_TRACKS = 0x1654AE6B
+MKV_TRACK_ENTRY = 0xAE
+MKV_TRACK_TYPE = 0x83
+MKV_DEFAULT_DURATION = 0x23E383
+MKV_VIDEO = 0xE0
+MKV_PIXEL_WIDTH = 0xB0
+MKV_PIXEL_HEIGHT = 0xBA
+MKV_CLUSTER = 0x1F43B675
+
+def normalize_fps(fps):
+    """
+    Rounds a frame rate the way ffmpeg prints it and snaps NTSC rates
+    (24000/1001 etc.) back to their exact value, matching MoviePy.
+    """
+    fps = round(float(fps), 2)
+    coef = 1000.0 / 1001.0
+    for x in [23, 24, 25, 30, 50]:
+        if fps != x and abs(fps - x * coef) < 0.01:
+            fps = x * coef
+    return fps
+
+def _metadata(container, duration, fps, size, rotation, has_audio):
+    if not duration or not fps or not size or not all(size):
+        return None
+    if abs(rotation) in (90, 270):
+        size = (size[1], size[0])
+    return {
+        'container': container,
+        'duration': duration,
+        'fps': normalize_fps(fps),
+        'size': [int(size[0]), int(size[1])],
+        'has_audio': has_audio
+    }
+
+# --- ISO base media (MP4 / MOV / M4V) ---
+
+def _iter_boxes(data, start=0, end=None):
+    end = len(data) if end is None else end
+    pos = start
+    while pos + 8 <= end:
+        size, box_type = struct.unpack_from('>I4s', data, pos)
+        header = 8
+        if size == 1:
+            size = struct.unpack_from('>Q', data, pos + 8)[0]
+            header = 16
+        elif size == 0:
+            size = end - pos
+        if size < header or pos + size > end:
+            return
+        yield box_type, pos + header, pos + size
+        pos += size
+
+def _read_moov(f):
+    """
+    Walks the top-level boxes with seeks (never reading mdat) and returns the
+    moov payload, or None.
+    """
+    file_size = os.fstat(f.fileno()).st_size
+    pos = 0
+    while pos + 8 <= file_size:
+        f.seek(pos)
+        header = f.read(16)
+        if len(header) < 8:
+            return None
+        size, box_type = struct.unpack_from('>I4s', header)
+        header_size = 8
+        if size == 1:
+            if len(header) < 16:
+                return None
+            size = struct.unpack_from('>Q', header, 8)[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - pos
+        if size < header_size:
+            return None
+        if box_type == b'moov':
+            if size > MAX_MOOV_BYTES:
+                return None
+            f.seek(pos + header_size)
+            return f.read(size - header_size)
+        pos += size
+    return None
+
+def _full_box_times(data, start):
+    """
+    Returns (timescale, duration) from an mvhd/mdhd payload.
+    """
+    if data[start] == 1:
+        return struct.unpack_from('>IQ', data, start + 20)
+    return struct.unpack_from('>II', data, start + 12)
+
+def _parse_trak(data, start, end):
+    track = {'handler': None, 'timescale': 0, 'samples': 0, 'sample_duration': 0,
+             'size': None, 'rotation': 0}
+    stack = [(start, end)]
+    while stack:
+        for box_type, s, e in _iter_boxes(data, *stack.pop()):
+            if box_type in MP4_CONTAINER_BOXES:
+                stack.append((s, e))
+            elif box_type == b'tkhd':
+                matrix = s + (52 if data[s] == 1 else 40)
+                a, b = struct.unpack_from('>ii', data, matrix)
+                width, height = struct.unpack_from('>II', data, matrix + 36)
+                track['rotation'] = int(round(math.degrees(math.atan2(b, a)))) if (a or b) else 0
+                track['size'] = (width >> 16, height >> 16)
+            elif box_type == b'hdlr':
+                track['handler'] = data[s + 8:s + 12]
+            elif box_type == b'mdhd':
+                track['timescale'] = _full_box_times(data, s)[0]
+            elif box_type == b'stsd':
+                # First visual sample entry: coded width/height, which is what
+                # ffmpeg reports (tkhd holds the display size)
+                entries = list(_iter_boxes(data, s + 8, e))
+                if entries and entries[0][2] - entries[0][1] >= 28:
+                    track['coded_size'] = struct.unpack_from('>HH', data, entries[0][1] + 24)
+            elif box_type == b'stts':
+                count = struct.unpack_from('>I', data, s + 4)[0]
+                count = min(count, (e - s - 8) // 8)
+                for i in range(count):
+                    samples, delta = struct.unpack_from('>II', data, s + 8 + 8 * i)
+                    track['samples'] += samples
+                    track['sample_duration'] += samples * delta
+    return track
+
+def probe_mp4(f):
+    moov = _read_moov(f)
+    if moov is None:
+        return None
+    duration = 0.0
+    video = None
+    has_audio = False
+    for box_type, s, e in _iter_boxes(moov):
+        if box_type == b'mvhd':
+            timescale, length = _full_box_times(moov, s)
+            if timescale:
+                duration = length / timescale
+        elif box_type == b'trak':
+            track = _parse_trak(moov, s, e)
+            if track['handler'] == b'soun':
+                has_audio = True
+            elif track['handler'] == b'vide' and video is None:
+                video = track
+    if video is None or not video['sample_duration'] or not video['timescale']:
+        return None
+    fps = video['samples'] * video['timescale'] / video['sample_duration']
+    if not duration:
+        duration = video['sample_duration'] / video['timescale']
+    size = video.get('coded_size') or video['size']
+    return _metadata('mp4', duration, fps, size, video['rotation'], has_audio)
+
+# --- Matroska / WebM (EBML) ---
+
+def _read_vint(f, keep_marker):
+    first = f.read(1)
+    if not first:
+        raise EOFError
+    byte = first[0]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not byte & mask:
+        length += 1
+        mask >>= 1
+    if length > 8:
+        raise ValueError("invalid EBML variable-length integer")
+    value = byte if keep_marker else byte & (mask - 1)
+    rest = f.read(length - 1)
+    if len(rest) != length - 1:
+        raise EOFError
+    unknown = not keep_marker and value == mask - 1
+    for b in rest:
+        value = (value << 8) | b
+        unknown = unknown and b == 0xFF
+    return value, (None if unknown else value)
+
+def _iter_elements(f, end):
+    """
+    Yields (element id, payload start, payload size) for the elements in
+    [f.tell(), end) and leaves the file positioned after each payload
+    unless the caller has moved it.
+    """
+    while end is None or f.tell() < end:
+        try:
+            element_id = _read_vint(f, True)[0]
+            size = _read_vint(f, False)[1]
+        except EOFError:
+            return
+        start = f.tell()
+        yield element_id, start, size
+        if size is None:
+            return
+        f.seek(start + size)
+
+def _read_uint(f, size):
+    return int.from_bytes(f.read(size), 'big')
+
+def _read_float(f, size):
+    raw = f.read(size)
+    return struct.unpack('>f' if size == 4 else '>d', raw)[0] if size in (4, 8) else 0.0
+
+def _parse_tracks(f, end, info):
+    for element_id, start, size in _iter_elements(f, end):
+        if element_id != MKV_TRACK_ENTRY or size is None:
+            continue
+        track = {}
+        for child_id, child_start, child_size in _iter_elements(f, start + size):
+            if child_id == MKV_TRACK_TYPE:
+                track['type'] = _read_uint(f, child_size)
+            elif child_id == MKV_DEFAULT_DURATION:
+                track['default_duration'] = _read_uint(f, child_size)
+            elif child_id == MKV_VIDEO:
+                for video_id, _, video_size in _iter_elements(f, child_start + child_size):
+                    if video_id == MKV_PIXEL_WIDTH:
+                        track['width'] = _read_uint(f, video_size)
+                    elif video_id == MKV_PIXEL_HEIGHT:
+                        track['height'] = _read_uint(f, video_size)
+        if track.get('type') == 2:
+            info['has_audio'] = True
+        elif track.get('type') == 1 and 'video' not in info:
+            info['video'] = track
+    info['tracks_seen'] = True
+
+def _parse_info(f, end, info):
+    for element_id, _, size in _iter_elements(f, end):
+        if element_id == MKV_TIMECODE_SCALE:
+            info['timecode_scale'] = _read_uint(f, size)
+        elif element_id == MKV_DURATION:
+            info['duration'] = _read_float(f, size)
+
+def _parse_seek_head(f, end, segment_start):
+    positions = {}
+    for element_id, start, size in _iter_elements(f, end):
+        if element_id != MKV_SEEK or size is None:
+            continue
+        target = position = None
+        for child_id, _, child_size in _iter_elements(f, start + size):
+            if child_id == MKV_SEEK_ID:
+                target = _read_uint(f, child_size)
+            elif child_id == MKV_SEEK_POSITION:
+                position = _read_uint(f, child_size)
+        if target is not None and position is not None:
+            positions[target] = segment_start + position
+    return positions
+
+def probe_matroska(f):
+    f.seek(0)
+    segment = None
+    for element_id, start, size in _iter_elements(f, None):
+        if element_id == MKV_SEGMENT:
+            segment = (start, None if size is None else start + size)
+            break
+    if segment is None:
+        return None
+
+    info = {'timecode_scale': 1000000, 'has_audio': False}
+    seeks = {}
+    for element_id, start, size in _iter_elements(f, segment[1]):
+        if element_id == MKV_SEEK_HEAD and size is not None:
+            seeks.update(_parse_seek_head(f, start + size, segment[0]))
+        elif element_id == MKV_INFO and size is not None:
+            _parse_info(f, start + size, info)
+        elif element_id == MKV_TRACKS and size is not None:
+            _parse_tracks(f, start + size, info)
+        elif element_id == MKV_CLUSTER:
+            break
+    # Writers that stream first and finalize later put Tracks after the
+    # clusters; the SeekHead says where
+    if not info.get('tracks_seen') and MKV_TRACKS in seeks:
+        f.seek(seeks[MKV_TRACKS])
+        for element_id, start, size in _iter_elements(f, None):
+            if element_id == MKV_TRACKS and size is not None:
+                _parse_tracks(f, start + size, info)
+            break
+
+    video = info.get('video')
+    if not video or not video.get('default_duration') or 'duration' not in info:
+        return None
+    duration = info['duration'] * info['timecode_scale'] / 1e9
+    fps = 1e9 / video['default_duration']
+    size = (video.get('width', 0), video.get('height', 0))
+    return _metadata('matroska', duration, fps, size, 0, info['has_audio'])
+
+# --- Fallback ---
+
+def probe_ffmpeg(filepath):
+    """
+    One ffmpeg stream-info parse (no decoding, no audio reader), for
+    containers the header parsers do not handle.
+    """
+    from moviepy.video.io.ffmpeg_reader import ffmpeg_parse_infos
+    infos = ffmpeg_parse_infos(filepath)
+    if not infos.get('video_found'):
+        raise ValueError("no video stream found")
+    size = infos.get('video_size') or (1, 1)
+    if abs(infos.get('video_rotation', 0)) in (90, 270):
+        size = (size[1], size[0])
+    return {
+        'container': 'ffmpeg',
+        'duration': infos.get('duration') or 0.0,
+        'fps': infos.get('video_fps', 1.0),
+        'size': [int(size[0]), int(size[1])],
+        'has_audio': bool(infos.get('audio_found'))
+    }
+
+def probe_video(filepath):
+    """
+    Reads duration, fps, frame size and audio presence from the MP4/MOV or
+    Matroska/WebM headers without decoding anything; other containers (and
+    headers missing a field) fall back to probe_ffmpeg. Returns a dict with
+    'container', 'duration', 'fps', 'size' and 'has_audio'.
+    """
+    with open(filepath, 'rb') as f:
+        head = f.read(12)
+        meta = None
+        try:
+            if head[:4] == b'\x1a\x45\xdf\xa3':
+                meta = probe_matroska(f)
+            elif head[4:8] in (b'ftyp', b'moov', b'mdat', b'free', b'skip', b'wide'):
+                meta = probe_mp4(f)
+        except (struct.error, ValueError, IndexError, EOFError) as e:
+            print(f"Header probe failed for {filepath}: {e}")
+            meta = None
+    if meta is None:
+        meta = probe_ffmpeg(filepath)
+    return meta
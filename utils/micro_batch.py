@@ -0,0 +1,124 @@
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+_STOP = object()
+
+class MicroBatcher:
+    """
+    Coalesces concurrent single-item requests into batched calls.
+    submit() queues an item and returns a Future. A background thread collects
+    items arriving within max_delay seconds (up to max_batch items), calls
+    batch_fn once with the list, and resolves every caller's future with the
+    matching element of the returned list. Once stop() is called, submit()
+    raises RuntimeError.
+    """
+    def __init__(self, batch_fn, max_batch=256, max_delay=0.002):
+        self.batch_fn = batch_fn
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.batches = 0
+        self.items = 0
+        self._lock = threading.Lock()
+        self._pid = None
+        self._queue = None
+        self._thread = None
+        self._stopped = False
+
+    def _ensure_started(self):
+        # Called with self._lock held. Threads don't survive fork(), so each
+        # (gunicorn) worker starts its own
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        self._queue = queue.Queue()
+        self._thread = threading.Thread(target=self._run, args=(self._queue,), name='micro-batcher', daemon=True)
+        self._thread.start()
+        self._pid = os.getpid()
+
+    def submit(self, item):
+        """
+        Queues one item; returns a Future resolved with its batch_fn result.
+        Raises RuntimeError if the batcher has been stopped.
+        """
+        future = Future()
+        # Under the lock so nothing can be queued behind stop()'s sentinel
+        with self._lock:
+            if self._stopped:
+                raise RuntimeError("MicroBatcher is stopped")
+            self._ensure_started()
+            self._queue.put((item, future))
+        return future
+
+    def stop(self):
+        """
+        Processes what is already queued, then ends the background thread.
+        """
+        with self._lock:
+            self._stopped = True
+            thread = self._thread if self._pid == os.getpid() else None
+            if thread is not None:
+                self._queue.put(_STOP)
+            self._thread = None
+            self._pid = None
+        if thread is not None:
+            thread.join()
+
+    def stats(self):
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'avg_batch_size': round(self.items / self.batches, 2) if self.batches else 0.0
+        }
+
+    def _run(self, work_queue):
+        stopping = False
+        while not stopping:
+            first = work_queue.get()
+            if first is _STOP:
+                break
+            batch = [first]
+
+            # Collect whatever else arrives within the window
+            deadline = time.monotonic() + self.max_delay
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    entry = work_queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if entry is _STOP:
+                    stopping = True
+                    break
+                batch.append(entry)
+
+            self._process(batch)
+
+        # Fail anything left behind the sentinel rather than leave callers waiting
+        while True:
+            try:
+                entry = work_queue.get_nowait()
+            except queue.Empty:
+                break
+            if entry is not _STOP and entry[1].set_running_or_notify_cancel():
+                entry[1].set_exception(RuntimeError("MicroBatcher is stopped"))
+
+    def _process(self, batch):
+        batch = [(item, future) for item, future in batch if future.set_running_or_notify_cancel()]
+        if not batch:
+            return
+        self.batches += 1
+        self.items += len(batch)
+        try:
+            results = list(self.batch_fn([item for item, _ in batch]))
+            if len(results) != len(batch):
+                raise ValueError(f"batch_fn returned {len(results)} results for {len(batch)} items")
+            for (_, future), result in zip(batch, results):
+                future.set_result(result)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
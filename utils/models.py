@@ -1,3 +1,4 @@
+import json
 from datetime import datetime
 from flask_login import UserMixin
 from .db import db
@@ -9,10 +10,14 @@ class User(UserMixin, db.Model):
     password_hash = db.Column(db.String(200), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     
-    # Relationship to scans
-    scans = db.relationship('ScanResult', backref='author', lazy=True)
+    # Relationship to scans (a query, never loaded whole; pages come from
+    # utils.scans.scan_history)
+    scans = db.relationship('ScanResult', backref='author', lazy='dynamic')
 
 class ScanResult(db.Model):
+    # Scan history pages walk this index newest-first (id breaks timestamp ties)
+    __table_args__ = (db.Index('ix_scan_result_user_timestamp', 'user_id', 'timestamp', 'id'),)
+
     id = db.Column(db.Integer, primary_key=True)
     filename = db.Column(db.String(100), nullable=False)
     scan_type = db.Column(db.String(20), nullable=False) # 'image', 'audio', 'video'
@@ -31,6 +36,67 @@ class ScanResult(db.Model):
             'timestamp': self.timestamp.strftime('%Y-%m-%d %H:%M:%S')
         }
 
+class ScanStats(db.Model):
+    """
+    Per-user, per-day scan counters kept up to date as ScanResults are
+    written (utils/scan_stats.py), so dashboard statistics never have to
+    aggregate ScanResult itself.
+    """
+    __table_args__ = (db.UniqueConstraint('user_id', 'day', 'scan_type', 'result'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    day = db.Column(db.Date, nullable=False)  # UTC, like ScanResult.timestamp
+    scan_type = db.Column(db.String(20), nullable=False)
+    result = db.Column(db.String(50), nullable=False)
+    count = db.Column(db.Integer, nullable=False, default=0)
+    confidence_sum = db.Column(db.Float, nullable=False, default=0.0)
+
+class ScanJob(db.Model):
+    id = db.Column(db.String(32), primary_key=True)  # uuid4 hex
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    filename = db.Column(db.String(100), nullable=False)
+    scan_type = db.Column(db.String(20), nullable=False)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'done', 'error'
+    result_json = db.Column(db.Text)  # Full analysis dict once finished
+    scan_id = db.Column(db.Integer, db.ForeignKey('scan_result.id'))
+    digest = db.Column(db.String(64))  # BLAKE2b of the uploaded file
+    from_cache = db.Column(db.Boolean, default=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    @property
+    def finished(self):
+        return self.status in ('done', 'error')
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'filename': self.filename,
+            'scan_type': self.scan_type,
+            'status': self.status,
+            'result': json.loads(self.result_json) if self.result_json else None,
+            'scan_id': self.scan_id,
+            'cached': bool(self.from_cache),
+            'created_at': self.created_at.strftime('%Y-%m-%d %H:%M:%S') if self.created_at else None,
+            'finished_at': self.finished_at.strftime('%Y-%m-%d %H:%M:%S') if self.finished_at else None
+        }
+
+class MediaScanCache(db.Model):
+    """
+    Analysis results keyed by file content, shared across users.
+    """
+    __table_args__ = (db.UniqueConstraint('digest', 'scan_type', 'analyzer_version'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    digest = db.Column(db.String(64), nullable=False)
+    scan_type = db.Column(db.String(20), nullable=False)
+    analyzer_version = db.Column(db.Integer, nullable=False)
+    result_json = db.Column(db.Text, nullable=False)
+    hit_count = db.Column(db.Integer, nullable=False, default=0)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_used_at = db.Column(db.DateTime, default=datetime.utcnow, index=True)
+
 class ChatHistory(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
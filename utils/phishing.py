@@ -1,16 +1,202 @@
 import re
+import threading
 from urllib.parse import urlparse, parse_qs
+from utils.cache import TTLCache
+from utils.domain_index import DomainIndex
+from utils.micro_batch import MicroBatcher
 from utils.phishing_model import PhishingClassifier
+from utils.phishing_rules import load_rules
 
-# Initialize and load model once
+# The model is loaded (and xgboost imported) on the first check, or up front
+# by ensure_model() / utils.warmup. None = not attempted yet.
 classifier = PhishingClassifier()
-model_loaded = classifier.load_model()
+model_loaded = None
+_model_lock = threading.Lock()
+
+def ensure_model():
+    """
+    Loads the model once per process; returns whether it is available.
+    """
+    global model_loaded
+    if model_loaded is None:
+        with _model_lock:
+            if model_loaded is None:
+                model_loaded = classifier.load_model()
+    return model_loaded
+
+# Verdict Cache Configuration
+# Full verdicts are keyed on the exact URL string (every check, and the model
+# features, depend on the raw URL); host-only signals are keyed on the
+# lower-cased domain so new paths on a known host skip that work.
+VERDICT_CACHE_SIZE = 50000
+VERDICT_CACHE_TTL = 3600  # 1 hour in seconds
+HOST_CACHE_SIZE = 20000
+HOST_CACHE_TTL = 6 * 3600
+
+_verdict_cache = TTLCache(maxsize=VERDICT_CACHE_SIZE, ttl=VERDICT_CACHE_TTL)
+_host_cache = TTLCache(maxsize=HOST_CACHE_SIZE, ttl=HOST_CACHE_TTL)
+
+# Heuristic rules (typosquatting, keywords, redirect params, extensions) are
+# loaded from utils/phishing_rules.json and compiled once at import
+RULES = load_rules()
+IP_RE = re.compile(r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b')
+
+# --- Trusted Whitelist ---
+# utils/trusted_domains.txt by default; TRUSTED_DOMAINS_FILE can point at a large
+# allowlist (Tranco CSV, or a prebuilt .npy index that is memory-mapped)
+TRUSTED_INDEX = DomainIndex.load()
+
+# Optional micro-batcher: concurrent check_url calls share one model call.
+# A caller waits at most MICRO_BATCH_TIMEOUT seconds for its batch, and
+# scores the URL itself if the batch times out or fails
+_batcher = None
+MICRO_BATCH_TIMEOUT = 5.0
+
+def enable_micro_batching(max_batch=256, max_delay_ms=2.0):
+    """
+    Routes check_url's model calls through a background MicroBatcher that scores
+    every URL arriving within max_delay_ms (or max_batch URLs) in one batch.
+    """
+    global _batcher
+    if _batcher is not None:
+        _batcher.stop()
+    _batcher = MicroBatcher(_predict_many, max_batch=max_batch, max_delay=max_delay_ms / 1000.0)
+    return _batcher
+
+def disable_micro_batching():
+    global _batcher
+    if _batcher is not None:
+        _batcher.stop()
+    _batcher = None
+
+def _predict_many(urls):
+    probs = classifier.predict_batch(urls)
+    return [None] * len(urls) if probs is None else probs
+
+def _predict_one(url):
+    if not ensure_model():
+        return None
+    batcher = _batcher
+    if batcher is not None:
+        try:
+            future = batcher.submit(url)
+        except RuntimeError:
+            # Stopped by a concurrent enable/disable_micro_batching()
+            return classifier.predict(url)
+        try:
+            return future.result(timeout=MICRO_BATCH_TIMEOUT)
+        except Exception:
+            # Timed out, stopped, or the batch failed (e.g. on another
+            # caller's malformed URL): score this URL on its own, so only a
+            # URL that fails by itself raises to its caller
+            future.cancel()
+            return classifier.predict(url)
+    return classifier.predict(url)
 
 def check_url(url):
     """
     Analyzes a URL for phishing characteristics using XGBoost model.
     Falls back to heuristics if model is not available.
     """
+    verdict = _verdict_cache.get(url)
+    if verdict is None:
+        prob_phishing = _predict_one(url)
+        verdict = _build_verdict(url, prob_phishing)
+        _verdict_cache.set(url, verdict)
+    return _copy_verdict(verdict)
+
+def url_error(url):
+    """
+    Returns why url can't be checked (urlparse rejects it, e.g. an unclosed
+    IPv6 bracket), or None. Both the model features and the heuristics
+    parse the URL, so such a URL would make check_url/check_urls raise.
+    """
+    try:
+        urlparse(url)
+    except ValueError as e:
+        return str(e)
+    return None
+
+def check_urls(urls):
+    """
+    Analyzes a batch of URLs, scoring all of them with a single model call.
+    Returns one result dict per URL (same shape as check_url), in input order.
+    Raises ValueError if any URL is malformed (see url_error).
+    """
+    urls = list(urls)
+    verdicts = [_verdict_cache.get(url) for url in urls]
+
+    # Only cache misses go to the model (once per distinct URL)
+    pending = list(dict.fromkeys(url for url, v in zip(urls, verdicts) if v is None))
+    probs = None
+    if pending and ensure_model():
+        probs = classifier.predict_batch(pending)
+    if probs is None:
+        probs = [None] * len(pending)
+
+    fresh = {}
+    for url, prob in zip(pending, probs):
+        fresh[url] = _build_verdict(url, prob)
+        _verdict_cache.set(url, fresh[url])
+
+    return [_copy_verdict(v if v is not None else fresh[url]) for url, v in zip(urls, verdicts)]
+
+def cache_stats():
+    """
+    Returns hit/miss/eviction counters for the verdict and host caches
+    (plus micro-batching counters when it is enabled).
+    """
+    stats = {
+        'verdicts': _verdict_cache.stats(),
+        'hosts': _host_cache.stats()
+    }
+    if _batcher is not None:
+        stats['micro_batching'] = _batcher.stats()
+    return stats
+
+def clear_caches():
+    _verdict_cache.clear()
+    _host_cache.clear()
+
+def _copy_verdict(verdict):
+    # Callers get their own copy so cached entries can't be mutated
+    return dict(verdict, details=list(verdict['details']))
+
+def _host_signals(domain):
+    """
+    Host-only checks (punycode, typosquatting, whitelist membership).
+    Cached per domain; returns (score, details, is_trusted).
+    """
+    cached = _host_cache.get(domain)
+    if cached is not None:
+        return cached
+
+    score = 0
+    details = []
+
+    # --- A. Homograph / Punycode Check ---
+    if 'xn--' in domain:
+        score += 50
+        details.append(f"Suspicious Domain: Punycode usage detected ('{domain}'). Possible homograph attack.")
+
+    # --- B. Typosquatting Check ---
+    # One automaton scan over the domain; a rule hits if a typo variant
+    # matches but the real brand name IS NOT in the domain
+    for target in RULES.typosquat_targets(domain):
+        score += 40
+        details.append(f"Suspicious Domain: Potential typosquatting detected (resembles '{target}').")
+
+    is_trusted = TRUSTED_INDEX.match(domain) is not None
+
+    result = (score, tuple(details), is_trusted)
+    _host_cache.set(domain, result)
+    return result
+
+def _build_verdict(url, prob_phishing):
+    """
+    Combines the heuristic checks with a precomputed model probability
+    (None if the model is unavailable) into the final verdict dict.
+    """
     # 1. Run Heuristics First
     heuristic_score = 0
     heuristic_details = []
@@ -20,39 +206,18 @@ def check_url(url):
     if domain.startswith('www.'):
         domain = domain[4:]
 
-    # --- A. Homograph / Punycode Check ---
-    if 'xn--' in domain:
-        heuristic_score += 50
-        heuristic_details.append(f"Suspicious Domain: Punycode usage detected ('{domain}'). Possible homograph attack.")
-
-    # --- B. Typosquatting Check ---
-    # Common targets: google, facebook, amazon, paypal, microsoft, apple, netflix
-    # Common typos: 0 for o, 1 for l/i, rn for m, vv for w
-    typo_patterns = [
-        (r'g[0o]0gle', 'google'),
-        (r'faceb[0o]0k', 'facebook'),
-        (r'paypa[1l]', 'paypal'),
-        (r'amaz[0o]n', 'amazon'),
-        (r'micr[0o]s[0o]ft', 'microsoft'),
-        (r'app[1l]e', 'apple'),
-        (r'netf[1l]ix', 'netflix')
-    ]
-    
-    for pattern, target in typo_patterns:
-        # Check if pattern matches but IS NOT the target
-        if re.search(pattern, domain) and target not in domain:
-             heuristic_score += 40
-             heuristic_details.append(f"Suspicious Domain: Potential typosquatting detected (resembles '{target}').")
+    # --- A/B. Punycode and Typosquatting Checks (host-only, cached) ---
+    host_score, host_details, is_trusted_domain = _host_signals(domain)
+    heuristic_score += host_score
+    heuristic_details.extend(host_details)
 
     # --- C. IP Address Check ---
-    ip_pattern = r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b'
-    if re.search(ip_pattern, url):
+    if IP_RE.search(url):
         heuristic_score += 30
         heuristic_details.append("URL contains an IP address instead of a domain.")
 
     # --- D. Suspicious Keywords (Cumulative Score) ---
-    suspicious_keywords = ['login', 'verify', 'update', 'secure', 'account', 'banking', 'confirm', 'signin', 'wallet', 'alert', 'bonus', 'free', 'giveaway']
-    keyword_count = sum(1 for keyword in suspicious_keywords if keyword in url.lower())
+    keyword_count = RULES.keyword_count(url.lower())
     if keyword_count > 0:
         # +20 for the first keyword, +10 for each additional (cap at 50)
         score_add = 20 + (keyword_count - 1) * 10
@@ -78,18 +243,16 @@ def check_url(url):
     ml_result = "Unknown"
     ml_details = []
     
-    if model_loaded:
-        prob_phishing = classifier.predict(url)
-        if prob_phishing is not None:
-            is_phishing = prob_phishing > 0.5
-            ml_confidence = prob_phishing * 100 if is_phishing else (1 - prob_phishing) * 100
-            
-            if is_phishing:
-                ml_result = "Suspicious"
-                ml_details.append(f"AI Model detected phishing patterns (Confidence: {ml_confidence:.2f}%).")
-            else:
-                ml_result = "Safe"
-                ml_details.append(f"AI Model analyzed URL as legitimate (Confidence: {ml_confidence:.2f}%).")
+    if prob_phishing is not None:
+        is_phishing = prob_phishing > 0.5
+        ml_confidence = prob_phishing * 100 if is_phishing else (1 - prob_phishing) * 100
+        
+        if is_phishing:
+            ml_result = "Suspicious"
+            ml_details.append(f"AI Model detected phishing patterns (Confidence: {ml_confidence:.2f}%).")
+        else:
+            ml_result = "Safe"
+            ml_details.append(f"AI Model analyzed URL as legitimate (Confidence: {ml_confidence:.2f}%).")
 
     # 3. Hybrid Decision Logic
     final_result = "Safe"
@@ -98,21 +261,13 @@ def check_url(url):
     final_score = 0
 
     # --- Trusted Whitelist with Safeguards ---
-    trusted_domains = [
-        'github.com', 'google.com', 'microsoft.com', 'gitlab.com', 'stackoverflow.com', 'amazon.com', 'wikipedia.org', 'nytimes.com',
-        'tryhackme.com', 'hackthebox.com', 'portswigger.net', 'pentesterlab.com', 'offsec.com', 'ctftime.org'
-    ]
-    
-    is_trusted_domain = any(domain == d or domain.endswith('.' + d) for d in trusted_domains)
-    
     if is_trusted_domain:
         # Safeguard 1: Check for Open Redirects (e.g., google.com/url?q=http://malicious.com)
         query_params = parse_qs(parsed.query)
         has_redirect = False
         
         # Common redirect params
-        redirect_keys = ['q', 'url', 'redirect', 'u', 'link', 'dest', 'target']
-        for key in redirect_keys:
+        for key in RULES.redirect_keys:
             if key in query_params:
                 # If any param value looks like a URL (http), it's a redirect
                 for val in query_params[key]:
@@ -123,9 +278,8 @@ def check_url(url):
                         break
         
         # Safeguard 2: Check for File Extensions of Executables
-        suspicious_exts = ['.exe', '.zip', '.rar', '.scr', '.bat', '.sh', '.bin']
         path_lower = parsed.path.lower()
-        if any(path_lower.endswith(ext) for ext in suspicious_exts):
+        if path_lower.endswith(RULES.suspicious_exts):
              heuristic_score += 30
              heuristic_details.append(f"Warning: Trusted domain '{domain}' linking to executable/archive.")
              has_redirect = True # Treat as suspicious
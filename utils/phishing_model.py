@@ -1,17 +1,188 @@
 import re
 import os
+import string
 import pickle
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
 import numpy as np
-import pandas as pd
 from urllib.parse import urlparse
-from xgboost import XGBClassifier
-from sklearn.model_selection import train_test_split
-from sklearn.metrics import accuracy_score, classification_report
+
+# Feature definitions shared by the per-URL and the columnar extractors
+COUNT_CHARS = ['.', '-', '@', '?', '&', '=', '_', '~', '%', '/']
+IP_PATTERN = r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b'
+SHORTENERS = ['bit.ly', 'goo.gl', 'shorte.st', 'go2l.ink', 'x.co', 'ow.ly', 't.co', 'tinyurl', 'tr.im', 'is.gd', 'cli.gs']
+NUM_FEATURES = 18
+# Bump whenever extract_features changes so cached feature matrices are rebuilt
+FEATURE_VERSION = 1
+
+# Block limits for the columnar extractor's temporary byte matrices
+BATCH_BLOCK_ROWS = 65536
+BATCH_BLOCK_BYTES = 16 * 1024 * 1024
+
+# Multi-process extraction: worker count (0 = all cores), rows per task, and the
+# input size below which a single process is faster than shipping work out
+FEATURE_WORKERS = int(os.environ.get('PHISHING_FEATURE_WORKERS', 0))
+PARALLEL_CHUNK_ROWS = 20000
+PARALLEL_MIN_ROWS = 100000
+
+_feature_pool = None
+_feature_pool_key = None
+
+_ip_re = re.compile(IP_PATTERN)
+_shortener_re = re.compile('|'.join(re.escape(s) for s in SHORTENERS))
+_scheme_bytes = np.zeros(256, dtype=bool)
+_scheme_bytes[[ord(c) for c in string.ascii_letters + string.digits + '+-.']] = True
+
+def _first_index(mask, lengths, start=None):
+    """
+    Index of the first True per row at or after `start`, or the row length if none.
+    """
+    if start is not None:
+        mask = mask & (np.arange(mask.shape[1]) >= start[:, None])
+    return np.where(mask.any(axis=1), mask.argmax(axis=1), lengths)
+
+def _plain_url_features(urls, X, rows):
+    """
+    Vectorized extract_features for ASCII URLs, written into X[rows].
+    Works on a (n, width) uint8 matrix and reproduces urlparse() for URLs made of
+    printable characters other than ';', '[' and ']'.
+    Returns a boolean mask of rows it could not handle (left for the scalar path).
+    """
+    n = len(urls)
+    width = max(max(len(u) for u in urls), 1)
+    raw = np.array(urls, dtype=f'S{width}')
+    # Two zero columns of padding so lookahead past the end stays in bounds
+    M = np.zeros((n, max(width, 5) + 2), dtype=np.uint8)
+    M[:, :width] = raw.view(np.uint8).reshape(n, width)
+    lengths = np.array([len(u) for u in urls], dtype=np.int64)
+    pos = np.arange(M.shape[1])
+    inside = pos < lengths[:, None]
+
+    fallback = ((M < 0x21) | (M > 0x7e) | (M == ord(';')) | (M == ord('[')) | (M == ord(']'))) & inside
+    fallback = fallback.any(axis=1)
+
+    # --- urlsplit: scheme, netloc, path ---
+    colon = _first_index(M == ord(':'), lengths)
+    first_non_scheme = _first_index(~_scheme_bytes[M], lengths)
+    first_alpha = ((M[:, 0] | 0x20) >= ord('a')) & ((M[:, 0] | 0x20) <= ord('z'))
+    has_scheme = (colon > 0) & (colon < lengths) & first_alpha & (first_non_scheme == colon)
+    rest = np.where(has_scheme, colon + 1, 0)
+
+    slash = M == ord('/')
+    has_netloc = (np.take_along_axis(slash, rest[:, None], axis=1)[:, 0]
+                  & np.take_along_axis(slash, rest[:, None] + 1, axis=1)[:, 0])
+    host_start = rest + 2
+    query_or_fragment = (M == ord('?')) | (M == ord('#'))
+    host_end = _first_index(slash | query_or_fragment, lengths, host_start)
+    host_len = np.where(has_netloc, host_end - host_start, 0)
+    path_start = np.where(has_netloc, host_end, rest)
+    path_len = _first_index(query_or_fragment, lengths, path_start) - path_start
+
+    is_https = has_scheme & (colon == 5)
+    for k, c in enumerate(b'https'):
+        is_https &= (M[:, k] | 0x20) == c
+
+    digits = (M >= ord('0')) & (M <= ord('9'))
+    in_host = has_netloc[:, None] & (pos >= host_start[:, None]) & (pos < host_end[:, None])
+    host_digits = (digits & in_host).sum(axis=1)
+
+    hosts = [u[a:b] if h else '' for u, a, b, h in zip(urls, host_start, host_end, has_netloc)]
+
+    F = np.empty((n, NUM_FEATURES), dtype=np.float32)
+    # 1. Length Features
+    F[:, 0] = lengths
+    F[:, 1] = host_len
+    F[:, 2] = path_len
+    # 2. Count Features
+    for j, char in enumerate(COUNT_CHARS):
+        F[:, 3 + j] = (M == ord(char)).sum(axis=1)
+    # 3. Binary Features
+    F[:, 13] = is_https
+    F[:, 14] = 0
+    # An IP needs at least four digits, so only those hosts go through the regex
+    candidates = np.flatnonzero(host_digits >= 4)
+    F[candidates, 14] = [_ip_re.search(hosts[i]) is not None for i in candidates]
+    F[:, 15] = [_shortener_re.search(h) is not None for h in hosts]
+    # 4. Digit Count
+    F[:, 16] = digits.sum(axis=1)
+    F[:, 17] = host_digits
+
+    X[rows[~fallback]] = F[~fallback]
+    return fallback
+
+def _extract_chunk_into(shm_name, num_rows, start, urls):
+    """
+    Process-pool task: extracts features for urls into rows [start, start+len)
+    of the shared (num_rows, NUM_FEATURES) float32 matrix.
+    """
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray((num_rows, NUM_FEATURES), dtype=np.float32, buffer=shm.buf)
+        out[start:start + len(urls)] = PhishingClassifier().extract_features_batch(urls)
+        del out
+    finally:
+        shm.close()
+    return len(urls)
+
+def resolve_workers(workers=None):
+    workers = FEATURE_WORKERS if workers is None else workers
+    return workers if workers and workers > 0 else (os.cpu_count() or 1)
+
+def get_feature_pool(workers=None):
+    """
+    Lazily created process pool for feature extraction, one per process and
+    worker count. Uses forkserver where available so forking a threaded
+    server process is safe.
+    """
+    global _feature_pool, _feature_pool_key
+    workers = resolve_workers(workers)
+    key = (os.getpid(), workers)
+    if _feature_pool is None or _feature_pool_key != key:
+        if _feature_pool is not None and _feature_pool_key[0] == os.getpid():
+            _feature_pool.shutdown(wait=False)
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context('forkserver' if 'forkserver' in methods else None)
+        _feature_pool = ProcessPoolExecutor(max_workers=workers, mp_context=context)
+        _feature_pool_key = key
+    return _feature_pool
+
+def extract_features_parallel(urls, workers=None, chunk_size=PARALLEL_CHUNK_ROWS, min_rows=PARALLEL_MIN_ROWS):
+    """
+    Multi-process version of PhishingClassifier.extract_features_batch.
+    URLs are split into chunks for a process pool; each worker writes its rows
+    straight into one shared-memory float32 matrix, so results are never pickled.
+    Falls back to a single process for small inputs or workers=1.
+    """
+    urls = list(urls)
+    workers = resolve_workers(workers)
+    if workers == 1 or len(urls) < max(min_rows, 1):
+        return PhishingClassifier().extract_features_batch(urls)
+
+    shm = shared_memory.SharedMemory(create=True, size=len(urls) * NUM_FEATURES * 4)
+    try:
+        pool = get_feature_pool(workers)
+        futures = [
+            pool.submit(_extract_chunk_into, shm.name, len(urls), start, urls[start:start + chunk_size])
+            for start in range(0, len(urls), chunk_size)
+        ]
+        for future in futures:
+            future.result()
+        shared = np.ndarray((len(urls), NUM_FEATURES), dtype=np.float32, buffer=shm.buf)
+        X = shared.copy()
+        del shared
+        return X
+    finally:
+        shm.close()
+        shm.unlink()
 
 class PhishingClassifier:
     def __init__(self):
-        self.model = None
+        self.model = None    # XGBClassifier (training / legacy pickle)
+        self.booster = None  # Native booster used for inference
         self.model_path = os.path.join(os.path.dirname(__file__), 'phishing_model.pkl')
+        self.native_model_path = os.path.join(os.path.dirname(__file__), 'phishing_model.ubj')
+        self.feature_workers = None  # None = FEATURE_WORKERS / PHISHING_FEATURE_WORKERS
 
     def extract_features(self, url):
         """
@@ -45,12 +216,10 @@ class PhishingClassifier:
         features.append(1 if parsed.scheme == 'https' else 0)
         
         # IP Address check
-        ip_pattern = r'\b\d{1,3}\.\d{1,3}\.\d{1,3}\.\d{1,3}\b'
-        features.append(1 if re.search(ip_pattern, hostname) else 0)
+        features.append(1 if re.search(IP_PATTERN, hostname) else 0)
         
         # Shortening service check (simple list)
-        shorteners = ['bit.ly', 'goo.gl', 'shorte.st', 'go2l.ink', 'x.co', 'ow.ly', 't.co', 'tinyurl', 'tr.im', 'is.gd', 'cli.gs']
-        features.append(1 if any(s in hostname for s in shorteners) else 0)
+        features.append(1 if any(s in hostname for s in SHORTENERS) else 0)
         
         # 4. Digit Count
         features.append(sum(c.isdigit() for c in url))
@@ -58,19 +227,54 @@ class PhishingClassifier:
         
         return features
 
-    def train(self, df):
+    def extract_features_batch(self, urls):
+        """
+        Columnar version of extract_features for a whole list/Series of URLs.
+        Returns a float32 matrix of shape (len(urls), NUM_FEATURES), identical
+        to stacking extract_features row by row.
+        """
+        urls = list(urls)
+        X = np.empty((len(urls), NUM_FEATURES), dtype=np.float32)
+
+        # Plain ASCII URLs go through the vectorized byte-matrix path below;
+        # anything urlparse treats specially (whitespace stripping, IPv6, params,
+        # unicode digits) or that is not a string uses the per-URL extractor.
+        plain = np.array([isinstance(u, str) and u.isascii() for u in urls], dtype=bool)
+        lengths = np.array([len(u) if p else 0 for u, p in zip(urls, plain)], dtype=np.int64)
+
+        # Process rows sorted by length so each block's byte matrix stays small
+        rows = np.flatnonzero(plain)
+        rows = rows[np.argsort(lengths[rows], kind='stable')]
+        start = 0
+        while start < len(rows):
+            width = max(int(lengths[rows[min(start + BATCH_BLOCK_ROWS, len(rows)) - 1]]), 1)
+            stop = min(start + max(1, BATCH_BLOCK_BYTES // width), start + BATCH_BLOCK_ROWS, len(rows))
+            block = rows[start:stop]
+            fallback = _plain_url_features([urls[i] for i in block], X, block)
+            plain[block[fallback]] = False
+            start = stop
+
+        for i in np.flatnonzero(~plain):
+            X[i] = self.extract_features(urls[i])
+
+        return X
+
+    def train(self, df, features=None):
         """
         Trains the XGBoost model on the provided DataFrame.
         df must have 'url' and 'label' columns (0=legit, 1=phishing).
+        Pass `features` (one row per df row) to skip feature extraction.
         """
-        print("Extracting features for training data...")
-        X = []
+        from xgboost import XGBClassifier
+        from sklearn.model_selection import train_test_split
+        from sklearn.metrics import accuracy_score, classification_report
+
         y = df['label'].values
-        
-        for url in df['url']:
-            X.append(self.extract_features(url))
-            
-        X = np.array(X)
+        if features is not None:
+            X = features
+        else:
+            print("Extracting features for training data...")
+            X = extract_features_parallel(df['url'], workers=self.feature_workers)
         
         X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
         
@@ -84,6 +288,7 @@ class PhishingClassifier:
         
         print("Training XGBoost model...")
         self.model.fit(X_train, y_train)
+        self.booster = self.model.get_booster()
         
         predictions = self.model.predict(X_test)
         accuracy = accuracy_score(y_test, predictions)
@@ -98,22 +303,67 @@ class PhishingClassifier:
         Predicts if a URL is phishing.
         Returns: properbility (0.0 to 1.0) where 1.0 is phishing.
         """
-        if not self.model:
+        if self.booster is None:
             if not self.load_model():
                 return None # Model not ready
                 
-        features = np.array([self.extract_features(url)])
-        prob_phishing = self.model.predict_proba(features)[0][1]
+        features = np.array([self.extract_features(url)], dtype=np.float32)
+        prob_phishing = self.predict_matrix(features)[0]
         return prob_phishing
 
+    def predict_batch(self, urls):
+        """
+        Predicts phishing probabilities for many URLs with a single model call.
+        Returns: numpy array of probabilities in input order, or None if the model is not ready.
+        """
+        if self.booster is None:
+            if not self.load_model():
+                return None # Model not ready
+
+        if len(urls) == 0:
+            return np.empty(0, dtype=np.float32)
+
+        features = extract_features_parallel(urls, workers=self.feature_workers)
+        return self.predict_matrix(features)
+
+    def predict_matrix(self, features):
+        """
+        Phishing probabilities for a float32 feature matrix.
+        Calls the booster directly on the numpy array (no DMatrix, no sklearn wrapper).
+        """
+        return self.booster.inplace_predict(features)
+
     def save_model(self):
         with open(self.model_path, 'wb') as f:
             pickle.dump(self.model, f)
         print(f"Model saved to {self.model_path}")
+        self.save_native()
+
+    def save_native(self, path=None):
+        """
+        Exports the booster in XGBoost's native UBJSON format, which is
+        version-stable and loads without unpickling the sklearn wrapper.
+        """
+        path = path or self.native_model_path
+        booster = self.booster if self.booster is not None else self.model.get_booster()
+        booster.save_model(path)
+        print(f"Native model saved to {path}")
 
     def load_model(self):
+        """
+        Loads the model for inference. Prefers the native booster file and
+        falls back to the legacy pickle. xgboost is imported here rather than
+        at module level so importing this module stays cheap.
+        """
+        if os.path.exists(self.native_model_path):
+            import xgboost as xgb
+            booster = xgb.Booster()
+            booster.load_model(self.native_model_path)
+            self.booster = booster
+            return True
         if os.path.exists(self.model_path):
             with open(self.model_path, 'rb') as f:
                 self.model = pickle.load(f)
+            self.booster = self.model.get_booster()
             return True
         return False
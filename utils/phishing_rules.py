@@ -0,0 +1,159 @@
+import os
+import re
+import json
+import itertools
+from collections import deque
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(__file__), 'phishing_rules.json')
+
+# Upper bound on literal variants a single typo pattern may expand to
+MAX_PATTERN_VARIANTS = 1024
+
+class AhoCorasick:
+    """
+    Multi-pattern substring matcher. Built once from (word, payload) pairs,
+    it reports every payload whose word occurs in a text in a single
+    left-to-right scan, independent of how many words were added.
+    """
+    def __init__(self, words):
+        self._goto = [{}]
+        self._fail = [0]
+        self._out = [frozenset()]
+
+        for word, payload in words:
+            state = 0
+            for char in word:
+                nxt = self._goto[state].get(char)
+                if nxt is None:
+                    nxt = len(self._goto)
+                    self._goto[state][char] = nxt
+                    self._goto.append({})
+                    self._fail.append(0)
+                    self._out.append(frozenset())
+                state = nxt
+            self._out[state] = self._out[state] | {payload}
+
+        # Breadth-first pass to set failure links; outputs are merged along
+        # them so a scan only has to look at the current state.
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, nxt in self._goto[state].items():
+                queue.append(nxt)
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+                self._fail[nxt] = self._goto[fail].get(char, 0)
+                self._out[nxt] = self._out[nxt] | self._out[self._fail[nxt]]
+
+    def find(self, text):
+        """
+        Returns the set of payloads whose word occurs anywhere in text.
+        """
+        goto, fail, out = self._goto, self._fail, self._out
+        found = set()
+        state = 0
+        for char in text:
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if out[state]:
+                found |= out[state]
+        return found
+
+# Regex syntax that typo patterns don't support (they used to be regexes, so
+# these would silently change meaning if taken literally)
+_PATTERN_METACHARS = set('.^$*+?(){}|\\]')
+
+def expand_pattern(pattern):
+    """
+    Expands a typo pattern into its literal variants.
+    Only character classes of literal characters ('[0o]') are special;
+    everything else is literal. Raises ValueError on other regex syntax,
+    such as ranges ('[a-z]'), negated classes or a bare '.' (write '[.]').
+    e.g. 'g[0o]0gle' -> ['g00gle', 'go0gle']
+    """
+    choices = []
+    i = 0
+    while i < len(pattern):
+        char = pattern[i]
+        if char == '[':
+            end = pattern.find(']', i + 1)
+            if end < 0:
+                raise ValueError(f"Typo pattern '{pattern}': unclosed '['.")
+            options = pattern[i + 1:end]
+            if not options or options[0] == '^' or '[' in options or '\\' in options:
+                raise ValueError(f"Typo pattern '{pattern}': only classes of literal characters are supported, got '[{options}]'.")
+            if '-' in options[1:-1]:
+                raise ValueError(f"Typo pattern '{pattern}': ranges like '[{options}]' are not supported; list the characters.")
+            choices.append(list(options))
+            i = end + 1
+            continue
+        if char in _PATTERN_METACHARS:
+            hint = " (write '[.]' for a literal dot)" if char == '.' else ''
+            raise ValueError(f"Typo pattern '{pattern}': regex metacharacter '{char}' is not supported; "
+                             f"patterns are literal apart from [..] classes{hint}.")
+        choices.append([char])
+        i += 1
+
+    count = 1
+    for options in choices:
+        count *= len(options)
+    if count > MAX_PATTERN_VARIANTS:
+        raise ValueError(f"Typo pattern '{pattern}' expands to {count} variants (max {MAX_PATTERN_VARIANTS}).")
+    return [''.join(parts) for parts in itertools.product(*choices)]
+
+def _rule_variants(rule):
+    # Literal variants of every pattern of a typo rule; errors name the rule
+    try:
+        return [variant for pattern in rule['patterns'] for variant in expand_pattern(pattern)]
+    except ValueError as e:
+        raise ValueError(f"Typosquatting rule for '{rule['target']}': {e}") from None
+
+class RuleSet:
+    """
+    Compiled phishing heuristics: typosquatting and keyword automata plus the
+    lookup tables used by check_url. Build once with load_rules().
+    """
+    def __init__(self, typosquatting, suspicious_keywords, redirect_keys, suspicious_exts):
+        # Typo rules keep their file order so details are reported in that order
+        self.typo_targets = [rule['target'].lower() for rule in typosquatting]
+        self._typo_matcher = AhoCorasick(
+            (variant.lower(), index)
+            for index, rule in enumerate(typosquatting)
+            for variant in _rule_variants(rule)
+        )
+
+        self.suspicious_keywords = [k.lower() for k in suspicious_keywords]
+        self._keyword_matcher = AhoCorasick((k, k) for k in self.suspicious_keywords)
+
+        self.redirect_keys = tuple(redirect_keys)
+        self.suspicious_exts = tuple(e.lower() for e in suspicious_exts)
+
+    def typosquat_targets(self, domain):
+        """
+        Brands the domain imitates: a typo variant matches but the real name is absent.
+        """
+        hits = sorted(self._typo_matcher.find(domain))
+        return [self.typo_targets[i] for i in hits if self.typo_targets[i] not in domain]
+
+    def keyword_count(self, text):
+        """
+        Number of distinct suspicious keywords found in text (already lower-cased).
+        """
+        return len(self._keyword_matcher.find(text))
+
+def load_rules(path=None):
+    """
+    Loads and compiles the rule file (JSON). Defaults to PHISHING_RULES_FILE
+    from the environment, then the bundled phishing_rules.json.
+    """
+    path = path or os.environ.get('PHISHING_RULES_FILE') or DEFAULT_RULES_PATH
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return RuleSet(
+        typosquatting=data.get('typosquatting', []),
+        suspicious_keywords=data.get('suspicious_keywords', []),
+        redirect_keys=data.get('redirect_keys', []),
+        suspicious_exts=data.get('suspicious_exts', [])
+    )
@@ -0,0 +1,363 @@
+import os
+import glob
+import json
+import hashlib
+import numpy as np
+import pandas as pd
+import xgboost as xgb
+from utils.phishing_model import NUM_FEATURES, FEATURE_VERSION, extract_features_parallel
+
+# Same hyperparameters as PhishingClassifier.train
+XGB_PARAMS = {
+    'objective': 'binary:logistic',
+    'eval_metric': 'logloss',
+    'max_depth': 5,
+    'learning_rate': 0.1,
+    'tree_method': 'hist'
+}
+NUM_BOOST_ROUNDS = 100
+
+SHARD_ROWS = 1_000_000
+TEST_FRACTION_MOD = 5  # 1 in 5 URLs (by hash) goes to the test split
+
+# Second key for the Bloom filter's double hashing (pandas' default key is the first)
+_ALT_HASH_KEY = 'deepshield-bloom'
+
+def url_hashes(urls):
+    """
+    Deterministic 64-bit hashes for a Series of URLs (vectorized, stable across runs).
+    """
+    return pd.util.hash_pandas_object(urls, index=False).to_numpy(dtype=np.uint64)
+
+class BloomFilter:
+    """
+    Fixed-size Bloom filter over URL hashes, used to drop duplicate URLs while
+    streaming. Memory is ~1.8 bytes (14.4 bits) per expected URL at a 0.1%
+    error rate. Pass `path` to keep the bit array in an on-disk memory map
+    instead of RAM. A false positive drops a unique URL; it never keeps a duplicate.
+    """
+    def __init__(self, capacity, error_rate=0.001, path=None):
+        capacity = max(int(capacity), 1)
+        self.num_bits = max(int(-capacity * np.log(error_rate) / (np.log(2) ** 2)), 64)
+        self.num_hashes = max(int(round(self.num_bits / capacity * np.log(2))), 1)
+        num_bytes = (self.num_bits + 7) // 8
+        if path:
+            self.bits = np.memmap(path, dtype=np.uint8, mode='w+', shape=(num_bytes,))
+        else:
+            self.bits = np.zeros(num_bytes, dtype=np.uint8)
+
+    def _positions(self, urls):
+        h1 = url_hashes(urls)
+        h2 = pd.util.hash_pandas_object(urls, index=False, hash_key=_ALT_HASH_KEY).to_numpy(dtype=np.uint64) | np.uint64(1)
+        k = np.arange(self.num_hashes, dtype=np.uint64)
+        # Double hashing: position_i = h1 + i * h2 (mod num_bits); uint64 overflow wraps
+        with np.errstate(over='ignore'):
+            return (h1[:, None] + k[None, :] * h2[:, None]) % np.uint64(self.num_bits)
+
+    def add_new(self, urls):
+        """
+        Adds a Series of URLs and returns a boolean mask of the ones not seen before
+        (duplicates inside the same batch count as seen).
+        """
+        urls = urls.reset_index(drop=True)
+        fresh = ~urls.duplicated().to_numpy()
+        positions = self._positions(urls[fresh])
+        byte_index = (positions >> np.uint64(3)).astype(np.int64)
+        bit_mask = (np.uint8(1) << (positions & np.uint64(7)).astype(np.uint8))
+        present = ((self.bits[byte_index] & bit_mask) != 0).all(axis=1)
+        np.bitwise_or.at(self.bits, byte_index.ravel(), bit_mask.ravel())
+
+        new = np.zeros(len(urls), dtype=bool)
+        new[np.flatnonzero(fresh)[~present]] = True
+        return new
+
+class FeatureShardWriter:
+    """
+    Buffers feature rows in a preallocated float32 block and writes them out as
+    numbered .npy shards (features_XXXXX.npy + labels_XXXXX.npy) of shard_rows each.
+    """
+    def __init__(self, out_dir, shard_rows=SHARD_ROWS):
+        self.out_dir = out_dir
+        self.shard_rows = shard_rows
+        os.makedirs(out_dir, exist_ok=True)
+        for stale in glob.glob(os.path.join(out_dir, '*.npy')):
+            os.remove(stale)
+        self._X = np.empty((shard_rows, NUM_FEATURES), dtype=np.float32)
+        self._y = np.empty(shard_rows, dtype=np.float32)
+        self._fill = 0
+        self.shards = 0
+        self.rows = 0
+        self.positives = 0
+
+    def append(self, X, y):
+        start = 0
+        while start < len(X):
+            take = min(self.shard_rows - self._fill, len(X) - start)
+            self._X[self._fill:self._fill + take] = X[start:start + take]
+            self._y[self._fill:self._fill + take] = y[start:start + take]
+            self._fill += take
+            start += take
+            if self._fill == self.shard_rows:
+                self._flush()
+        self.rows += len(X)
+        self.positives += int(np.sum(y))
+
+    def close(self):
+        if self._fill:
+            self._flush()
+        return self.shards
+
+    def _flush(self):
+        name = f"{self.shards:05d}.npy"
+        np.save(os.path.join(self.out_dir, 'features_' + name), self._X[:self._fill])
+        np.save(os.path.join(self.out_dir, 'labels_' + name), self._y[:self._fill])
+        self.shards += 1
+        self._fill = 0
+
+def iter_shards(shard_dir):
+    """
+    Yields (features, labels) memory-mapped arrays for each shard in order.
+    """
+    for path in sorted(glob.glob(os.path.join(shard_dir, 'features_*.npy'))):
+        label_path = path.replace('features_', 'labels_')
+        yield np.load(path, mmap_mode='r'), np.load(label_path, mmap_mode='r')
+
+class ShardIter(xgb.DataIter):
+    """
+    Feeds .npy shards to XGBoost one at a time for external-memory training.
+    """
+    def __init__(self, shard_dir, cache_dir):
+        self._shards = sorted(glob.glob(os.path.join(shard_dir, 'features_*.npy')))
+        self._it = 0
+        super().__init__(cache_prefix=os.path.join(cache_dir, 'xgb-cache'))
+
+    def next(self, input_data):
+        if self._it == len(self._shards):
+            return False
+        path = self._shards[self._it]
+        X = np.load(path, mmap_mode='r')
+        y = np.load(path.replace('features_', 'labels_'), mmap_mode='r')
+        input_data(data=np.ascontiguousarray(X), label=np.ascontiguousarray(y))
+        self._it += 1
+        return True
+
+    def reset(self):
+        self._it = 0
+
+class StreamingDatasetBuilder:
+    """
+    Turns a stream of (url, label) DataFrame chunks into train/test feature shards.
+    URLs are deduplicated with a Bloom filter and split by hash, so memory stays
+    bounded by the chunk size, the shard buffer and the filter.
+    """
+    def __init__(self, work_dir, expected_urls=50_000_000, error_rate=0.001, shard_rows=SHARD_ROWS,
+                 bloom_on_disk=True, feature_workers=None):
+        self.work_dir = work_dir
+        os.makedirs(work_dir, exist_ok=True)
+        bloom_path = os.path.join(work_dir, 'urls.bloom') if bloom_on_disk else None
+        self.seen = BloomFilter(expected_urls, error_rate, path=bloom_path)
+        self.train = FeatureShardWriter(os.path.join(work_dir, 'train'), shard_rows)
+        self.test = FeatureShardWriter(os.path.join(work_dir, 'test'), shard_rows)
+        self.feature_workers = feature_workers
+        self.total_rows = 0
+        self.duplicates = 0
+
+    def add_chunk(self, df):
+        """
+        Adds a DataFrame chunk with 'url' and 'label' columns.
+        """
+        df = df.dropna(subset=['url'])
+        urls = df['url'].astype(str).reset_index(drop=True)
+        labels = df['label'].to_numpy(dtype=np.float32)
+        self.total_rows += len(urls)
+
+        new = self.seen.add_new(urls)
+        self.duplicates += int(len(urls) - new.sum())
+        if not new.any():
+            return
+
+        urls = urls[new].reset_index(drop=True)
+        labels = labels[new]
+        X = extract_features_parallel(urls, workers=self.feature_workers)
+        is_test = (url_hashes(urls) % np.uint64(TEST_FRACTION_MOD)) == 0
+        self.train.append(X[~is_test], labels[~is_test])
+        self.test.append(X[is_test], labels[is_test])
+
+    def close(self):
+        self.train.close()
+        self.test.close()
+        if isinstance(self.seen.bits, np.memmap):
+            self.seen.bits.flush()
+
+def train_from_shards(work_dir, params=None, num_boost_round=NUM_BOOST_ROUNDS):
+    """
+    Trains a booster from the train shards with XGBoost external memory and
+    reports accuracy on the test shards. Returns (booster, accuracy).
+    """
+    params = dict(XGB_PARAMS, **(params or {}))
+    cache_dir = os.path.join(work_dir, 'cache')
+    os.makedirs(cache_dir, exist_ok=True)
+
+    it = ShardIter(os.path.join(work_dir, 'train'), cache_dir)
+    dtrain = xgb.ExtMemQuantileDMatrix(it, max_bin=256)
+    booster = xgb.train(params, dtrain, num_boost_round=num_boost_round)
+
+    correct = 0
+    total = 0
+    for X, y in iter_shards(os.path.join(work_dir, 'test')):
+        predictions = booster.inplace_predict(np.ascontiguousarray(X)) > 0.5
+        correct += int(np.sum(predictions == (np.asarray(y) > 0.5)))
+        total += len(y)
+    accuracy = correct / total if total else float('nan')
+    return booster, accuracy
+
+# --- Per-source feature cache (incremental retraining) ---
+
+def file_digest(path, block_size=1 << 20):
+    """
+    BLAKE2b hex digest of a file's contents, read in blocks.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def _encode_urls(urls):
+    encoded = [u.encode('utf-8', 'surrogatepass') for u in urls]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+    return np.frombuffer(b''.join(encoded), dtype=np.uint8), offsets
+
+def _decode_urls(data, offsets):
+    buf = data.tobytes()
+    bounds = offsets.tolist()
+    return [buf[bounds[i]:bounds[i + 1]].decode('utf-8', 'surrogatepass') for i in range(len(bounds) - 1)]
+
+class FeatureCache:
+    """
+    Per-source cache of (url, label, features) for incremental retraining.
+    Each source (a dataset file, or the HF download) is stored as one compressed
+    .npz of columnar arrays, keyed in manifest.json by the source's content hash
+    and FEATURE_VERSION. An unchanged source is served straight from its .npz;
+    a changed one reuses the cached feature rows of URLs it already had and only
+    extracts the new ones.
+    """
+    MANIFEST = 'manifest.json'
+
+    def __init__(self, cache_dir, feature_workers=None):
+        self.cache_dir = cache_dir
+        self.feature_workers = feature_workers
+        os.makedirs(cache_dir, exist_ok=True)
+        self.manifest = {}
+        manifest_path = os.path.join(cache_dir, self.MANIFEST)
+        if os.path.exists(manifest_path):
+            try:
+                with open(manifest_path) as f:
+                    self.manifest = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring unreadable feature cache manifest: {e}")
+        self.hits = 0
+        self.misses = 0
+        self.extracted_rows = 0
+        self.reused_rows = 0
+
+    def _entry_path(self, source):
+        name = hashlib.blake2b(source.encode('utf-8'), digest_size=8).hexdigest()
+        return os.path.join(self.cache_dir, name + '.npz')
+
+    def meta(self, source):
+        """
+        Returns the manifest entry for a source (content_hash, rows, any extra
+        fields such as an HTTP ETag) or None.
+        """
+        return self.manifest.get(source)
+
+    def _load_entry(self, source):
+        entry = self.manifest.get(source)
+        path = self._entry_path(source)
+        if entry is None or entry.get('feature_version') != FEATURE_VERSION or not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                urls = _decode_urls(data['url_bytes'], data['url_offsets'])
+                df = pd.DataFrame({'url': urls, 'label': data['labels'].astype(np.int64)})
+                return df, data['features']
+        except (OSError, ValueError, KeyError) as e:
+            print(f"  -> Feature cache entry for {source} is unreadable ({e}), rebuilding.")
+            return None
+
+    def lookup(self, source, content_hash):
+        """
+        Returns the cached (df, features) for a source whose content hash still
+        matches, or None.
+        """
+        entry = self.manifest.get(source)
+        if entry is None or entry.get('content_hash') != content_hash:
+            return None
+        cached = self._load_entry(source)
+        if cached is not None:
+            self.hits += 1
+        return cached
+
+    def update(self, source, content_hash, df, **extra):
+        """
+        Caches a freshly parsed source ('url'/'label' DataFrame). Feature rows
+        for URLs already in the previous entry are reused; only new URLs are
+        extracted. Returns (df, features).
+        """
+        self.misses += 1
+        df = df.dropna(subset=['url'])
+        df = pd.DataFrame({'url': df['url'].astype(str).to_numpy(), 'label': df['label'].to_numpy(dtype=np.int64)})
+        X = np.empty((len(df), NUM_FEATURES), dtype=np.float32)
+
+        missing = np.ones(len(df), dtype=bool)
+        previous = self._load_entry(source)
+        if previous is not None:
+            old_df, old_X = previous
+            old_rows = pd.Series(np.arange(len(old_df)), index=old_df['url'])
+            old_rows = old_rows[~old_rows.index.duplicated()]
+            positions = old_rows.index.get_indexer(df['url'])
+            found = positions >= 0
+            X[found] = old_X[old_rows.to_numpy()[positions[found]]]
+            missing = ~found
+
+        if missing.any():
+            X[missing] = extract_features_parallel(df['url'][missing].tolist(), workers=self.feature_workers)
+        self.extracted_rows += int(missing.sum())
+        self.reused_rows += int(len(df) - missing.sum())
+
+        url_bytes, url_offsets = _encode_urls(df['url'])
+        path = self._entry_path(source)
+        tmp_path = path + '.tmp.npz'
+        np.savez_compressed(tmp_path, url_bytes=url_bytes, url_offsets=url_offsets,
+                            labels=df['label'].to_numpy(dtype=np.int8), features=X)
+        os.replace(tmp_path, path)
+        self.manifest[source] = dict(extra, content_hash=content_hash, feature_version=FEATURE_VERSION, rows=len(df))
+        self._save_manifest()
+        return df, X
+
+    def set_meta(self, source, **extra):
+        """
+        Updates extra manifest fields (e.g. a new ETag) of an existing entry.
+        """
+        if source in self.manifest:
+            self.manifest[source].update(extra)
+            self._save_manifest()
+
+    def prune(self, keep):
+        """
+        Drops cache entries for sources not in `keep` (e.g. deleted dataset files).
+        """
+        for source in [s for s in self.manifest if s not in keep]:
+            path = self._entry_path(source)
+            if os.path.exists(path):
+                os.remove(path)
+            del self.manifest[source]
+        self._save_manifest()
+
+    def _save_manifest(self):
+        path = os.path.join(self.cache_dir, self.MANIFEST)
+        with open(path + '.tmp', 'w') as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(path + '.tmp', path)
@@ -0,0 +1,143 @@
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import delete, func, insert, select
+from sqlalchemy.dialects.mysql import insert as mysql_insert
+from sqlalchemy.dialects.postgresql import insert as postgresql_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from .db import db
+from .models import ScanResult, ScanStats
+
+STATS_DAYS = 30
+STATS_MAX_DAYS = 365
+
+# Analyzer verdicts (see utils/ai_engine.py) grouped for the dashboard
+VERDICTS = {
+    'No Obvious Manipulation': 'real',
+    'Real': 'real',
+    'Potential Manipulation Detected': 'fake',
+    'Fake/Synthetic': 'fake',
+    'Suspicious': 'suspicious',
+    'Error': 'error'
+}
+VERDICT_NAMES = ('real', 'fake', 'suspicious', 'error', 'other')
+
+_KEY = ('user_id', 'day', 'scan_type', 'result')
+_UPSERTS = {'sqlite': sqlite_insert, 'postgresql': postgresql_insert}
+
+def _upsert(rows):
+    """
+    Adds each row's count and confidence_sum to its counter, creating it
+    if needed, in one statement.
+    """
+    dialect = db.session.get_bind().dialect.name
+    columns = ScanStats.__table__.c
+    if dialect in _UPSERTS:
+        statement = _UPSERTS[dialect](ScanStats)
+        statement = statement.on_conflict_do_update(index_elements=_KEY, set_={
+            'count': columns.count + statement.excluded.count,
+            'confidence_sum': columns.confidence_sum + statement.excluded.confidence_sum
+        })
+    elif dialect in ('mysql', 'mariadb'):
+        statement = mysql_insert(ScanStats)
+        statement = statement.on_duplicate_key_update(
+            count=columns.count + statement.inserted.count,
+            confidence_sum=columns.confidence_sum + statement.inserted.confidence_sum
+        )
+    else:
+        for row in rows:
+            counter = ScanStats.query.filter_by(**{key: row[key] for key in _KEY}).first()
+            if counter is None:
+                db.session.add(ScanStats(**row))
+            else:
+                counter.count += row['count']
+                counter.confidence_sum += row['confidence_sum']
+        return
+    db.session.execute(statement, rows)
+
+def record_scans(user_id, timestamp, scans):
+    """
+    Counts new scans, given as (scan type, analysis) pairs written at
+    `timestamp`, into the user's counters for that day. Runs in the
+    caller's transaction, so the counters commit with the ScanResults.
+    """
+    counters = defaultdict(lambda: [0, 0.0])
+    for scan_type, analysis in scans:
+        counter = counters[(scan_type, analysis['result'])]
+        counter[0] += 1
+        counter[1] += analysis['confidence']
+    if counters:
+        _upsert([{'user_id': user_id, 'day': timestamp.date(), 'scan_type': scan_type, 'result': result,
+                  'count': count, 'confidence_sum': confidence_sum}
+                 for (scan_type, result), (count, confidence_sum) in counters.items()])
+
+def rebuild_scan_stats(user_id=None):
+    """
+    Recomputes the counters from ScanResult (all users, or one) with a
+    single INSERT ... SELECT ... GROUP BY, replacing what was there. Used
+    to backfill scans written before the rollup existed; safe to re-run.
+    Returns the number of counters written.
+    """
+    day = func.date(ScanResult.timestamp)
+    source = (select(ScanResult.user_id, day, ScanResult.scan_type, ScanResult.result,
+                     func.count(), func.sum(ScanResult.confidence))
+              .where(ScanResult.timestamp.is_not(None))
+              .group_by(ScanResult.user_id, day, ScanResult.scan_type, ScanResult.result))
+    clear = delete(ScanStats)
+    if user_id is not None:
+        source = source.where(ScanResult.user_id == user_id)
+        clear = clear.where(ScanStats.user_id == user_id)
+    db.session.execute(clear)
+    db.session.execute(insert(ScanStats).from_select(
+        ['user_id', 'day', 'scan_type', 'result', 'count', 'confidence_sum'], source))
+    db.session.commit()
+    query = ScanStats.query if user_id is None else ScanStats.query.filter_by(user_id=user_id)
+    return query.count()
+
+def _average(confidence_sum, count):
+    return round(confidence_sum / count, 2) if count else None
+
+def scan_stats(user_id, days=STATS_DAYS, today=None):
+    """
+    Dashboard statistics read from the rollup only: totals per scan type
+    (verdict and raw result counts, average confidence) and a daily series
+    for the last `days` days, zero-filled. Cost depends on the number of
+    counters (days x scan types x results), not on the number of scans.
+    """
+    days = max(1, min(days, STATS_MAX_DAYS))
+    today = today or datetime.utcnow().date()
+    since = today - timedelta(days=days - 1)
+
+    by_type = {}
+    totals = (select(ScanStats.scan_type, ScanStats.result, func.sum(ScanStats.count), func.sum(ScanStats.confidence_sum))
+              .where(ScanStats.user_id == user_id)
+              .group_by(ScanStats.scan_type, ScanStats.result))
+    for scan_type, result, count, confidence_sum in db.session.execute(totals):
+        entry = by_type.setdefault(scan_type, {'count': 0, 'confidence_sum': 0.0, 'results': {},
+                                               'verdicts': dict.fromkeys(VERDICT_NAMES, 0)})
+        entry['count'] += count
+        entry['confidence_sum'] += confidence_sum
+        entry['results'][result] = count
+        entry['verdicts'][VERDICTS.get(result, 'other')] += count
+    for entry in by_type.values():
+        entry['avg_confidence'] = _average(entry.pop('confidence_sum'), entry['count'])
+
+    daily = {since + timedelta(days=i): {'count': 0, 'confidence_sum': 0.0, **dict.fromkeys(VERDICT_NAMES, 0)}
+             for i in range(days)}
+    recent = (select(ScanStats.day, ScanStats.result, ScanStats.count, ScanStats.confidence_sum)
+              .where(ScanStats.user_id == user_id, ScanStats.day >= since, ScanStats.day <= today))
+    for day, result, count, confidence_sum in db.session.execute(recent):
+        entry = daily[day]
+        entry['count'] += count
+        entry['confidence_sum'] += confidence_sum
+        entry[VERDICTS.get(result, 'other')] += count
+
+    for day, entry in daily.items():
+        entry['date'] = day.isoformat()
+        entry['avg_confidence'] = _average(entry.pop('confidence_sum'), entry['count'])
+
+    return {
+        'total': sum(entry['count'] for entry in by_type.values()),
+        'by_type': by_type,
+        'days': days,
+        'daily': [daily[day] for day in sorted(daily)]
+    }
@@ -0,0 +1,101 @@
+import base64
+from datetime import datetime
+from sqlalchemy import insert, or_, select
+from sqlalchemy.orm import load_only
+from .db import db
+from .models import ScanResult
+from .scan_stats import record_scans
+
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_PAGE_SIZE = 100
+
+def save_scan_result(user_id, filename, scan_type, analysis, commit=True):
+    """
+    Records a finished analysis as a ScanResult row (and in the user's
+    ScanStats counters) and returns it.
+    """
+    scan = ScanResult(
+        filename=filename,
+        scan_type=scan_type,
+        result=analysis['result'],
+        confidence=analysis['confidence'],
+        timestamp=datetime.utcnow(),
+        user_id=user_id
+    )
+    db.session.add(scan)
+    record_scans(user_id, scan.timestamp, [(scan_type, analysis)])
+    if commit:
+        db.session.commit()
+    return scan
+
+def save_scan_results(user_id, entries):
+    """
+    Records many finished analyses, given as (filename, scan type, analysis)
+    tuples, with one bulk INSERT, one counter upsert and one commit.
+    Returns the row count.
+    """
+    now = datetime.utcnow()
+    rows = [{
+        'filename': filename,
+        'scan_type': scan_type,
+        'result': analysis['result'],
+        'confidence': analysis['confidence'],
+        'timestamp': now,
+        'user_id': user_id
+    } for filename, scan_type, analysis in entries]
+    if rows:
+        db.session.execute(insert(ScanResult), rows)
+        record_scans(user_id, now, [(scan_type, analysis) for _, scan_type, analysis in entries])
+        db.session.commit()
+    return len(rows)
+
+def encode_cursor(scan):
+    """
+    Opaque cursor pointing just past `scan` in newest-first order.
+    """
+    raw = f"{scan.timestamp.isoformat()}|{scan.id}"
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+def decode_cursor(cursor):
+    """
+    Returns (timestamp, id) from encode_cursor; ValueError if malformed.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        timestamp, scan_id = raw.split('|')
+        return datetime.fromisoformat(timestamp), int(scan_id)
+    except (ValueError, UnicodeDecodeError) as e:
+        raise ValueError(f"Invalid cursor: {cursor!r}") from e
+
+def scan_history(user_id, limit=HISTORY_PAGE_SIZE, cursor=None):
+    """
+    One page of a user's scans, newest first, and the cursor of the next
+    page (None on the last one). Keyset pagination: the page starts at the
+    cursor's (timestamp, id) position in ix_scan_result_user_timestamp, so
+    every page costs O(limit) however many scans the user has (OFFSET
+    would read and discard every earlier row).
+    """
+    limit = max(1, min(limit, HISTORY_MAX_PAGE_SIZE))
+    query = (select(ScanResult)
+             .options(load_only(ScanResult.id, ScanResult.filename, ScanResult.scan_type, ScanResult.result,
+                                ScanResult.confidence, ScanResult.timestamp))
+             .where(ScanResult.user_id == user_id)
+             .order_by(ScanResult.timestamp.desc(), ScanResult.id.desc())
+             .limit(limit + 1))
+    if cursor:
+        timestamp, scan_id = decode_cursor(cursor)
+        # (timestamp, id) < cursor, plus the redundant timestamp <= bound that
+        # lets the planner seek into the index instead of filtering a scan
+        query = query.where(ScanResult.timestamp <= timestamp,
+                            or_(ScanResult.timestamp < timestamp, ScanResult.id < scan_id))
+    scans = db.session.scalars(query).all()
+    next_cursor = encode_cursor(scans[limit - 1]) if len(scans) > limit else None
+    return scans[:limit], next_cursor
+
+def ensure_history_index():
+    """
+    Creates ix_scan_result_user_timestamp on databases whose scan_result
+    table predates it (db.create_all() leaves existing tables alone).
+    """
+    for index in ScanResult.__table__.indexes:
+        index.create(db.engine, checkfirst=True)
@@ -0,0 +1,85 @@
+import gc
+import time
+
+# Heavy libraries (xgboost, cv2, librosa/scipy, the Gemini SDK) are imported on
+# first use so app.py and scripts start fast. warm_up() pays those costs up
+# front instead, e.g. at server boot, so the first request does not.
+WARM_UP_TARGETS = ('phishing', 'media', 'chatbot')
+# Loaded in a pre-fork master and shared with its workers. Media analyzers run
+# in the scan job pool and the Gemini SDK (gRPC) should not cross a fork, so
+# both stay per process.
+PRELOAD_TARGETS = ('phishing',)
+
+def _warm_phishing():
+    from utils import phishing
+    phishing.ensure_model()
+
+def _warm_media():
+    from utils.jobs import job_queue
+    if job_queue.workers > 0:
+        # Scans run in the pool's worker processes, so that is where the
+        # analyzers have to be loaded
+        job_queue.warm_up()
+    else:
+        import_media_analyzers()
+
+def _warm_chatbot():
+    import google.generativeai  # noqa: F401
+
+WARMERS = {
+    'phishing': _warm_phishing,
+    'media': _warm_media,
+    'chatbot': _warm_chatbot
+}
+
+def import_media_analyzers():
+    """
+    Imports utils.ai_engine along with the parts of librosa it uses lazily
+    (librosa defers its submodules, which pull in scipy).
+    """
+    from utils import ai_engine
+    import librosa.filters  # noqa: F401
+    return ai_engine
+
+def warm_up(targets=WARM_UP_TARGETS):
+    """
+    Loads the heavy libraries and models for `targets` now rather than on
+    first use. Returns the seconds spent per target; a target that fails to
+    warm is reported and left to load on first use.
+    """
+    timings = {}
+    for target in targets:
+        t0 = time.perf_counter()
+        try:
+            WARMERS[target]()
+        except Exception as e:
+            print(f"Warm-up of {target} failed: {e}")
+        timings[target] = round(time.perf_counter() - t0, 3)
+    return timings
+
+def preload_for_fork(targets=PRELOAD_TARGETS):
+    """
+    For pre-fork servers (gunicorn preload_app): call in the master after the
+    app is imported and just before workers are forked. Importing utils.phishing
+    already built the trusted-domain index and rule tables; this loads the
+    model too, then gc.freeze()s every object so collections in the workers
+    don't write to their headers and un-share the pages. Workers then share
+    one copy of all of it copy-on-write.
+    """
+    timings = warm_up(targets)
+    gc.collect()
+    gc.freeze()
+    timings['frozen_objects'] = gc.get_freeze_count()
+    return timings
+
+def after_fork(app=None):
+    """
+    Call first thing in each forked worker: turns the collector back on (the
+    master may run with it disabled while loading) and drops database
+    connections inherited from the master, which must not be shared.
+    """
+    gc.enable()
+    if app is not None:
+        from utils.db import db
+        with app.app_context():
+            db.engine.dispose(close=False)